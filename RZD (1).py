@@ -3,11 +3,35 @@
 # -*- coding: utf-8 -*-
 
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
 import logging
+import os
+import threading
+import time
 import traceback # Import traceback for detailed error logging
 
+try:
+  # Необязательная зависимость: быстрый бэкенд парсера
+  from lxml import etree, html as lxml_html
+except ImportError:
+  etree = lxml_html = None
+
+try:
+  # urllib3 распаковывает brotli, только если установлен пакет brotli
+  import brotli  # noqa: F401
+  ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+  ACCEPT_ENCODING = 'gzip, deflate'
+
+from rzd_cache import STALE_SECONDS, ScheduleCache
+from rzd_records import MINUTES_PER_DAY, TrainTimetable, minutes_of, parse_minutes
+from rzd_stations import GREATER_SOCHI_STATIONS, stations_with_codes, stations_without_codes  # реестр нужен и веб-приложению (/rzd/board)
+from shared_cache import open_shared_cache
+from singleflight import SingleFlight
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -16,6 +40,17 @@ logger = logging.getLogger(__name__)
 SOCHI_STATION_CODE = "9623103"
 BASE_URL = "https://rasp.yandex.ru/station/{}/"
 LAST_FLIGHTS_COUNT = 4 # Keep this, might be useful for display later
+EVENT_TYPES = ('arrival', 'departure')
+REQUEST_TIMEOUT = 15 # Таймаут одного HTTP-запроса
+SCHEDULE_DEADLINE = 15 # Общий срок на загрузку всех страниц расписания
+MAX_FETCH_WORKERS = int(os.environ.get("RZD_FETCH_WORKERS", 12)) # Все страницы Большого Сочи за один "раунд"
+MAX_REMEMBERED_PAGES = 64 # Страницы, для которых храним ETag/Last-Modified
+STREAM_CHUNK_SIZE = 16 * 1024 # Размер куска HTML для потокового разбора
+
+TIME_SELECTORS = {
+    'arrival': '.SearchSegment__arrival .SegmentTime__time',
+    'departure': '.SearchSegment__departure .SegmentTime__time',
+}
 
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -23,81 +58,251 @@ HEADERS = {
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
 }
 
+# Одновременные запросы одной и той же страницы (станция, дата, событие) идут одним запросом
+schedule_flight = SingleFlight()
+# Общий пул потоков для параллельной загрузки страниц
+_fetch_executor = ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS, thread_name_prefix="rzd-fetch")
+
+def _create_session():
+  """Постоянная сессия: keep-alive, пул соединений по числу потоков загрузки, сжатие."""
+  session = requests.Session()
+  session.headers.update(HEADERS)
+  session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+  adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_FETCH_WORKERS)
+  session.mount('https://', adapter)
+  session.mount('http://', adapter)
+  return session
+
+_session = _create_session()
+# url -> {'etag', 'last_modified', 'html', 'schedule'} для условных запросов
+_pages = OrderedDict()
+_pages_lock = threading.Lock()
+
+def _remember_page(url, response, html_content):
+  with _pages_lock:
+    _pages[url] = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'html': html_content,
+        'size': len(response.content),
+        'schedule': None,
+    }
+    _pages.move_to_end(url)
+    while len(_pages) > MAX_REMEMBERED_PAGES:
+      _pages.popitem(last=False)
+
+def _remember_schedule(url, html_content, schedule):
+  """Запоминает результат парсинга, чтобы не парсить страницу повторно после ответа 304."""
+  with _pages_lock:
+    page = _pages.get(url)
+    if page is not None and page['html'] is html_content:
+      page['schedule'] = schedule
+
+def _conditional_headers(url):
+  with _pages_lock:
+    page = _pages.get(url)
+  headers = {}
+  if page is not None:
+    if page['etag']:
+      headers['If-None-Match'] = page['etag']
+    if page['last_modified']:
+      headers['If-Modified-Since'] = page['last_modified']
+  return headers
+
 def get_today_date_string():
   """Возвращает сегодняшнюю дату в формате YYYY-MM-DD."""
   return datetime.now().strftime("%Y-%m-%d")
 
-def fetch_schedule_html(station_code, event_type):
-  """Загружает HTML-страницу с расписанием."""
-  today_date = get_today_date_string()
+def fetch_schedule_html(station_code, event_type, date=None):
+  """Загружает HTML-страницу с расписанием; одинаковые одновременные запросы схлопываются."""
+  return _fetch_page(station_code, event_type, date)[0]
+
+def _fetch_page(station_code, event_type, date=None):
+  """Возвращает (html, сведения о загрузке) или (None, None) при ошибке."""
+  today_date = date or get_today_date_string()
+  key = (station_code, today_date, event_type)
+  return schedule_flight.do(key, lambda: _download_schedule_html(station_code, today_date, event_type))
+
+def _download_schedule_html(station_code, today_date, event_type):
+  """
+  Выполняет условный HTTP-запрос страницы расписания через постоянную сессию.
+  Если страница не изменилась (304), возвращается сохраненная копия.
+  """
   url = BASE_URL.format(station_code) + f"?date={today_date}&event={event_type}"
   logging.info(f"RZD Parser: Запрос расписания по URL: {url}")
   try:
-    response = requests.get(url, headers=HEADERS, timeout=15)
+    started = time.perf_counter()
+    response = _session.get(url, headers=_conditional_headers(url), timeout=REQUEST_TIMEOUT)
+    info = {
+        'url': url,
+        'status': response.status_code,
+        'wire_bytes': response.raw.tell() if response.raw is not None else len(response.content),
+        'elapsed': time.perf_counter() - started,
+        'schedule': None,
+    }
+    if response.status_code == 304:
+      with _pages_lock:
+        page = _pages.get(url)
+      if page is not None:
+        logging.info(f"RZD Parser: Страница для {event_type} не изменилась (304).")
+        info['bytes'] = page['size']
+        info['schedule'] = page['schedule']
+        return page['html'], info
+      # Копии нет (например, вытеснена) - запрашиваем страницу целиком
+      response = _session.get(url, timeout=REQUEST_TIMEOUT)
+      info['status'] = response.status_code
+      info['wire_bytes'] += response.raw.tell() if response.raw is not None else len(response.content)
     response.raise_for_status()
+    html_content = response.text
+    _remember_page(url, response, html_content)
     logging.info(f"RZD Parser: Страница для {event_type} успешно загружена.")
-    return response.text
+    info['bytes'] = len(response.content)
+    return html_content, info
   except requests.exceptions.Timeout:
     logging.error(f"RZD Parser: Ошибка таймаута при запросе к {url}")
-    return None
+    return None, None
   except requests.exceptions.RequestException as e:
     logging.error(f"RZD Parser: Ошибка при запросе к {url}: {e}")
-    return None
+    return None, None
   except Exception as e:
       logging.error(f"RZD Parser: Неожиданная ошибка при загрузке {url}: {e}")
-      return None
+      return None, None
+
+def _build_schedule_entry(time_text, train_num_text, train_name_text, route_text):
+  """Собирает запись о рейсе из текстов элементов сегмента (None - элемент не найден)."""
+  time_str = time_text.strip()
+  train_info = ""
+  if train_num_text is not None:
+      train_info += train_num_text.strip()
+  if train_name_text is not None:
+      name_text = train_name_text.strip()
+      if name_text not in train_info:
+          train_info += f" '{name_text}'"
+  if not train_info: train_info = "Не указан"
+  route_str = route_text.strip().replace('\n', ' ').replace('\xa0', ' ').strip()
+  return {
+      'time': time_str,
+      'train': train_info.strip(),
+      'route': route_str
+  }
+
+def _iter_segments_bs4(html_content, event_type):
+  """Бэкенд BeautifulSoup: для каждого сегмента отдает тексты (время, номер, название, маршрут)."""
+  # bs4 нужен только этому бэкенду (без lxml или с RZD_PARSER_BACKEND=bs4), поэтому импортируется здесь
+  from bs4 import BeautifulSoup
+  soup = BeautifulSoup(html_content, 'html.parser')
+  segments = soup.select('article.SearchSegment')
+  logging.info(f"RZD Parser: Найдено {len(segments)} сегментов ({event_type}) для парсинга.")
+
+  if not segments:
+      logging.warning(f"RZD Parser: Не найдено сегментов расписания на странице для {event_type}.")
+      no_schedule_message = soup.select_one('.ScheduleEmpty')
+      if no_schedule_message:
+          logging.info(f"RZD Parser: Найдено сообщение об отсутствии рейсов: {no_schedule_message.text.strip()}")
+      return
+
+  time_selector = TIME_SELECTORS.get(event_type)
+  for segment in segments:
+    time_element = segment.select_one(time_selector) if time_selector else None
+    train_num_element = segment.select_one('.TransportIcon__number')
+    if not train_num_element:
+        train_num_element = segment.select_one('.SearchSegment__transport .TransportIcon')
+    train_name_element = segment.select_one('.SearchSegment__headerTitle')
+    route_element = segment.select_one('.SearchSegment__headerSubtitle')
+    yield tuple(element.text if element else None
+                for element in (time_element, train_num_element, train_name_element, route_element))
+
+def _has_class_xpath(class_name):
+  return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
 
-def parse_schedule_data(html_content, event_type):
-  """Парсит HTML и извлекает информацию о рейсах."""
+if lxml_html is not None:
+  # Селекторы компилируются один раз при загрузке модуля
+  _LXML_SEGMENTS = etree.XPath(f"//article[{_has_class_xpath('SearchSegment')}]")
+  _LXML_SCHEDULE_EMPTY = etree.XPath(f"(//*[{_has_class_xpath('ScheduleEmpty')}])[1]")
+  _LXML_TIME = {
+      'arrival': etree.XPath(f"(.//*[{_has_class_xpath('SearchSegment__arrival')}]//*[{_has_class_xpath('SegmentTime__time')}])[1]"),
+      'departure': etree.XPath(f"(.//*[{_has_class_xpath('SearchSegment__departure')}]//*[{_has_class_xpath('SegmentTime__time')}])[1]"),
+  }
+  _LXML_TRAIN_NUM = etree.XPath(f"(.//*[{_has_class_xpath('TransportIcon__number')}])[1]")
+  _LXML_TRAIN_ICON = etree.XPath(f"(.//*[{_has_class_xpath('SearchSegment__transport')}]//*[{_has_class_xpath('TransportIcon')}])[1]")
+  _LXML_TRAIN_NAME = etree.XPath(f"(.//*[{_has_class_xpath('SearchSegment__headerTitle')}])[1]")
+  _LXML_ROUTE = etree.XPath(f"(.//*[{_has_class_xpath('SearchSegment__headerSubtitle')}])[1]")
+
+def _lxml_first_text(xpath, node):
+  found = xpath(node)
+  return found[0].text_content() if found else None
+
+def _iter_segments_lxml(html_content, event_type):
+  """Бэкенд lxml: те же поля, что и у BeautifulSoup, через предкомпилированные XPath."""
+  document = lxml_html.document_fromstring(html_content)
+  segments = _LXML_SEGMENTS(document)
+  logging.info(f"RZD Parser: Найдено {len(segments)} сегментов ({event_type}) для парсинга.")
+
+  if not segments:
+      logging.warning(f"RZD Parser: Не найдено сегментов расписания на странице для {event_type}.")
+      no_schedule_message = _lxml_first_text(_LXML_SCHEDULE_EMPTY, document)
+      if no_schedule_message is not None:
+          logging.info(f"RZD Parser: Найдено сообщение об отсутствии рейсов: {no_schedule_message.strip()}")
+      return
+
+  time_xpath = _LXML_TIME.get(event_type)
+  for segment in segments:
+    yield _lxml_segment_texts(segment, time_xpath)
+
+def _lxml_segment_texts(segment, time_xpath):
+  train_num = _lxml_first_text(_LXML_TRAIN_NUM, segment)
+  if train_num is None:
+      train_num = _lxml_first_text(_LXML_TRAIN_ICON, segment)
+  return (
+      _lxml_first_text(time_xpath, segment) if time_xpath is not None else None,
+      train_num,
+      _lxml_first_text(_LXML_TRAIN_NAME, segment),
+      _lxml_first_text(_LXML_ROUTE, segment),
+  )
+
+def _iter_segment_elements_stream(html_content):
+  """
+  Потоковый разбор lxml: документ подается парсеру кусками по STREAM_CHUNK_SIZE,
+  и каждый сегмент отдается сразу после его закрывающего тега. Если потребитель
+  прекращает итерацию, оставшаяся часть страницы не разбирается.
+  """
+  parser = etree.HTMLPullParser(events=('end',), tag='article')
+  parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup()) # text_content(), как у document_fromstring
+  for offset in range(0, len(html_content), STREAM_CHUNK_SIZE):
+    parser.feed(html_content[offset:offset + STREAM_CHUNK_SIZE])
+    yield from _read_stream_segments(parser)
+  parser.close()
+  yield from _read_stream_segments(parser)
+
+def _read_stream_segments(parser):
+  for _, element in parser.read_events():
+    if 'SearchSegment' in (element.get('class') or '').split():
+      yield element
+    element.clear() # Разобранный сегмент больше не нужен
+
+PARSER_BACKENDS = {'bs4': _iter_segments_bs4}
+if lxml_html is not None:
+  PARSER_BACKENDS['lxml'] = _iter_segments_lxml
+DEFAULT_PARSER_BACKEND = os.environ.get('RZD_PARSER_BACKEND', 'lxml' if 'lxml' in PARSER_BACKENDS else 'bs4')
+
+def parse_schedule_data(html_content, event_type, backend=None):
+  """
+  Парсит HTML и извлекает информацию о рейсах.
+
+  backend - 'lxml' (быстрее, по умолчанию при наличии lxml) или 'bs4';
+  результат обоих бэкендов одинаков.
+  """
   if not html_content:
     return []
 
   schedule = []
   try:
-    soup = BeautifulSoup(html_content, 'html.parser')
-    segments = soup.select('article.SearchSegment')
-    logging.info(f"RZD Parser: Найдено {len(segments)} сегментов ({event_type}) для парсинга.")
-
-    if not segments:
-        logging.warning(f"RZD Parser: Не найдено сегментов расписания на странице для {event_type}.")
-        no_schedule_message = soup.select_one('.ScheduleEmpty')
-        if no_schedule_message:
-            logging.info(f"RZD Parser: Найдено сообщение об отсутствии рейсов: {no_schedule_message.text.strip()}")
-        return []
-
-    for segment in segments:
-      time_element = None
-      if event_type == 'arrival':
-        time_element = segment.select_one('.SearchSegment__arrival .SegmentTime__time')
-      elif event_type == 'departure':
-        time_element = segment.select_one('.SearchSegment__departure .SegmentTime__time')
-
-      train_num_element = segment.select_one('.TransportIcon__number')
-      if not train_num_element:
-          train_num_element = segment.select_one('.SearchSegment__transport .TransportIcon')
-      train_name_element = segment.select_one('.SearchSegment__headerTitle')
-      route_element = segment.select_one('.SearchSegment__headerSubtitle')
-
-      if time_element and route_element:
-        time_str = time_element.text.strip()
-        train_info = ""
-        if train_num_element:
-            train_info += train_num_element.text.strip()
-        if train_name_element:
-            name_text = train_name_element.text.strip()
-            if name_text not in train_info:
-                train_info += f" '{name_text}'"
-        if not train_info: train_info = "Не указан"
-        route_str = route_element.text.strip().replace('\n', ' ').replace('\xa0', ' ').strip()
-
-        schedule.append({
-            'time': time_str,
-            'train': train_info.strip(),
-            'route': route_str
-        })
+    iter_segments = PARSER_BACKENDS[backend or DEFAULT_PARSER_BACKEND]
+    for time_text, train_num_text, train_name_text, route_text in iter_segments(html_content, event_type):
+      if time_text is not None and route_text is not None:
+        schedule.append(_build_schedule_entry(time_text, train_num_text, train_name_text, route_text))
       else:
           logging.warning(f"RZD Parser: Не удалось полностью распарсить сегмент ({event_type}).")
-          # logging.debug(f"RZD Parser: Содержимое проблемного сегмента: {segment}")
 
   except Exception as e:
     logging.error(f"RZD Parser: Ошибка при парсинге HTML для {event_type}: {e}", exc_info=True)
@@ -105,10 +310,295 @@ def parse_schedule_data(html_content, event_type):
 
   return schedule
 
-def get_sochi_schedule():
+def parse_next_trains(html_content, event_type, count, after_minutes=0):
+  """
+  Ранний выход: парсит страницу только до тех пор, пока не найдено count рейсов
+  со временем не раньше after_minutes (минуты от полуночи).
+
+  С lxml страница разбирается потоково и остаток документа не обрабатывается;
+  без lxml документ разбирается целиком, но записи строятся только для нужных сегментов.
+  """
+  if not html_content or count <= 0:
+    return []
+
+  def matching_segments():
+    if lxml_html is None:
+      yield from PARSER_BACKENDS['bs4'](html_content, event_type)
+      return
+    time_xpath = _LXML_TIME.get(event_type)
+    if time_xpath is None:
+      return
+    for segment in _iter_segment_elements_stream(html_content):
+      # Остальные поля извлекаются только у сегментов, прошедших фильтр по времени
+      minutes = parse_minutes(_lxml_first_text(time_xpath, segment))
+      if minutes is not None and minutes >= after_minutes:
+        yield _lxml_segment_texts(segment, time_xpath)
+
+  trains = []
+  try:
+    for time_text, train_num_text, train_name_text, route_text in matching_segments():
+      if time_text is None or route_text is None:
+        continue
+      minutes = parse_minutes(time_text)
+      if minutes is None or minutes < after_minutes:
+        continue
+      trains.append(_build_schedule_entry(time_text, train_num_text, train_name_text, route_text))
+      if len(trains) >= count:
+        break
+  except Exception as e:
+    logging.error(f"RZD Parser: Ошибка при потоковом парсинге HTML для {event_type}: {e}", exc_info=True)
+    return []
+  return trains
+
+def _parse_page(html, info, event_type):
+  """Полное расписание загруженной страницы (для неизменившейся страницы - сохраненный разбор)."""
+  schedule = info['schedule']
+  if schedule is None:
+    schedule = parse_schedule_data(html, event_type)
+    _remember_schedule(info['url'], html, schedule)
+  return schedule
+
+# Ключи кэша расписаний, для которых уже идет фоновый разбор загруженной страницы
+_seeding = set()
+_seeding_lock = threading.Lock()
+
+def _seed_schedule_async(key, html, info, event_type):
+  """Разбирает уже загруженную страницу целиком в фоне и кладет расписание в кэш (без повторной загрузки)."""
+  with _seeding_lock:
+    if key in _seeding:
+      return
+    _seeding.add(key)
+
+  def run():
+    try:
+      schedule_cache.put(key, _parse_page(html, info, event_type))
+    except Exception as e:
+      logging.error(f"RZD Parser: Ошибка фонового разбора расписания {key}: {e}", exc_info=True)
+    finally:
+      with _seeding_lock:
+        _seeding.discard(key)
+
+  threading.Thread(target=run, name="rzd-schedule-seed", daemon=True).start()
+
+def _fetch_and_parse(station_code, event_type, date):
+  """Загружает и парсит одну страницу; None, если страницу загрузить не удалось."""
+  html, info = _fetch_page(station_code, event_type, date)
+  if not html:
+    return None
+  started = time.perf_counter()
+  schedule = _parse_page(html, info, event_type)
+  parse_time = time.perf_counter() - started
+  logging.info(
+      f"RZD Parser: {event_type} {date}: HTTP {info['status']}, передано {info['wire_bytes']} байт "
+      f"({info['bytes']} после распаковки), загрузка {info['elapsed'] * 1000:.0f} мс, "
+      f"парсинг {parse_time * 1000:.1f} мс"
+  )
+  return schedule
+
+def fetch_pages(page_keys, deadline=SCHEDULE_DEADLINE):
+  """
+  Параллельно загружает и парсит страницы расписания в общем пуле потоков.
+
+  Все страницы (станция, тип события, дата) запрашиваются одновременно
+  и укладываются в общий срок deadline секунд. Страницы, не загруженные
+  к сроку или с ошибкой, возвращаются как None - остальные результаты
+  при этом не теряются.
+
+  Returns:
+      dict: {(station_code, event_type, date): list | None}
+  """
+  futures = {key: _fetch_executor.submit(_fetch_and_parse, *key) for key in page_keys}
+  done, not_done = wait(futures.values(), timeout=deadline)
+  if not_done:
+    logging.error(f"RZD Parser: {len(not_done)} из {len(futures)} страниц не загружены за {deadline} с.")
+
+  results = {}
+  for key, future in futures.items():
+    if future not in done:
+      results[key] = None
+    elif future.exception() is not None:
+      logging.error(f"RZD Parser: Ошибка при загрузке {key}: {future.exception()}")
+      results[key] = None
+    else:
+      results[key] = future.result()
+  return results
+
+def fetch_schedules(station_code, event_types=EVENT_TYPES, dates=None, deadline=SCHEDULE_DEADLINE):
+  """
+  Параллельно загружает страницы одной станции (каждый тип события на каждую дату).
+
+  Returns:
+      dict: {(event_type, date): list | None}
+  """
+  dates = dates or [get_today_date_string()]
+  results = fetch_pages([(station_code, event_type, date) for date in dates for event_type in event_types], deadline)
+  return {(event_type, date): schedule for (_, event_type, date), schedule in results.items()}
+
+# Кэш распарсенных расписаний (станция, дата, событие) со stale-while-revalidate;
+# загруженные страницы видят все воркеры через общий кэш (SHARED_CACHE_PATH="" - только память процесса)
+schedule_cache = ScheduleCache(_fetch_and_parse, today=get_today_date_string,
+                               shared=open_shared_cache("rzd_schedules", ttl=STALE_SECONDS, max_entries=500))
+
+def start_schedule_refresher(station_codes=(SOCHI_STATION_CODE,), event_types=EVENT_TYPES):
+  """Включает фоновое обновление кэша расписаний для указанных станций."""
+  for station_code in station_codes:
+    schedule_cache.watch(station_code, event_types)
+  schedule_cache.start()
+
+def get_cached_schedules(page_keys, deadline=SCHEDULE_DEADLINE):
+  """
+  Расписания по ключам (станция, тип события, дата) из кэша; отсутствующие
+  в кэше страницы загружаются параллельно (см. fetch_pages) и кэшируются.
+
+  Returns:
+      dict: {(station_code, event_type, date): list | None}
+  """
+  results = {}
+  missing = []
+  for station_code, event_type, date in page_keys:
+    schedule = schedule_cache.get((station_code, date, event_type))
+    if schedule is None:
+      missing.append((station_code, event_type, date))
+    else:
+      results[(station_code, event_type, date)] = schedule
+
+  if missing:
+    fetched = fetch_pages(missing, deadline)
+    for (station_code, event_type, date), schedule in fetched.items():
+      if schedule is not None:
+        schedule_cache.put((station_code, date, event_type), schedule)
+    results.update(fetched)
+  return results
+
+def get_station_schedules(station_code, event_types=EVENT_TYPES, date=None, deadline=SCHEDULE_DEADLINE):
+  """
+  Расписания одной станции на дату (через кэш).
+
+  Returns:
+      dict: {(event_type, date): list | None}
+  """
+  date = date or get_today_date_string()
+  results = get_cached_schedules([(station_code, event_type, date) for event_type in event_types], deadline)
+  return {(event_type, page_date): schedule for (_, event_type, page_date), schedule in results.items()}
+
+def _schedule_datetimes(schedule, date):
+  """
+  Момент каждого рейса табло на дату date ('YYYY-MM-DD') строкой ISO 'YYYY-MM-DDTHH:MM'.
+
+  Табло идет по порядку времени, поэтому время, которое меньше предыдущего
+  больше чем на полсуток, относится к следующему дню. None - время не распознано.
+  """
+  day = datetime.strptime(date, "%Y-%m-%d")
+  previous = None
+  days = 0
+  moments = []
+  for entry in schedule:
+    minutes = parse_minutes(entry['time'])
+    if minutes is None:
+      moments.append(None)
+      continue
+    if previous is not None and previous - minutes > MINUTES_PER_DAY // 2:
+      days += 1
+    previous = minutes
+    moments.append((day + timedelta(days=days, minutes=minutes)).isoformat(timespec='minutes'))
+  return moments
+
+def get_greater_sochi_board(station_keys=None, date=None, deadline=SCHEDULE_DEADLINE):
+  """
+  Сводное табло прибытий и отправлений по станциям Большого Сочи.
+
+  Страницы всех станций загружаются одновременно (ограниченный пул потоков,
+  общий срок deadline), поэтому общее время близко к самой медленной загрузке.
+  Каждая запись дополняется полями 'station', 'station_code' и 'datetime'
+  (момент рейса 'YYYY-MM-DDTHH:MM' с учетом перехода через полночь), по нему
+  записи и сортируются.
+
+  Returns:
+      tuple: (arrivals, departures, failed_stations) - списки отсортированы по времени,
+             failed_stations - названия станций, страницы которых не удалось получить.
+  """
+  date = date or get_today_date_string()
+  stations = stations_with_codes(station_keys)
+  results = get_cached_schedules(
+      [(station.code, event_type, date) for station in stations for event_type in EVENT_TYPES], deadline)
+
+  board = {event_type: [] for event_type in EVENT_TYPES}
+  failed_stations = []
+  for station in stations:
+    for event_type in EVENT_TYPES:
+      schedule = results.get((station.code, event_type, date))
+      if schedule is None:
+        if station.name_ru not in failed_stations:
+          failed_stations.append(station.name_ru)
+        continue
+      board[event_type].extend(
+          dict(entry, station=station.name_ru, station_code=station.code, datetime=moment)
+          for entry, moment in zip(schedule, _schedule_datetimes(schedule, date)))
+
+  for entries in board.values():
+    # Строки 'time' нельзя сравнивать напрямую ('9:05' > '10:00', после полуночи '00:15' < '23:50')
+    entries.sort(key=lambda entry: (entry['datetime'] is None, entry['datetime'] or ''))
+  logging.info(f"RZD Parser: Табло Большого Сочи: {len(board['arrival'])} прибытий, "
+               f"{len(board['departure'])} отправлений, станций с ошибками: {len(failed_stations)}")
+  return board['arrival'], board['departure'], failed_stations
+
+# Индексы по времени для распарсенных табло: key -> (schedule, TrainTimetable)
+_timetables = {}
+_timetables_lock = threading.Lock()
+
+def get_timetable(station_code, event_type, date=None, deadline=SCHEDULE_DEADLINE):
+  """
+  Индекс рейсов станции по времени (rzd_records.TrainTimetable) или None, если табло не загружено.
+  Индекс строится один раз на каждый загруженный список рейсов.
+  """
+  date = date or get_today_date_string()
+  key = (station_code, event_type, date)
+  schedule = get_cached_schedules([key], deadline)[key]
+  if schedule is None:
+    return None
+  with _timetables_lock:
+    cached = _timetables.get(key)
+  if cached is not None and cached[0] is schedule:
+    return cached[1]
+  # Индекс строится вне блокировки; если два потока построили его одновременно, остается последний
+  timetable = TrainTimetable.from_schedule(schedule)
+  with _timetables_lock:
+    for old_key in [k for k in _timetables if k[2] < date]:
+      del _timetables[old_key]
+    _timetables[key] = (schedule, timetable)
+  return timetable
+
+def get_upcoming_trains(event_type, count=LAST_FLIGHTS_COUNT, after=None, station_code=SOCHI_STATION_CODE):
+  """
+  Ближайшие count рейсов станции после момента after (datetime, по умолчанию - сейчас).
+
+  Returns:
+      list: словари того же вида, что в parse_schedule_data(); пустой список, если табло не загружено.
+  """
+  after = after or datetime.now()
+  date = after.strftime("%Y-%m-%d")
+  key = (station_code, date, event_type)
+  if schedule_cache.get(key) is None:
+    # Табло еще не в кэше: отвечаем ранним выходом из потокового парсинга, а полный
+    # разбор той же страницы для кэша и индекса делаем в фоне. Повторной загрузки нет:
+    # фоновое обновление запускает только кэш для уже устаревших записей
+    html_content, info = _fetch_page(station_code, event_type, date)
+    if not html_content:
+      return []
+    _seed_schedule_async(key, html_content, info, event_type)
+    return parse_next_trains(html_content, event_type, count, minutes_of(after))
+  timetable = get_timetable(station_code, event_type, date)
+  if timetable is None:
+    return []
+  return [record.as_dict() for record in timetable.next_after(minutes_of(after), count)]
+
+def get_sochi_schedule(deadline=SCHEDULE_DEADLINE):
     """
     Основная функция для получения расписания прибытия и отправления для Сочи.
 
+    Данные берутся из кэша расписаний; при промахе прибытия и отправления
+    загружаются параллельно в пределах общего срока deadline.
+
     Returns:
         tuple: Кортеж (arrivals_schedule, departures_schedule, error_message).
                arrivals_schedule: list - список словарей прибывающих поездов.
@@ -117,23 +607,18 @@ def get_sochi_schedule():
     """
     logging.info("RZD Parser: Запрос полного расписания для Сочи...")
     error_message = None
-    arrivals_schedule = []
-    departures_schedule = []
+    today_date = get_today_date_string()
+    results = get_station_schedules(SOCHI_STATION_CODE, EVENT_TYPES, today_date, deadline)
+    arrivals_schedule = results[('arrival', today_date)]
+    departures_schedule = results[('departure', today_date)]
 
-    # Получаем и парсим прибытия
-    arrivals_html = fetch_schedule_html(SOCHI_STATION_CODE, 'arrival')
-    if arrivals_html:
-        arrivals_schedule = parse_schedule_data(arrivals_html, 'arrival')
-    else:
+    if arrivals_schedule is None:
+        arrivals_schedule = []
         error_message = "Не удалось загрузить данные о прибытии."
         logging.error(error_message)
-        # Можно продолжить и попробовать получить отправления
 
-    # Получаем и парсим отправления
-    departures_html = fetch_schedule_html(SOCHI_STATION_CODE, 'departure')
-    if departures_html:
-        departures_schedule = parse_schedule_data(departures_html, 'departure')
-    else:
+    if departures_schedule is None:
+        departures_schedule = []
         # Дополняем сообщение об ошибке, если оно уже есть, или создаем новое
         dep_error = "Не удалось загрузить данные об отправлении."
         logging.error(dep_error)
@@ -191,6 +676,10 @@ if __name__ == "__main__":
     else:
         print("  (Нет данных об отправлении)")
 
+    print(f"\n--- Ближайшие отправления после {datetime.now().strftime('%H:%M')} ---")
+    for flight in get_upcoming_trains('departure'):
+        print(f"  Время: {flight['time']}, Поезд: {flight['train']}, Маршрут: {flight['route']}")
+
     print("\n" + "-" * 30)
     print("Тест парсера завершен.")
     print("-" * 30)
@@ -2,24 +2,14 @@ import os
 import requests
 from flask import Flask, render_template, request, redirect, url_for, flash
 import openai
+from openai_service import OpenAIService
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', os.urandom(24))
 GEOAPIFY_API_KEY = os.environ.get("GEOAPIFY_API_KEY", "37ed2aaf4267415eae06a898624632f7")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "sk-proj-...")
-openai_enabled = False
-openai_client = None
-if OPENAI_API_KEY and OPENAI_API_KEY.startswith("sk-"):
-    try:
-        openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        openai_client.models.list()
-        openai_enabled = True
-        print("OpenAI API ключ найден и клиент инициализирован.")
-    except Exception as e:
-        print(f"Ошибка инициализации OpenAI или проверки ключа: {e}")
-        print("OpenAI будет отключен.")
-else:
-    print("\n!!! ВНИМАНИЕ: OpenAI API Ключ не установлен или недействителен !!!\n")
-    print("Сервис персональных рекомендаций будет недоступен.")
+# Клиент OpenAI создается при первом запросе, а ключ проверяется в фоне,
+# поэтому запуск приложения не ждет ответа api.openai.com
+openai_service = OpenAIService(OPENAI_API_KEY)
 
 SOCHI_LAT = 43.5855
 SOCHI_LON = 39.7303
@@ -39,7 +29,7 @@ CATEGORIES = {
 
 def get_llm_recommendations(interests_list):
     """Генерирует персональные рекомендации с помощью OpenAI."""
-    if not openai_client:
+    if not openai_service.enabled:
          return "Сервис персональных рекомендаций недоступен (клиент OpenAI не инициализирован)."
     interests_str = ", ".join(interests_list)
     prompt = (
@@ -51,7 +41,7 @@ def get_llm_recommendations(interests_list):
         f"Не включай в ответ приветствия или завершающие фразы, только сами рекомендации списком или абзацами."
     )
     try:
-        response = openai_client.chat.completions.create(
+        response = openai_service.client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "Ты - полезный туристический ассистент."},
@@ -66,6 +56,7 @@ def get_llm_recommendations(interests_list):
             return "Не удалось получить конкретные рекомендации от AI."
         return recommendation
     except openai.AuthenticationError as e:
+         openai_service.record_failure(e)
          print(f"Ошибка аутентификации OpenAI: {e}. Проверьте API ключ.")
          return "Сервис персональных рекомендаций временно недоступен из-за проблемы с API ключом OpenAI."
     except openai.RateLimitError as e:
@@ -185,7 +176,7 @@ def internal_server_error(e):
 
 if __name__ == '__main__':
     valid_geoapify = GEOAPIFY_API_KEY and GEOAPIFY_API_KEY != "YOUR_API_KEY" and len(GEOAPIFY_API_KEY) > 10
-    valid_openai = openai_client is not None
+    valid_openai = openai_service.configured
 
     if not valid_geoapify:
          print("\n!!! ВНИМАНИЕ: Geoapify API Ключ не установлен или недействителен...")
@@ -4,6 +4,7 @@ import os
 import requests
 from flask import Flask, render_template, request, redirect, url_for, flash, session, g # Added session, g
 import openai
+from openai_service import OpenAIService
 import traceback
 import logging
 
@@ -30,24 +31,9 @@ GEOAPIFY_API_KEY = os.environ.get("GEOAPIFY_API_KEY", "1dd336f8ea20465fb15f85bdf
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", None)
 
 # --- OpenAI Initialization ---
-# ... (OpenAI initialization code remains the same) ...
-openai_enabled = False
-openai_client = None
-if OPENAI_API_KEY and OPENAI_API_KEY.startswith("sk-"):
-    try:
-        openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        openai_client.models.list()
-        openai_enabled = True
-        logger.info("OpenAI API ключ найден и клиент инициализирован.")
-    except openai.AuthenticationError:
-        logger.warning("Ошибка аутентификации OpenAI: Неверный API ключ.")
-        logger.warning("Сервис персональных рекомендаций будет недоступен.")
-    except Exception as e:
-        logger.error(f"Ошибка инициализации OpenAI или проверки ключа: {e}")
-        logger.warning("OpenAI будет отключен.")
-else:
-    logger.warning("!!! ВНИМАНИЕ: OpenAI API Ключ не установлен или недействителен !!!")
-    logger.warning("Сервис персональных рекомендаций будет недоступен.")
+# The client is created on first use and the key is checked by a background probe,
+# so worker startup never waits on api.openai.com
+openai_service = OpenAIService(OPENAI_API_KEY)
 
 
 # --- Constants ---
@@ -299,7 +285,7 @@ def before_request():
 
 # --- LLM Recommendation Function ---
 def get_llm_recommendations(interests_list, lang_code):
-    if not openai_enabled or not openai_client:
+    if not openai_service.enabled:
          # Use the translation helper now
          return _("llm_unavailable_no_client")
 
@@ -332,7 +318,7 @@ def get_llm_recommendations(interests_list, lang_code):
         f"Если выбраны 'Железные дороги (Расписание)', можешь упомянуть удобство поездов."
     )
     try:
-        response = openai_client.chat.completions.create(
+        response = openai_service.client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "Ты - полезный туристический ассистент."}, # Keep system prompt generic maybe
@@ -346,7 +332,8 @@ def get_llm_recommendations(interests_list, lang_code):
             logger.warning("OpenAI вернул пустой ответ.")
             return _("llm_empty_response_error")
         return recommendation
-    except openai.AuthenticationError:
+    except openai.AuthenticationError as e:
+         openai_service.record_failure(e)
          logger.error("Ошибка аутентификации OpenAI.", exc_info=True)
          return _("llm_openai_auth_error")
     except openai.RateLimitError:
@@ -493,6 +480,7 @@ def search_places():
 
 
     # --- Get LLM Recommendations ---
+    openai_enabled = openai_service.enabled
     if openai_enabled:
         try:
             # Pass selected display names and current language code
@@ -561,10 +549,10 @@ if __name__ == '__main__':
     else:
          logger.info("Geoapify ключ найден.")
 
-    if not openai_enabled:
+    if not openai_service.configured:
          logger.warning("!!! ВНИМАНИЕ: Сервис персональных рекомендаций OpenAI неактивен.")
     else:
-         logger.info("OpenAI клиент инициализирован.")
+         logger.info("OpenAI ключ найден, проверка выполняется в фоне.")
 
     if not rzd_parser_available:
         logger.warning("!!! ВНИМАНИЕ: Парсер РЖД (RZD.py) не импортирован.")
@@ -1,26 +1,84 @@
 # --- START OF FILE app.py ---
 
+import importlib.util
+import json
 import os
-import requests
-from flask import Flask, render_template, request, redirect, url_for, flash, session, g # Added session, g
-import openai
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, flash, session, g, jsonify, Response, stream_with_context, make_response # Added session, g
 import traceback
 import logging
+# openai, requests and the RZD parser (requests, lxml/bs4) are imported on first use,
+# so a worker boots without them (see benchmarks/bench_startup.py)
 from dotenv import load_dotenv # Опционально, для .env
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from place_cache import TTLLRUCache
+from i18n import Catalog
+from place_search import MODE_FANOUT, PlaceSearchEngine
+from poi_store import load_store
+from llm_cache import RecommendationCache, RecommendationStore, recommendation_cache_key
+from shared_cache import open_shared_cache, shared_cache_path
+from openai_service import STATUS_AUTH_ERROR, STATUS_UNAVAILABLE, OpenAIService
 
 # --- Load environment variables from .env file (optional) ---
 load_dotenv()
 
-# --- Import RZD parser function ---
-try:
-    from RZD import get_sochi_schedule
-    rzd_parser_available = True
-    print("Модуль парсера RZD успешно импортирован.")
-except ImportError:
-    print("ПРЕДУПРЕЖДЕНИЕ: Не удалось импортировать модуль RZD.py. Функциональность расписания поездов будет недоступна.")
-    rzd_parser_available = False
-    def get_sochi_schedule():
+# --- RZD parser (imported on first use) ---
+rzd_parser_available = importlib.util.find_spec("RZD") is not None
+if not rzd_parser_available:
+    print("ПРЕДУПРЕЖДЕНИЕ: Не удалось найти модуль RZD.py. Функциональность расписания поездов будет недоступна.")
+_rzd_module = None
+# /rzd/board combines stations, so it needs at least this many with rasp.yandex.ru codes
+MIN_BOARD_STATIONS = 2
+
+def load_rzd():
+    """The RZD parser module, imported on the first call; None if it cannot be imported."""
+    global _rzd_module, rzd_parser_available
+    if _rzd_module is None and rzd_parser_available:
+        try:
+            import RZD
+            _rzd_module = RZD
+            print("Модуль парсера RZD успешно импортирован.")
+        except ImportError:
+            print("ПРЕДУПРЕЖДЕНИЕ: Не удалось импортировать модуль RZD.py. Функциональность расписания поездов будет недоступна.")
+            rzd_parser_available = False
+    return _rzd_module
+
+def get_sochi_schedule(deadline=None):
+    rzd = load_rzd()
+    if rzd is None:
         return [], [], "Модуль парсера RZD не найден."
+    return rzd.get_sochi_schedule(deadline) if deadline is not None else rzd.get_sochi_schedule()
+
+def _start_rzd_refresher():
+    rzd = load_rzd()
+    if rzd is not None:
+        rzd.start_schedule_refresher()
+
+_background_pid = None
+_background_lock = threading.Lock()
+
+def start_background_tasks():
+    """
+    Starts the background work of a serving process, once per process (safe to call on every request).
+
+    Keeps today's Sochi timetable warm so /search never waits on rasp.yandex.ru; the parser
+    is imported by the refresher thread, off the request path. Importing this module does
+    not start anything, so llm_precompute and asgi_app can use its helpers without the thread.
+    Called from before_request (the first request of each worker, also under app.run, whose
+    reloader parent never serves) and by asgi_app before serving; RZD_BACKGROUND_REFRESH=0 turns it off.
+    """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+    if os.environ.get("RZD_BACKGROUND_REFRESH", "1") == "1":
+        threading.Thread(target=_start_rzd_refresher, name="rzd-import", daemon=True).start()
 
 # --- Basic Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -35,24 +93,9 @@ GEOAPIFY_API_KEY = os.environ.get("GEOAPIFY_API_KEY", "f4f088398cf5438fb35241059
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", None)
 
 # --- OpenAI Initialization ---
-openai_enabled = False
-openai_client = None
-if OPENAI_API_KEY and OPENAI_API_KEY.startswith("sk-"):
-    try:
-        openai_client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        # Test the key (optional but recommended)
-        openai_client.models.list() # Simple API call to check authentication
-        openai_enabled = True
-        logger.info("OpenAI API ключ найден и клиент инициализирован.")
-    except openai.AuthenticationError:
-        logger.warning("Ошибка аутентификации OpenAI: Неверный API ключ.")
-        logger.warning("Сервис персональных рекомендаций будет недоступен.")
-    except Exception as e:
-        logger.error(f"Ошибка инициализации OpenAI или проверки ключа: {e}")
-        logger.warning("OpenAI будет отключен.")
-else:
-    logger.warning("!!! ВНИМАНИЕ: OpenAI API Ключ не установлен или недействителен !!!")
-    logger.warning("Сервис персональных рекомендаций будет недоступен.")
+# The client is created on first use and the key is checked by a background probe,
+# so neither worker startup nor the first request waits on api.openai.com
+openai_service = OpenAIService(OPENAI_API_KEY, base_url=os.environ.get("OPENAI_BASE_URL"))
 
 
 # --- Constants ---
@@ -61,6 +104,61 @@ SOCHI_LON = 39.7303
 SEARCH_RADIUS_METERS = 15000
 RESULT_LIMIT = 50
 
+# --- Places cache ---
+# Sochi POIs barely change within a day, so repeated searches are served from the cache.
+# It lives in a SQLite file shared by every worker on the host (see shared_cache.py);
+# SHARED_CACHE_PATH="" falls back to a per-process in-memory cache.
+PLACES_CACHE_TTL_SECONDS = int(os.environ.get("PLACES_CACHE_TTL_SECONDS", 12 * 60 * 60))
+PLACES_CACHE_MAX_ENTRIES = int(os.environ.get("PLACES_CACHE_MAX_ENTRIES", 1000))
+places_cache = open_shared_cache("places", ttl=PLACES_CACHE_TTL_SECONDS, max_entries=PLACES_CACHE_MAX_ENTRIES)
+if places_cache is None:
+    places_cache = TTLLRUCache(max_entries=256, ttl=PLACES_CACHE_TTL_SECONDS)
+# 'fanout' fetches and caches every category (its group of Geoapify codes) separately and merges locally,
+# 'combined' sends all codes in one request
+PLACES_SEARCH_MODE = os.environ.get("PLACES_SEARCH_MODE", MODE_FANOUT)
+# Optional offline POI store (see poi_store.py); when set, searches are served locally
+POI_STORE_PATH = os.environ.get("POI_STORE_PATH")
+places_engine = PlaceSearchEngine(places_cache, SOCHI_LAT, SOCHI_LON, SEARCH_RADIUS_METERS, RESULT_LIMIT,
+                                  mode=PLACES_SEARCH_MODE, store=load_store(POI_STORE_PATH))
+
+# --- LLM recommendations cache ---
+# The prompt depends only on the selected categories and the language, so answers are kept
+# on disk across restarts. Bump LLM_PROMPT_VERSION whenever the prompt changes (the model is part of the key).
+LLM_MODEL = "gpt-3.5-turbo"
+LLM_TEMPERATURE = 0.7
+LLM_MAX_TOKENS = 450 # Increased slightly for potentially longer translated text
+LLM_PROMPT_VERSION = "1"
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", shared_cache_path() or os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_recommendations.sqlite3"))
+LLM_CACHE_TTL_SECONDS = int(os.environ.get("LLM_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 5000))
+llm_cache = RecommendationCache(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL_SECONDS, max_entries=LLM_CACHE_MAX_ENTRIES)
+# Recommendations generated offline by llm_precompute.py; with LLM_PRECOMPUTED_ONLY=1
+# /search never calls OpenAI on the request path
+LLM_PRECOMPUTED_PATH = os.environ.get("LLM_PRECOMPUTED_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_precomputed.sqlite3"))
+LLM_PRECOMPUTED_ONLY = os.environ.get("LLM_PRECOMPUTED_ONLY", "0") == "1"
+llm_store = RecommendationStore(LLM_PRECOMPUTED_PATH)
+if llm_store.meta.get('model', LLM_MODEL) != LLM_MODEL:
+    # Store keys include the model (see llm_key_version), so none of its entries will match
+    logger.warning(f"Хранилище рекомендаций {LLM_PRECOMPUTED_PATH} построено для модели "
+                   f"{llm_store.meta['model']}, а приложение использует {LLM_MODEL}: записи не используются.")
+# Streaming mode: /search renders without waiting for OpenAI and the page pulls the text
+# from /recommendations/stream/<token>. The token is the selection itself, signed with the
+# app secret key, so whichever worker receives the EventSource request can serve it
+LLM_STREAMING = os.environ.get("LLM_STREAMING", "1") == "1"
+LLM_STREAM_TOKEN_MAX_AGE = 5 * 60
+llm_stream_tokens = URLSafeTimedSerializer(app.secret_key, salt='llm-stream')
+
+# --- /search fan-out ---
+# RZD, Geoapify and OpenAI are called concurrently; the page is assembled from whatever
+# has finished by the deadline. A section that is already running cannot be cancelled:
+# it holds its worker thread until its upstream call returns. The Geoapify and OpenAI
+# timeouts are therefore capped at the time left before the deadline (RZD gets the deadline itself).
+SEARCH_DEADLINE_SECONDS = float(os.environ.get("SEARCH_DEADLINE_SECONDS", 20))
+GEOAPIFY_TIMEOUT_SECONDS = 25
+MIN_UPSTREAM_TIMEOUT_SECONDS = 1
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", 32))
+search_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+
 # --- SUPPORTED LANGUAGES ---
 SUPPORTED_LANGUAGES = ['ru', 'en', 'fa']
 DEFAULT_LANGUAGE = 'ru'
@@ -147,6 +245,8 @@ LANGUAGES = {
         "show_on_map": "Показать на карте (OpenStreetMap)",
         "place_type": "Тип",
         "llm_unavailable_no_client": "Сервис персональных рекомендаций недоступен (OpenAI не настроен).",
+        "llm_openai_unavailable": "Сервис персональных рекомендаций временно недоступен, попробуйте позже.",
+        "llm_precomputed_missing": "Сервис персональных рекомендаций недоступен: для этого набора категорий нет готовой рекомендации.",
         "llm_openai_auth_error": "Сервис персональных рекомендаций временно недоступен из-за проблемы с доступом к AI.",
         "llm_openai_rate_limit_error": "Сервис персональных рекомендаций временно недоступен из-за высокой нагрузки.",
         "llm_openai_timeout_error": "Сервис персональных рекомендаций не ответил вовремя.",
@@ -200,6 +300,8 @@ LANGUAGES = {
         "show_on_map": "Show on map (OpenStreetMap)",
         "place_type": "Type",
         "llm_unavailable_no_client": "Personal recommendation service unavailable (OpenAI not configured).",
+        "llm_openai_unavailable": "Personal recommendation service is temporarily unavailable, please try again later.",
+        "llm_precomputed_missing": "Personal recommendation service unavailable: there is no precomputed recommendation for this selection.",
         "llm_openai_auth_error": "Personal recommendation service temporarily unavailable due to an AI access issue.",
         "llm_openai_rate_limit_error": "Personal recommendation service temporarily unavailable due to high load.",
         "llm_openai_timeout_error": "Personal recommendation service did not respond in time.",
@@ -254,6 +356,8 @@ LANGUAGES = {
         "show_on_map": "نمایش روی نقشه (OpenStreetMap)",
         "place_type": "نوع",
         "llm_unavailable_no_client": "سرویس توصیه‌های شخصی در دسترس نیست (OpenAI پیکربندی نشده است).",
+        "llm_openai_unavailable": "سرویس توصیه‌های شخصی موقتاً در دسترس نیست، لطفاً بعداً دوباره امتحان کنید.",
+        "llm_precomputed_missing": "سرویس توصیه‌های شخصی در دسترس نیست: برای این مجموعه دسته‌ها توصیه آماده‌ای وجود ندارد.",
         "llm_openai_auth_error": "سرویس توصیه‌های شخصی به دلیل مشکل دسترسی به هوش مصنوعی موقتاً در دسترس نیست.",
         "llm_openai_rate_limit_error": "سرویس توصیه‌های شخصی به دلیل بار زیاد موقتاً در دسترس نیست.",
         "llm_openai_timeout_error": "سرویس توصیه‌های شخصی به موقع پاسخ نداد.",
@@ -267,8 +371,12 @@ LANGUAGES = {
     },
 }
 
+# Flat per-language tables with pre-parsed templates, compiled on first use of a language (see i18n.py)
+catalog = Catalog(LANGUAGES, DEFAULT_LANGUAGE, CATEGORIES)
+
 LLM_ERROR_MESSAGE_FRAGMENTS = [ # Keep these base fragments for checking
     "Сервис персональных рекомендаций недоступен", "Personal recommendation service unavailable", "سرویس توصیه‌های شخصی در دسترس نیست",
+    "Сервис персональных рекомендаций временно недоступен", "Personal recommendation service is temporarily unavailable", "سرویس توصیه‌های شخصی موقتاً در دسترس نیست",
     "Не удалось получить конкретные рекомендации", "Could not get specific recommendations", "دریافت توصیه‌های مشخص از هوش مصنوعی ناموفق بود",
     "проблемы с доступом к AI", "AI access issue", "مشکل دسترسی به هوش مصنوعی",
     "высокой нагрузки", "high load", "بار زیاد",
@@ -288,15 +396,19 @@ def get_current_language():
     session['language'] = lang # Store in session for persistence
     return lang
 
+def translate(lang, text_key, **kwargs):
+    """Text for text_key in lang (shared with the ASGI app in asgi_app.py)."""
+    # Fallback chain (current lang -> default lang -> key itself) is resolved when the catalog compiles
+    return catalog.translate(lang, text_key, **kwargs)
+
 def _(text_key, **kwargs):
-    """Translation helper using the LANGUAGES dictionary."""
-    lang = g.get('language', DEFAULT_LANGUAGE)
-    # Fallback chain: current lang -> default lang -> key itself
-    return LANGUAGES.get(lang, {}).get(text_key, LANGUAGES.get(DEFAULT_LANGUAGE, {}).get(text_key, text_key)).format(**kwargs)
+    """Translation helper for the language of the current request."""
+    return catalog.translate(g.get('language', DEFAULT_LANGUAGE), text_key, **kwargs)
 
 @app.before_request
 def before_request():
     """Set language globally for the request using Flask's 'g' object."""
+    start_background_tasks()
     g.language = get_current_language()
     # Make translation helper available globally in templates via 'g'
     g.translate = _
@@ -306,11 +418,8 @@ def before_request():
     g.text_dir = 'rtl' if g.language == 'fa' else 'ltr'
 
 # --- LLM Recommendation Function ---
-def get_llm_recommendations(interests_list, lang_code):
-    """Generates travel recommendations using OpenAI based on selected interests."""
-    if not openai_enabled or not openai_client:
-         return _("llm_unavailable_no_client")
-
+def build_llm_messages(interests_list, lang_code):
+    """Chat messages for the recommendations prompt (shared with the offline precompute job)."""
     interests_str = ", ".join(interests_list)
     # Determine the target audience description and desired output language based on lang_code
     # Default to Russian for the prompt itself, but tailor audience and output language
@@ -338,38 +447,248 @@ def get_llm_recommendations(interests_list, lang_code):
         f"Не включай в ответ приветствия или завершающие фразы, только сами рекомендации списком или абзацами."
         f"Если выбраны 'Железные дороги', можешь упомянуть удобство поездов."
     )
+    return [
+        {"role": "system", "content": "Ты - полезный туристический ассистент."},
+        {"role": "user", "content": prompt}
+    ]
+
+def llm_key_version(model=None):
+    """Version part of the cache and precomputed store keys: an answer is reused only for the same prompt and model."""
+    return f"{LLM_PROMPT_VERSION}:{model or LLM_MODEL}"
+
+def _llm_cache_key(internal_values, lang_code):
+    return recommendation_cache_key(internal_values, lang_code, llm_key_version())
+
+def get_ready_recommendation(internal_values, lang_code):
+    """Precomputed or cached recommendation for the selection (None if OpenAI would have to be called)."""
+    if not internal_values:
+        return None
+    key = _llm_cache_key(internal_values, lang_code)
+    precomputed = llm_store.get(key)
+    if precomputed is not None:
+        return precomputed
+    cached = llm_cache.get(key)
+    if cached is not None:
+        logger.info(f"Рекомендации для {internal_values} ({lang_code}) взяты из кэша.")
+    return cached
+
+def llm_error_key(e):
+    """Translation key of the user-facing message for an OpenAI exception (logged here)."""
+    import openai
+    openai_service.record_failure(e)
+    if isinstance(e, openai.AuthenticationError):
+        logger.error(f"Ошибка аутентификации OpenAI: {e}", exc_info=True)
+        return "llm_openai_auth_error"
+    if isinstance(e, openai.RateLimitError):
+        logger.error(f"Ошибка лимита запросов OpenAI: {e}", exc_info=True)
+        return "llm_openai_rate_limit_error"
+    if isinstance(e, openai.APITimeoutError):
+        logger.error(f"Таймаут запроса к OpenAI: {e}", exc_info=True)
+        return "llm_openai_timeout_error"
+    if isinstance(e, openai.APIConnectionError):
+        logger.error(f"Ошибка соединения с OpenAI API: {e}", exc_info=True)
+        return "llm_openai_generic_error" # Generic error for connection issues too
+    logger.error(f"Неожиданная ошибка при запросе к OpenAI API: {e}", exc_info=True)
+    return "llm_openai_generic_error"
+
+def _llm_error_message(e):
+    """Translated user-facing message for an OpenAI exception (logged here)."""
+    return _(llm_error_key(e))
+
+def llm_unavailable_key():
+    """
+    Translation key explaining why OpenAI is not used right now: LLM_PRECOMPUTED_ONLY with no stored
+    answer for the selection, not configured, key rejected or service down.
+    """
+    if LLM_PRECOMPUTED_ONLY:
+        return "llm_precomputed_missing"
+    if openai_service.status == STATUS_AUTH_ERROR:
+        return "llm_openai_auth_error"
+    if openai_service.status == STATUS_UNAVAILABLE:
+        return "llm_openai_unavailable"
+    return "llm_unavailable_no_client"
+
+def get_llm_recommendations(interests_list, lang_code, internal_values=None, deadline=None):
+    """
+    Generates travel recommendations using OpenAI based on selected interests.
+    When internal_values (category codes of the same selection) are given, successful
+    answers are served from and stored in the persistent recommendations cache.
+    With a deadline (time.perf_counter()), the OpenAI request times out by then and is not retried.
+    """
+    ready = get_ready_recommendation(internal_values, lang_code)
+    if ready is not None:
+        return ready
+
+    if not openai_service.enabled or LLM_PRECOMPUTED_ONLY:
+         return _(llm_unavailable_key())
+
     try:
-        logger.info(f"Запрос к OpenAI для рекомендаций (язык: {lang_code}). Интересы: {interests_str}")
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Ты - полезный туристический ассистент."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=450 # Increased slightly for potentially longer translated text
+        logger.info(f"Запрос к OpenAI для рекомендаций (язык: {lang_code}). Интересы: {', '.join(interests_list)}")
+        client = openai_service.client
+        if deadline is not None:
+            client = client.with_options(timeout=_remaining_timeout(deadline, SEARCH_DEADLINE_SECONDS), max_retries=0)
+        response = client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=build_llm_messages(interests_list, lang_code),
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS
         )
         recommendation = response.choices[0].message.content.strip()
         if not recommendation:
             logger.warning("OpenAI вернул пустой ответ.")
             return _("llm_empty_response_error")
         logger.info(f"OpenAI вернул рекомендации.")
+        if internal_values:
+            llm_cache.set(_llm_cache_key(internal_values, lang_code), recommendation)
         return recommendation
-    except openai.AuthenticationError as e:
-         logger.error(f"Ошибка аутентификации OpenAI: {e}", exc_info=True)
-         return _("llm_openai_auth_error")
-    except openai.RateLimitError as e:
-         logger.error(f"Ошибка лимита запросов OpenAI: {e}", exc_info=True)
-         return _("llm_openai_rate_limit_error")
-    except openai.APITimeoutError as e:
-         logger.error(f"Таймаут запроса к OpenAI: {e}", exc_info=True)
-         return _("llm_openai_timeout_error")
-    except openai.APIConnectionError as e:
-        logger.error(f"Ошибка соединения с OpenAI API: {e}", exc_info=True)
-        return _("llm_openai_generic_error") # Generic error for connection issues too
     except Exception as e:
-        logger.error(f"Неожиданная ошибка при запросе к OpenAI API: {e}", exc_info=True)
-        return _("llm_openai_generic_error")
+        return _llm_error_message(e)
+
+def stream_llm_recommendations(interests_list, lang_code, internal_values=None):
+    """
+    Same as get_llm_recommendations, but yields ('text', chunk) pieces as OpenAI generates them,
+    finishing with ('done', '') or ('failure', message). The full text is cached at the end.
+    """
+    ready = get_ready_recommendation(internal_values, lang_code)
+    if ready is not None:
+        yield 'text', ready
+        yield 'done', ''
+        return
+
+    # The stream URL may outlive the OpenAI status it was issued under (key rejected, service down)
+    if not openai_service.enabled or LLM_PRECOMPUTED_ONLY:
+        yield 'failure', _(llm_unavailable_key())
+        return
+
+    parts = []
+    try:
+        logger.info(f"Потоковый запрос к OpenAI для рекомендаций (язык: {lang_code}). Интересы: {', '.join(interests_list)}")
+        stream = openai_service.client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=build_llm_messages(interests_list, lang_code),
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS,
+            stream=True
+        )
+        for chunk in stream:
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                # Leading whitespace is dropped like .strip() does for the non-streaming answer
+                if not parts:
+                    text = text.lstrip()
+                    if not text:
+                        continue
+                parts.append(text)
+                yield 'text', text
+    except Exception as e:
+        # Logged and passed to openai_service.record_failure (a rejected key disables OpenAI right away)
+        yield 'failure', _llm_error_message(e)
+        return
+
+    recommendation = "".join(parts).strip()
+    if not recommendation:
+        logger.warning("OpenAI вернул пустой ответ.")
+        yield 'failure', _("llm_empty_response_error")
+        return
+    logger.info(f"OpenAI вернул рекомендации (поток).")
+    if internal_values:
+        llm_cache.set(_llm_cache_key(internal_values, lang_code), recommendation)
+    yield 'done', ''
+
+
+# --- /search helpers (shared with asgi_app.py) ---
+def parse_selection(selected_display_names, lang):
+    """
+    Maps the selected category names of lang to what /search needs:
+    (Geoapify code groups, one per category, RZD selected, internal values, display names of the Geoapify categories).
+    """
+    geoapify_category_groups = []
+    rzd_selected = False
+    language = catalog.language(lang)
+    # Map selected display names back to their codes/special values
+    selected_internal_values = [] # Internal values (codes or 'rzd_schedule')
+    human_readable_selected_geo = [] # Just the display names for Geoapify cats
+
+    for display_name in selected_display_names:
+        # Find the internal value (code or 'rzd_schedule') for the display name in the current language
+        internal_value = language.categories.get(display_name)
+
+        if internal_value:
+            selected_internal_values.append(internal_value)
+            if internal_value == "rzd_schedule":
+                rzd_selected = True
+            elif internal_value: # Ensure it's not empty and not rzd
+                geoapify_category_groups.append(language.category_codes[display_name])
+                human_readable_selected_geo.append(display_name) # Add display name for Geoapify category
+        else:
+            # Log if a selected display name wasn't found (potential mismatch or error)
+            logger.warning(f"Выбранное имя категории '{display_name}' не найдено для языка '{lang}'. Пропуск.")
+    return geoapify_category_groups, rzd_selected, selected_internal_values, human_readable_selected_geo
+
+def features_to_places(features, address_not_specified):
+    """Place dicts for results.html from Geoapify features (features without name or coordinates are skipped)."""
+    found_places = []
+    for feature in features or []:
+        properties = feature.get('properties', {})
+        # Prioritize 'name', fallback to datasource raw name
+        name = properties.get('name', properties.get('datasource', {}).get('raw', {}).get('name'))
+        lon = properties.get('lon')
+        lat = properties.get('lat')
+
+        if name and lon is not None and lat is not None:
+            # Try specific address fields first, then formatted, then default
+            address_parts = [properties.get('street'), properties.get('housenumber')]
+            address_line = " ".join(filter(None, address_parts))
+            address = address_line or properties.get('address_line2') or properties.get('formatted') or address_not_specified
+
+            place_categories = properties.get('categories', [])
+            # Create OpenStreetMap link
+            map_link = f"https://www.openstreetmap.org/?mlat={lat}&mlon={lon}#map=16/{lat}/{lon}"
+            # Clean categories for display (e.g., leisure.park -> park)
+            cleaned_categories = [cat.split('.')[-1].replace('_', ' ') for cat in place_categories]
+
+            found_places.append({
+                'name': name, 'lat': lat, 'lon': lon, 'map_link': map_link,
+                'address': address, 'place_categories': cleaned_categories,
+            })
+        else:
+            # Log skipped places for debugging
+            logger.warning(f"Пропущено место Geoapify из-за отсутствия name, lon или lat: properties={properties}")
+    return found_places
+
+# --- Concurrent /search sections ---
+def _remaining_timeout(deadline, limit):
+    """Upstream timeout in seconds: at most limit and at most the time left until deadline (time.perf_counter)."""
+    return max(min(limit, deadline - time.perf_counter()), MIN_UPSTREAM_TIMEOUT_SECONDS)
+
+def _submit_timed(timings, section, func, *args):
+    """Runs func(*args) on search_executor; its duration in seconds ends up in timings[section]."""
+    def run():
+        section_started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            timings[section] = time.perf_counter() - section_started
+    return search_executor.submit(run)
+
+def _with_language(lang, func):
+    """Wraps func to run in an app context of its own with g.language set, so _() works in a worker thread."""
+    def run(*args):
+        with app.app_context():
+            g.language = lang
+            return func(*args)
+    return run
+
+def _server_timing(timings, timed_out, total):
+    """Server-Timing header value: one metric per section plus the whole fan-out, in milliseconds."""
+    metrics = []
+    for section in timed_out:
+        metrics.append(f'{section};dur={total * 1000:.1f};desc="deadline"')
+    for section, seconds in timings.items():
+        if section not in timed_out:
+            metrics.append(f"{section};dur={seconds * 1000:.1f}")
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
 
 
 # --- Routes ---
@@ -377,8 +696,7 @@ def get_llm_recommendations(interests_list, lang_code):
 def index():
     """Screen 1: Display category selection form."""
     # Language is set in g via before_request
-    lang_categories = CATEGORIES.get(g.language, CATEGORIES[DEFAULT_LANGUAGE])
-    return render_template('index.html', categories=lang_categories)
+    return render_template('index.html', categories=catalog.categories(g.language))
 
 
 @app.route('/search')
@@ -387,6 +705,7 @@ def search_places():
     Screen 2 (processing): Get RZD, Geoapify, LLM data.
     Screen 3 (display): Show results.
     """
+    import requests
     # g.language is set by before_request
     lang = g.language
     # Get category display names from the form (will be in current language)
@@ -397,28 +716,8 @@ def search_places():
         return redirect(url_for('index', lang=lang)) # Keep lang parameter
 
     # --- Process Selected Categories ---
-    geoapify_categories_set = set()
-    rzd_selected = False
-    current_lang_categories = CATEGORIES.get(lang, CATEGORIES[DEFAULT_LANGUAGE])
-    # Map selected display names back to their codes/special values
-    selected_internal_values = [] # Internal values (codes or 'rzd_schedule')
-    human_readable_selected_geo = [] # Just the display names for Geoapify cats
-
-    for display_name in selected_display_names:
-        # Find the internal value (code or 'rzd_schedule') for the display name in the current language
-        internal_value = current_lang_categories.get(display_name)
-
-        if internal_value:
-            selected_internal_values.append(internal_value)
-            if internal_value == "rzd_schedule":
-                rzd_selected = True
-            elif internal_value: # Ensure it's not empty and not rzd
-                codes = internal_value.split(',')
-                geoapify_categories_set.update(c.strip() for c in codes if c.strip())
-                human_readable_selected_geo.append(display_name) # Add display name for Geoapify category
-        else:
-            # Log if a selected display name wasn't found (potential mismatch or error)
-            logger.warning(f"Выбранное имя категории '{display_name}' не найдено для языка '{lang}'. Пропуск.")
+    geoapify_category_groups, rzd_selected, selected_internal_values, human_readable_selected_geo = \
+        parse_selection(selected_display_names, lang)
 
 
     # --- Initialize result variables ---
@@ -426,72 +725,103 @@ def search_places():
     geoapify_error_key = None # Store the translation key for the error
     geoapify_error_details = None
     llm_recommendations = ""
+    llm_stream_url = None
     is_llm_error = False
     rzd_arrivals = []
     rzd_departures = []
     rzd_error_message = None # Store the actual RZD error message string
 
-    # --- Call RZD Parser if selected ---
+    # --- Launch RZD, Geoapify and LLM concurrently under one deadline ---
+    # Workers only call the upstream services; results are processed and flashed here,
+    # on the request thread, once the deadline has passed or every section has finished.
+    search_started = time.perf_counter()
+    search_deadline = search_started + SEARCH_DEADLINE_SECONDS
+    timings = {}
+    futures = {}
+
     if rzd_selected:
         if rzd_parser_available:
             logger.info("Вызов парсера РЖД...")
-            try:
-                rzd_arrivals, rzd_departures, rzd_error_message = get_sochi_schedule()
-                if rzd_error_message:
-                    # Use the already generated error message from the parser
-                    flash(f"{_('rzd_fetch_error')}: {rzd_error_message}", "warning")
-            except Exception as e:
-                logger.error(f"Неожиданная ошибка при вызове get_sochi_schedule: {e}", exc_info=True)
-                flash(_("rzd_fetch_error"), "danger") # Generic error
+            futures['rzd'] = _submit_timed(timings, 'rzd', get_sochi_schedule, SEARCH_DEADLINE_SECONDS)
         else:
             flash(_("rzd_module_error"), "danger")
 
-    # --- Call Geoapify API if other categories are selected ---
-    if geoapify_categories_set:
-        api_params = {
-            'categories': ",".join(sorted(list(geoapify_categories_set))),
-            'filter': f"circle:{SOCHI_LON},{SOCHI_LAT},{SEARCH_RADIUS_METERS}",
-            'bias': f"proximity:{SOCHI_LON},{SOCHI_LAT}",
-            'limit': RESULT_LIMIT,
-            'apiKey': GEOAPIFY_API_KEY,
-            'lang': lang # Pass current language to Geoapify
-        }
+    if geoapify_category_groups:
         api_url = "https://api.geoapify.com/v2/places"
-        try:
+
+        def fetch_geoapify(codes):
+            api_params = {
+                'categories': ",".join(codes),
+                'filter': f"circle:{SOCHI_LON},{SOCHI_LAT},{SEARCH_RADIUS_METERS}",
+                'bias': f"proximity:{SOCHI_LON},{SOCHI_LAT}",
+                'limit': RESULT_LIMIT,
+                'apiKey': GEOAPIFY_API_KEY,
+                'lang': lang # Pass current language to Geoapify
+            }
             logger.info(f"Запрос к Geoapify: categories={api_params['categories']}, filter={api_params['filter']}, lang={lang}")
-            response = requests.get(api_url, params=api_params, timeout=25) # Increased timeout slightly
+            response = requests.get(api_url, params=api_params,
+                                    timeout=_remaining_timeout(search_deadline, GEOAPIFY_TIMEOUT_SECONDS))
             response.raise_for_status() # Raises HTTPError for bad responses (4xx or 5xx)
-            data = response.json()
-            logger.info(f"Ответ Geoapify: {len(data.get('features', []))} features.")
+            features = response.json().get('features', [])
+            logger.info(f"Ответ Geoapify: {len(features)} features.")
+            return features
+
+        futures['places'] = _submit_timed(timings, 'places', places_engine.search, geoapify_category_groups, fetch_geoapify, lang)
+
+    # Only attempt if OpenAI is enabled (or precomputed answers exist) and user selected *any* category
+    openai_enabled = openai_service.enabled
+    if (openai_enabled or len(llm_store)) and selected_display_names:
+        # The cache key is only well-defined when every selected name maps to a category
+        cacheable = len(selected_internal_values) == len(selected_display_names)
+        llm_internal_values = selected_internal_values if cacheable else None
+        if LLM_STREAMING and openai_enabled and not LLM_PRECOMPUTED_ONLY:
+            llm_recommendations = get_ready_recommendation(llm_internal_values, lang) or ""
+            if not llm_recommendations:
+                # Render places and trains right away; the text streams in from stream_recommendations
+                llm_stream_token = llm_stream_tokens.dumps([selected_display_names, lang, llm_internal_values])
+                llm_stream_url = url_for('stream_recommendations', token=llm_stream_token)
+        if not llm_recommendations and not llm_stream_url:
+            # Pass selected display names (user-facing) and current language code
+            futures['llm'] = _submit_timed(timings, 'llm', _with_language(lang, get_llm_recommendations),
+                                           selected_display_names, lang, llm_internal_values, search_deadline)
+    elif selected_display_names and not openai_enabled: # Only show if relevant (categories selected but OpenAI off)
+         llm_recommendations = _(llm_unavailable_key())
+         is_llm_error = True
+         flash(llm_recommendations, "info") # Use 'info' for status messages like this
+
+    timed_out = set()
+    if futures:
+        wait(futures.values(), timeout=SEARCH_DEADLINE_SECONDS)
+        for section, future in futures.items():
+            if not future.done():
+                # Only drops a section that has not started yet; a running one finishes
+                # within its capped upstream timeout and still fills its cache
+                future.cancel()
+                timed_out.add(section)
+                logger.warning(f"/search: раздел '{section}' не уложился в {SEARCH_DEADLINE_SECONDS} с, страница собирается без него.")
+
+    # --- RZD result ---
+    if 'rzd' in timed_out:
+        flash(_("rzd_fetch_error"), "warning")
+    elif 'rzd' in futures:
+        try:
+            rzd_arrivals, rzd_departures, rzd_error_message = futures['rzd'].result()
+            if rzd_error_message:
+                # Use the already generated error message from the parser
+                flash(f"{_('rzd_fetch_error')}: {rzd_error_message}", "warning")
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при вызове get_sochi_schedule: {e}", exc_info=True)
+            flash(_("rzd_fetch_error"), "danger") # Generic error
+
+    # --- Geoapify result ---
+    if 'places' in futures:
+        try:
+            if 'places' in timed_out:
+                raise requests.exceptions.Timeout(f"deadline {SEARCH_DEADLINE_SECONDS} s")
+            features = futures['places'].result()
 
             # Process Geoapify results
-            if data.get('features'):
-                for feature in data['features']:
-                    properties = feature.get('properties', {})
-                    # Prioritize 'name', fallback to datasource raw name
-                    name = properties.get('name', properties.get('datasource', {}).get('raw', {}).get('name'))
-                    lon = properties.get('lon')
-                    lat = properties.get('lat')
-
-                    if name and lon is not None and lat is not None:
-                        # Try specific address fields first, then formatted, then default
-                        address_parts = [properties.get('street'), properties.get('housenumber')]
-                        address_line = " ".join(filter(None, address_parts))
-                        address = address_line or properties.get('address_line2') or properties.get('formatted') or _("address_not_specified")
-
-                        place_categories = properties.get('categories', [])
-                        # Create OpenStreetMap link
-                        map_link = f"https://www.openstreetmap.org/?mlat={lat}&mlon={lon}#map=16/{lat}/{lon}"
-                        # Clean categories for display (e.g., leisure.park -> park)
-                        cleaned_categories = [cat.split('.')[-1].replace('_', ' ') for cat in place_categories]
-
-                        found_places.append({
-                            'name': name, 'lat': lat, 'lon': lon, 'map_link': map_link,
-                            'address': address, 'place_categories': cleaned_categories,
-                        })
-                    else:
-                        # Log skipped places for debugging
-                        logger.warning(f"Пропущено место Geoapify из-за отсутствия name, lon или lat: properties={properties}")
+            found_places = features_to_places(features, _("address_not_specified"))
 
             # If no places found AND no previous error occurred, show info message
             if not found_places and not geoapify_error_key:
@@ -524,13 +854,13 @@ def search_places():
         if geoapify_error_key:
              flash(f"{_('error_prefix')}: {_('search_error')} - {_(geoapify_error_key, **(geoapify_error_details or {}))}", "danger")
 
-
-    # --- Get LLM Recommendations ---
-    # Only attempt if OpenAI is enabled and user selected *any* category
-    if openai_enabled and selected_display_names:
+    # --- LLM result ---
+    if 'llm' in futures:
         try:
-            # Pass selected display names (user-facing) and current language code
-            llm_recommendations = get_llm_recommendations(selected_display_names, lang)
+            if 'llm' in timed_out:
+                llm_recommendations = _("llm_openai_timeout_error")
+            else:
+                llm_recommendations = futures['llm'].result()
             # Check if the result is an error message based on known fragments
             if llm_recommendations and any(error_frag in llm_recommendations for error_frag in LLM_ERROR_MESSAGE_FRAGMENTS):
                 is_llm_error = True
@@ -546,24 +876,92 @@ def search_places():
             llm_recommendations = _("llm_result_error_text") # Use translated fallback
             is_llm_error = True
             flash(llm_recommendations, "warning") # Flash the fallback message
-    elif selected_display_names and not openai_enabled: # Only show if relevant (categories selected but OpenAI off)
-         llm_recommendations = _("llm_unavailable_no_client")
-         is_llm_error = True
-         flash(llm_recommendations, "info") # Use 'info' for status messages like this
 
+    search_total = time.perf_counter() - search_started
+    # Late sections may still write their timing, so work on a snapshot
+    section_timings = {section: seconds for section, seconds in dict(timings).items() if section not in timed_out}
+    logger.info(f"/search: {', '.join(f'{s}={t * 1000:.0f} мс' for s, t in section_timings.items()) or 'без внешних запросов'}"
+                f"{', по сроку: ' + ', '.join(sorted(timed_out)) if timed_out else ''}; всего {search_total * 1000:.0f} мс")
 
     # --- Render Results Page ---
-    return render_template('results.html',
+    response = make_response(render_template('results.html',
                            places=found_places,
                            # Error messages are now handled by flash, no need to pass 'error'
                            selected_categories=selected_display_names, # Show user-friendly names
                            llm_recommendations=llm_recommendations,
+                           llm_stream_url=llm_stream_url,
+                           llm_stream_failure=_("llm_result_error_text"),
                            is_llm_error=is_llm_error,
                            rzd_arrivals=rzd_arrivals,
                            rzd_departures=rzd_departures,
                            # rzd_error is handled by flash
                            rzd_selected=rzd_selected
-                           )
+                           ))
+    response.headers['Server-Timing'] = _server_timing(section_timings, sorted(timed_out), search_total)
+    return response
+
+@app.route('/recommendations/stream/<token>')
+def stream_recommendations(token):
+    """Server-sent events with the recommendation text as OpenAI generates it (see results.html)."""
+    try:
+        interests_list, lang_code, internal_values = llm_stream_tokens.loads(token, max_age=LLM_STREAM_TOKEN_MAX_AGE)
+    except (BadSignature, ValueError):
+        return jsonify(error="Unknown or expired recommendation stream"), 404
+
+    def events():
+        for event, data in stream_llm_recommendations(interests_list, lang_code, internal_values):
+            # JSON keeps newlines of the text inside a single SSE data line
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Hit/miss counters of the in-process caches and coalesced upstream calls (JSON)."""
+    stats = {'places': places_engine.stats(), 'llm': llm_cache.stats(), 'llm_precomputed': llm_store.stats(),
+             'openai': openai_service.stats()}
+    if _rzd_module is not None:
+        stats['rzd_coalesced'] = _rzd_module.schedule_flight.stats()
+        stats['rzd_schedule'] = _rzd_module.schedule_cache.stats()
+    return jsonify(**stats)
+
+@app.route('/rzd/upcoming')
+def rzd_upcoming():
+    """Next few Sochi trains from now (JSON): ?event=arrival|departure&count=N."""
+    rzd = load_rzd()
+    if rzd is None:
+        return jsonify(error=_("rzd_module_error")), 503
+    event_type = request.args.get('event', 'departure')
+    if event_type not in rzd.EVENT_TYPES:
+        return jsonify(error=f"Unknown event type: {event_type}"), 400
+    count = min(max(request.args.get('count', rzd.LAST_FLIGHTS_COUNT, type=int), 1), 50)
+    return jsonify(event=event_type, trains=rzd.get_upcoming_trains(event_type, count))
+
+@app.route('/rzd/board')
+def rzd_board():
+    """Combined Greater Sochi arrivals/departures board (JSON): ?date=YYYY-MM-DD&stations=sochi,adler,..."""
+    rzd = load_rzd()
+    if rzd is None:
+        return jsonify(error=_("rzd_module_error")), 503
+    keys = [key.strip() for key in request.args.get('stations', '').split(',') if key.strip()] or None
+    unknown = [key for key in keys or () if key not in rzd.GREATER_SOCHI_STATIONS]
+    if unknown:
+        return jsonify(error=f"Unknown stations: {', '.join(unknown)}", stations=list(rzd.GREATER_SOCHI_STATIONS)), 400
+    date = request.args.get('date') or rzd.get_today_date_string()
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return jsonify(error=f"Invalid date: {date}"), 400
+    # Stations without a configured rasp.yandex.ru code (RZD_STATION_CODES / RZD_STATIONS_FILE) are not on the board
+    missing_codes = [station.name_ru for station in rzd.stations_without_codes(keys)]
+    if len(keys or rzd.GREATER_SOCHI_STATIONS) - len(missing_codes) < MIN_BOARD_STATIONS:
+        # Only Sochi has a verified code out of the box; a one-station board would just repeat /rzd/upcoming
+        return jsonify(error=f"The combined board needs at least {MIN_BOARD_STATIONS} stations with codes "
+                             f"(set RZD_STATION_CODES or RZD_STATIONS_FILE)", missing_codes=missing_codes), 503
+    arrivals, departures, failed_stations = rzd.get_greater_sochi_board(keys, date)
+    return jsonify(date=date, arrivals=arrivals, departures=departures, failed_stations=failed_stations,
+                   missing_codes=missing_codes)
 
 # --- Error Handlers ---
 @app.errorhandler(404)
@@ -603,10 +1001,10 @@ if __name__ == '__main__':
     else:
         logger.info("Flask secret_key установлен.")
 
-    if not openai_enabled:
-         logger.warning("Сервис персональных рекомендаций OpenAI неактивен (ключ не найден, невалиден или ошибка инициализации).")
+    if not openai_service.configured:
+         logger.warning("Сервис персональных рекомендаций OpenAI неактивен (ключ не найден или невалиден).")
     else:
-         logger.info("OpenAI клиент инициализирован.")
+         logger.info("OpenAI ключ найден, проверка выполняется в фоне.")
 
     if not rzd_parser_available:
         logger.warning("Парсер РЖД (RZD.py) не импортирован. Функциональность расписания поездов недоступна.")
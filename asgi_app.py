@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+ASGI-вариант веб-приложения (Quart) с теми же маршрутами, что и "app (5).py".
+
+Во Flask-приложении каждый /search занимает поток воркера, пока ждет
+РЖД, Geoapify и OpenAI. Здесь ожидание не держит поток: Geoapify
+запрашивается через AsyncGeoapifyClient (httpx), OpenAI - через
+AsyncOpenAI, поэтому один процесс обслуживает сотни одновременных
+поисков. Парсер РЖД остается синхронным и вызывается в пуле потоков
+(расписание обычно уже лежит в кэше, который прогревает фоновый поток).
+
+Категории, переводы, шаблоны, кэши мест и рекомендаций, промпт и статус
+OpenAI берутся из модуля Flask-приложения, поэтому оба варианта отдают
+одинаковые страницы. Рекомендации здесь ждутся в пределах общего срока
+запроса, без потоковой выдачи.
+
+Запуск: hypercorn asgi_app:app --bind 127.0.0.1:5001
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import sys
+import time
+
+import httpx
+from quart import Quart, flash, g, make_response, redirect, render_template, request, session, url_for
+
+from geoapify_client import AsyncGeoapifyClient
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOCHI_APP_MODULE = "sochi_app"
+GEOAPIFY_TIMEOUT = 25
+GEOAPIFY_MAX_CONNECTIONS = int(os.environ.get("GEOAPIFY_MAX_CONNECTIONS", 50))
+
+
+def load_sochi_app(filename="app (5).py"):
+    """Модуль Flask-приложения (имя файла содержит пробел, поэтому через importlib)."""
+    module = sys.modules.get(SOCHI_APP_MODULE)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(SOCHI_APP_MODULE, os.path.join(ROOT, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[SOCHI_APP_MODULE] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+sochi = load_sochi_app()
+
+app = Quart(__name__)
+app.secret_key = sochi.app.secret_key
+
+geoapify_client = AsyncGeoapifyClient(sochi.GEOAPIFY_API_KEY, timeout=GEOAPIFY_TIMEOUT,
+                                      max_connections=GEOAPIFY_MAX_CONNECTIONS)
+# Разделы, не уложившиеся в срок, дорабатывают в фоне и заполняют кэши;
+# ссылки на задачи держим, чтобы их не собрал сборщик мусора
+_background_tasks = set()
+
+
+def _(text_key, **kwargs):
+    return sochi.catalog.translate(g.get('language', sochi.DEFAULT_LANGUAGE), text_key, **kwargs)
+
+
+@app.before_request
+async def before_request():
+    lang = request.args.get('lang', session.get('language', sochi.DEFAULT_LANGUAGE))
+    if lang not in sochi.SUPPORTED_LANGUAGES:
+        lang = sochi.DEFAULT_LANGUAGE
+    session['language'] = lang
+    g.language = lang
+    g.translate = _
+    g.supported_languages = sochi.SUPPORTED_LANGUAGES
+    g.text_dir = 'rtl' if lang == 'fa' else 'ltr'
+
+
+@app.before_serving
+async def start_background_tasks():
+    # Импорт Flask-приложения фоновых задач не запускает; обновление расписаний РЖД стартует здесь
+    sochi.start_background_tasks()
+
+
+@app.after_serving
+async def close_clients():
+    await geoapify_client.aclose()
+
+
+# --- Разделы /search ---
+
+async def fetch_places(groups, lang):
+    async def fetch(unit_codes):
+        return await geoapify_client.search_features(unit_codes, sochi.SOCHI_LAT, sochi.SOCHI_LON,
+                                                     sochi.SEARCH_RADIUS_METERS, sochi.RESULT_LIMIT, lang)
+    return await sochi.places_engine.search_async(groups, fetch, lang=lang)
+
+
+async def get_llm_recommendations(interests_list, lang_code, internal_values=None):
+    """Как get_llm_recommendations Flask-приложения, но запрос к OpenAI не занимает поток."""
+    ready = sochi.get_ready_recommendation(internal_values, lang_code)
+    if ready is not None:
+        return ready
+    if not sochi.openai_service.enabled or sochi.LLM_PRECOMPUTED_ONLY:
+        return sochi.translate(lang_code, sochi.llm_unavailable_key())
+    try:
+        logger.info(f"Запрос к OpenAI для рекомендаций (язык: {lang_code}). Интересы: {', '.join(interests_list)}")
+        response = await sochi.openai_service.async_client.chat.completions.create(
+            model=sochi.LLM_MODEL,
+            messages=sochi.build_llm_messages(interests_list, lang_code),
+            temperature=sochi.LLM_TEMPERATURE,
+            max_tokens=sochi.LLM_MAX_TOKENS,
+        )
+    except Exception as e:
+        return sochi.translate(lang_code, sochi.llm_error_key(e))
+    recommendation = (response.choices[0].message.content or "").strip()
+    if not recommendation:
+        logger.warning("OpenAI вернул пустой ответ.")
+        return sochi.translate(lang_code, "llm_empty_response_error")
+    if internal_values:
+        sochi.llm_cache.set(sochi._llm_cache_key(internal_values, lang_code), recommendation)
+    return recommendation
+
+
+def geoapify_error(e):
+    """(ключ перевода, параметры) для исключения поиска мест, как в Flask-приложении."""
+    if isinstance(e, (httpx.TimeoutException, asyncio.TimeoutError)):
+        logger.error("Ошибка Geoapify: таймаут запроса")
+        return "geoapify_timeout_error", None
+    if isinstance(e, httpx.HTTPStatusError):
+        status_code = e.response.status_code
+        logger.error(f"Ошибка Geoapify HTTP: {status_code} {e.response.text}")
+        key = {401: "geoapify_http_error_401", 400: "geoapify_http_error_400",
+               429: "geoapify_http_error_429"}.get(status_code, "geoapify_http_error")
+        return key, {'status_code': status_code}
+    if isinstance(e, httpx.TransportError):
+        logger.error(f"Ошибка Geoapify Connection: {e}")
+        return "geoapify_connection_error", None
+    logger.error(f"Неожиданная ошибка при обработке ответа Geoapify: {e}", exc_info=e)
+    return "geoapify_generic_error", None
+
+
+def _timed(timings, section, coroutine):
+    async def run():
+        started = time.perf_counter()
+        try:
+            return await coroutine
+        finally:
+            timings[section] = time.perf_counter() - started
+    return asyncio.ensure_future(run())
+
+
+# --- Маршруты ---
+
+@app.route('/')
+async def index():
+    return await render_template('index.html', categories=sochi.catalog.categories(g.language))
+
+
+@app.route('/search')
+async def search_places():
+    lang = g.language
+    selected_display_names = request.args.getlist('category')
+    if not selected_display_names:
+        await flash(_("no_selection_warning"), "warning")
+        return redirect(url_for('index', lang=lang))
+
+    geoapify_category_groups, rzd_selected, selected_internal_values, human_readable_selected_geo = \
+        sochi.parse_selection(selected_display_names, lang)
+    found_places = []
+    llm_recommendations = ""
+    is_llm_error = False
+    rzd_arrivals, rzd_departures = [], []
+
+    # --- Все разделы запускаются одновременно под общим сроком ---
+    search_started = time.perf_counter()
+    timings = {}
+    tasks = {}
+    if rzd_selected:
+        if sochi.rzd_parser_available:
+            tasks['rzd'] = _timed(timings, 'rzd', asyncio.to_thread(sochi.get_sochi_schedule,
+                                                                    sochi.SEARCH_DEADLINE_SECONDS))
+        else:
+            await flash(_("rzd_module_error"), "danger")
+    if geoapify_category_groups:
+        tasks['places'] = _timed(timings, 'places', fetch_places(geoapify_category_groups, lang))
+    openai_enabled = sochi.openai_service.enabled
+    if (openai_enabled or len(sochi.llm_store)) and selected_display_names:
+        cacheable = len(selected_internal_values) == len(selected_display_names)
+        tasks['llm'] = _timed(timings, 'llm', get_llm_recommendations(
+            selected_display_names, lang, selected_internal_values if cacheable else None))
+    elif selected_display_names and not openai_enabled:
+        llm_recommendations = _(sochi.llm_unavailable_key())
+        is_llm_error = True
+        await flash(llm_recommendations, "info")
+
+    timed_out = set()
+    if tasks:
+        await asyncio.wait(tasks.values(), timeout=sochi.SEARCH_DEADLINE_SECONDS)
+        for section, task in tasks.items():
+            if not task.done():
+                timed_out.add(section)
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+                logger.warning(f"/search: раздел '{section}' не уложился в {sochi.SEARCH_DEADLINE_SECONDS} с, страница собирается без него.")
+
+    # --- РЖД ---
+    if 'rzd' in timed_out:
+        await flash(_("rzd_fetch_error"), "warning")
+    elif 'rzd' in tasks:
+        try:
+            rzd_arrivals, rzd_departures, rzd_error_message = tasks['rzd'].result()
+            if rzd_error_message:
+                await flash(f"{_('rzd_fetch_error')}: {rzd_error_message}", "warning")
+        except Exception as e:
+            logger.error(f"Неожиданная ошибка при вызове get_sochi_schedule: {e}", exc_info=True)
+            await flash(_("rzd_fetch_error"), "danger")
+
+    # --- Geoapify ---
+    if 'places' in tasks:
+        error = asyncio.TimeoutError() if 'places' in timed_out else tasks['places'].exception()
+        if error is None:
+            found_places = sochi.features_to_places(tasks['places'].result(), _("address_not_specified"))
+            if not found_places and human_readable_selected_geo:
+                await flash(_("no_results_info", categories=", ".join(human_readable_selected_geo)), "info")
+        else:
+            error_key, error_details = geoapify_error(error)
+            await flash(f"{_('error_prefix')}: {_('search_error')} - {_(error_key, **(error_details or {}))}", "danger")
+
+    # --- Рекомендации ---
+    if 'llm' in tasks:
+        if 'llm' in timed_out:
+            llm_recommendations = _("llm_openai_timeout_error")
+        elif tasks['llm'].exception() is not None:
+            logger.error(f"Ошибка при вызове get_llm_recommendations: {tasks['llm'].exception()}",
+                         exc_info=tasks['llm'].exception())
+            llm_recommendations = _("llm_result_error_text")
+        else:
+            llm_recommendations = tasks['llm'].result()
+        if llm_recommendations and any(fragment in llm_recommendations for fragment in sochi.LLM_ERROR_MESSAGE_FRAGMENTS):
+            is_llm_error = True
+            logger.warning(f"LLM вернул сообщение об ошибке: {llm_recommendations}")
+            await flash(llm_recommendations, "warning")
+
+    search_total = time.perf_counter() - search_started
+    section_timings = {section: seconds for section, seconds in dict(timings).items() if section not in timed_out}
+    logger.info(f"/search (asgi): {', '.join(f'{s}={t * 1000:.0f} мс' for s, t in section_timings.items()) or 'без внешних запросов'}"
+                f"{', по сроку: ' + ', '.join(sorted(timed_out)) if timed_out else ''}; всего {search_total * 1000:.0f} мс")
+
+    response = await make_response(await render_template(
+        'results.html',
+        places=found_places,
+        selected_categories=selected_display_names,
+        llm_recommendations=llm_recommendations,
+        llm_stream_url=None,
+        is_llm_error=is_llm_error,
+        rzd_arrivals=rzd_arrivals,
+        rzd_departures=rzd_departures,
+        rzd_selected=rzd_selected,
+    ))
+    response.headers['Server-Timing'] = sochi._server_timing(section_timings, sorted(timed_out), search_total)
+    return response
+
+
+# --- Обработчики ошибок ---
+
+@app.errorhandler(404)
+async def page_not_found(e):
+    return await render_template('404.html'), 404
+
+
+@app.errorhandler(500)
+async def internal_server_error(e):
+    logger.error(f"Internal Server Error: {e}", exc_info=True)
+    return await render_template('500.html'), 500
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест /search: WSGI-приложение ("app (5).py") против ASGI (asgi_app.py).
+
+Каждое приложение запускается в отдельном процессе:
+  * wsgi - Flask на werkzeug с фиксированным пулом из --threads потоков
+    (как один воркер gunicorn --worker-class gthread);
+  * asgi - Quart на hypercorn, один процесс и один цикл событий.
+Geoapify заменен заглушкой FakeGeoapifyServer с задержкой --delay, кэш мест
+отключен (PLACES_CACHE_TTL_SECONDS=0), а объединение одинаковых запросов
+выключено, чтобы каждый поиск действительно ждал ответа Geoapify, как
+поиски разных пользователей. OpenAI не настроен, РЖД не запрашивается.
+
+Генератор нагрузки держит --concurrency одновременных запросов в течение
+--duration секунд и выводит число запросов в секунду, p50 и p99 задержки.
+
+Запуск: python benchmarks/bench_asgi.py [--concurrency 200] [--duration 10] [--delay 1] [--threads 16]
+Для ASGI нужны quart и hypercorn (pip install quart hypercorn).
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEARCH_PATH = "/search?lang=en&category=Beaches"
+
+
+def disable_coalescing(engine):
+    """Каждый поиск идет в Geoapify сам, без ожидания соседнего такого же запроса."""
+    async def do_async(key, func):
+        return await func()
+
+    engine.flight.do = lambda key, func: func()
+    engine.async_flight.do = do_async
+
+
+def serve_wsgi(port, places_url, threads):
+    import requests
+    from werkzeug.serving import BaseWSGIServer
+    from modules import load_module
+
+    original_get = requests.get
+
+    def get(url, *a, **kw):
+        if "api.geoapify.com" in url:
+            url = places_url
+        return original_get(url, *a, **kw)
+
+    requests.get = get
+    sochi = load_module("sochi_app", "app (5).py")
+    disable_coalescing(sochi.places_engine)
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request, client_address)
+
+        def process_request_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer("127.0.0.1", port, sochi.app).serve_forever()
+
+
+def serve_asgi(port, places_url):
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    import modules  # noqa: F401 - добавляет корень проекта в sys.path
+    import asgi_app
+
+    asgi_app.geoapify_client.base_url = places_url
+    disable_coalescing(asgi_app.sochi.places_engine)
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.backlog = 1024
+    config.accesslog = None
+    asyncio.run(serve(asgi_app.app, config))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, places_url, threads):
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=HERE, OPENAI_API_KEY="", RZD_BACKGROUND_REFRESH="0",
+               PLACES_CACHE_TTL_SECONDS="0", SHARED_CACHE_PATH="", SEARCH_DEADLINE_SECONDS="60",
+               GEOAPIFY_MAX_CONNECTIONS="1000",
+               LLM_CACHE_PATH=os.path.join(tempfile.mkdtemp(), "cache.sqlite3"),
+               LLM_PRECOMPUTED_PATH=os.path.join(tempfile.mkdtemp(), "missing.sqlite3"))
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", kind, "--port", str(port),
+                                "--places-url", places_url, "--threads", str(threads)],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Сервер {kind} не запустился")
+
+
+async def load(base_url, concurrency, duration):
+    """Держит concurrency одновременных запросов; возвращает (задержки успешных, число ошибок, время)."""
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await client.get(SEARCH_PATH)  # прогрев: шаблоны, клиенты, пулы соединений
+        started = time.perf_counter()
+        stop_at = started + duration
+
+        async def user():
+            nonlocal errors
+            while time.perf_counter() < stop_at:
+                request_started = time.perf_counter()
+                try:
+                    response = await client.get(SEARCH_PATH)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - request_started)
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность нагрузки, секунды")
+    parser.add_argument("--delay", type=float, default=1.0, help="задержка ответа Geoapify, секунды")
+    parser.add_argument("--threads", type=int, default=16, help="потоков в пуле WSGI-сервера")
+    parser.add_argument("--serve", choices=("wsgi", "asgi"), help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--places-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve == "wsgi":
+        serve_wsgi(args.port, args.places_url, args.threads)
+        return
+    if args.serve == "asgi":
+        serve_asgi(args.port, args.places_url)
+        return
+
+    from fakes import FakeGeoapifyServer
+
+    print(f"Geoapify отвечает через {args.delay * 1000:.0f} мс; {args.concurrency} одновременных запросов, "
+          f"{args.duration:.0f} с; WSGI: {args.threads} потоков")
+    print(f"{'сервер':<8}{'запросов':>10}{'ошибок':>8}{'RPS':>9}{'p50, мс':>10}{'p99, мс':>10}")
+    with FakeGeoapifyServer(delay=args.delay) as geoapify:
+        for kind in ("wsgi", "asgi"):
+            process, base_url = start_server(kind, geoapify.places_url, args.threads)
+            try:
+                latencies, errors, elapsed = asyncio.run(load(base_url, args.concurrency, args.duration))
+            finally:
+                process.terminate()
+                process.wait()
+            if not latencies:
+                print(f"{kind:<8}{0:>10}{errors:>8}")
+                continue
+            print(f"{kind:<8}{len(latencies):>10}{errors:>8}{len(latencies) / elapsed:>9.1f}"
+                  f"{statistics.median(latencies) * 1000:>10.0f}{percentile(latencies, 0.99) * 1000:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
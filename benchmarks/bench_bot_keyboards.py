@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарк нажатия на категорию в боте.
+
+Сравниваются два способа получить клавиатуру после нажатия:
+  * list    - как было: выбор в списке названий, проверка и удаление через
+              in/remove, клавиатура собирается заново из всех категорий языка;
+  * bitmask - CategoryKeyboards: выбор в битовой маске, разметка для маски
+              берется из словаря (собирается при первом появлении маски).
+Нажатия - случайные последовательности по категориям языка, как у
+пользователя, который отмечает и снимает несколько категорий. Отдельно
+выводится время сборки всех 2^N клавиатур одного языка и их число.
+
+Запуск: python benchmarks/bench_bot_keyboards.py [--toggles 200000]
+"""
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from modules import load_module, load_rzd
+
+
+def legacy_toggle(bot, lang, selected, category):
+    """Прежний обработчик category_<название> без отправки в Telegram."""
+    if category in selected:
+        selected.remove(category)
+    else:
+        selected.append(category)
+    keyboard = [
+        [bot.InlineKeyboardButton(f"{'✅ ' if cat in selected else ''}{cat}", callback_data=f"category_{cat}")]
+        for cat in bot.catalog.language(lang).category_names
+    ]
+    keyboard.append([bot.InlineKeyboardButton(bot.tr(lang, "done"), callback_data="done")])
+    return bot.InlineKeyboardMarkup(keyboard)
+
+
+def bitmask_toggle(keyboards, lang, state, callback_data):
+    """Новый обработчик cat_<номер> без отправки в Telegram."""
+    state["selected_mask"] ^= 1 << keyboards.callback_index(lang, callback_data)
+    return keyboards.markup(lang, state["selected_mask"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--toggles", type=int, default=200000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.update(RZD_BACKGROUND_REFRESH="0", OPENAI_API_KEY="", SHARED_CACHE_PATH="",
+                      LLM_CACHE_PATH=os.path.join(workdir, "cache.sqlite3"),
+                      TELEGRAM_BOT_TOKEN=os.environ.get("TELEGRAM_BOT_TOKEN", "bench"))
+    logging.disable(logging.CRITICAL)
+    load_rzd()
+    bot = load_module("sochi_bot", "main.py")
+
+    print(f"{'язык':<6}{'категорий':>10}{'list, мкс':>11}{'bitmask, мкс':>14}{'ускорение':>11}")
+    for lang in ("ru", "en", "zh", "fa", "tr"):
+        names = bot.catalog.language(lang).category_names
+        rng = random.Random(lang)
+        presses = [rng.randrange(len(names)) for _ in range(args.toggles)]
+
+        selected = []
+        started = time.perf_counter()
+        for index in presses:
+            legacy_toggle(bot, lang, selected, names[index])
+        before = (time.perf_counter() - started) / args.toggles * 1e6
+
+        keyboards = bot.CategoryKeyboards(bot.catalog)
+        state = {"selected_mask": 0}
+        callbacks = [f"{bot.CATEGORY_CALLBACK_PREFIX}{index}" for index in presses]
+        started = time.perf_counter()
+        for callback_data in callbacks:
+            bitmask_toggle(keyboards, lang, state, callback_data)
+        after = (time.perf_counter() - started) / args.toggles * 1e6
+        assert keyboards.selected_names(lang, state["selected_mask"]) == [n for n in names if n in selected]
+        print(f"{lang:<6}{len(names):>10}{before:>11.2f}{after:>14.2f}{before / after:>10.1f}x")
+
+    keyboards = bot.CategoryKeyboards(bot.catalog)
+    variants = 1 << len(bot.catalog.language("ru").category_names)
+    started = time.perf_counter()
+    for mask in range(variants):
+        keyboards.markup("ru", mask)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"все клавиатуры ru: {variants} шт. за {elapsed:.1f} мс ({elapsed / variants * 1000:.1f} мкс на клавиатуру)")
+
+
+if __name__ == "__main__":
+    main()
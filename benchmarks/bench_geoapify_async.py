@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк: пропускная способность обработки обновлений бота при медленном Geoapify.
+
+Сравниваются два варианта обработчика:
+  * sync  - блокирующий requests.get внутри async-обработчика (как было раньше);
+  * async - общий AsyncGeoapifyClient с пулом keep-alive соединений.
+
+Обновления обрабатываются конкурентно (как при concurrent_updates=True).
+Часть обновлений не обращается к Geoapify вовсе - для них измеряется задержка,
+которую им добавляют "медленные" соседи.
+
+Запуск: python benchmarks/bench_geoapify_async.py [--updates 40] [--delay 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geoapify_client import AsyncGeoapifyClient, build_places_params  # noqa: E402
+from fakes import FakeGeoapifyServer  # noqa: E402
+
+CATEGORIES = ["beach", "tourism"]
+LAT, LON, RADIUS, LIMIT = 43.5855, 39.7303, 15000, 50
+
+
+async def run_updates(handler, updates):
+    """Запускает updates обработчиков; каждое четвертое обновление - 'быстрое'."""
+    fast_latencies = []
+
+    async def fast_update():
+        started = time.perf_counter()
+        await asyncio.sleep(0)
+        fast_latencies.append(time.perf_counter() - started)
+
+    jobs = [fast_update() if i % 4 == 3 else handler() for i in range(updates)]
+    started = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - started
+    return elapsed, max(fast_latencies) if fast_latencies else 0.0
+
+
+async def bench(updates, delay):
+    with FakeGeoapifyServer(delay=delay) as server:
+        params = build_places_params(CATEGORIES, LAT, LON, RADIUS, LIMIT, "test")
+
+        async def sync_handler():
+            response = requests.get(server.places_url, params=params, timeout=20)
+            response.raise_for_status()
+            return response.json()["features"]
+
+        client = AsyncGeoapifyClient("test", base_url=server.places_url, max_connections=updates)
+
+        async def async_handler():
+            return await client.search_features(CATEGORIES, LAT, LON, RADIUS, LIMIT)
+
+        results = {}
+        for name, handler in (("sync", sync_handler), ("async", async_handler)):
+            elapsed, fast_latency = await run_updates(handler, updates)
+            results[name] = (elapsed, updates / elapsed, fast_latency)
+        await client.aclose()
+
+    print(f"updates={updates}, задержка Geoapify={delay:.2f} c")
+    print(f"{'вариант':<8}{'время, c':>12}{'обновл./c':>12}{'задержка быстрых, c':>22}")
+    for name, (elapsed, throughput, fast_latency) in results.items():
+        print(f"{name:<8}{elapsed:>12.2f}{throughput:>12.1f}{fast_latency:>22.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=40)
+    parser.add_argument("--delay", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(bench(args.updates, args.delay))
+
+
+if __name__ == "__main__":
+    main()
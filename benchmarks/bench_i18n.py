@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Микробенчмарк стоимости переводов на одну отрисованную страницу.
+
+Последовательность обращений к переводам записывается на настоящих
+страницах / и /search веб-приложения (тестовый клиент Flask, Geoapify
+заменен заглушкой) и воспроизводится двумя способами:
+  * dict    - как было: LANGUAGES.get(lang, {}).get(key, LANGUAGES.get(...)...).format(**kwargs);
+  * catalog - i18n.Catalog: плоская таблица языка и заранее разобранные шаблоны.
+Для бота целиком сравниваются страница результатов (render_places_page)
+и список поездов (format_tickets_message) с прежними версиями, которые
+обращались к LANGUAGES[lang][key] на каждую подпись.
+Отдельно выводится время компиляции каталога одного языка (первое обращение).
+
+Запуск: python benchmarks/bench_i18n.py [--repeat 20000]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from fakes import FakeGeoapifyServer
+from modules import load_module, load_rzd
+
+from i18n import Catalog
+
+
+def record(owner, name, calls):
+    """Подменяет owner.name(lang, key, **kwargs) записью вызовов; возвращает функцию восстановления."""
+    original = getattr(owner, name)
+
+    def recorder(lang, key, **kwargs):
+        calls.append((lang, key, kwargs))
+        return original(lang, key, **kwargs)
+
+    setattr(owner, name, recorder)
+    return lambda: setattr(owner, name, original)
+
+
+def web_pages(web, geoapify):
+    """{страница: [(lang, key, kwargs)]} для / и /search веб-приложения."""
+    import requests
+
+    original_get = requests.get
+
+    def get(url, *a, **kw):
+        if "api.geoapify.com" in url:
+            url = geoapify.places_url
+        return original_get(url, *a, **kw)
+
+    requests.get = get
+    client = web.app.test_client()
+    pages = {}
+    for lang, categories in (("en", ["Beaches", "Souvenirs"]), ("fa", ["سواحل"]), ("ru", ["Пляжи", "Железные дороги"])):
+        for path, query in (("/", {"lang": lang}), ("/search", {"lang": lang, "category": categories})):
+            calls = []
+            restore = record(web.catalog, "translate", calls)
+            try:
+                client.get(path, query_string=query)
+            finally:
+                restore()
+            pages[f"web {path} {lang}"] = calls
+    requests.get = original_get
+    return pages
+
+
+PLACES = [{"name": f"Место {i}", "address": f"Сочи, улица {i}", "map_link": f"https://maps.example/{i}"}
+          for i in range(12)]
+TICKETS = [{"train": f"{100 + i}С", "departure": "08:00", "arrival": "20:00", "duration": "12 ч",
+            "classes": {"Плацкарт": {"price": 3000, "seats": 12}, "Купе": {"price": 5000, "seats": 4}}}
+           for i in range(5)]
+
+
+def legacy_bot_pages(bot):
+    """Страницы бота в прежнем виде: LANGUAGES[lang][key] на каждую подпись."""
+    languages = bot.LANGUAGES
+
+    def places_page(cursor_id, page, lang):
+        cursor = bot.places_cursors.get(cursor_id)
+        places = cursor["places"]
+        pages = (len(places) + bot.PLACES_PAGE_SIZE - 1) // bot.PLACES_PAGE_SIZE
+        response = cursor["header"]
+        for place in places[page * bot.PLACES_PAGE_SIZE:(page + 1) * bot.PLACES_PAGE_SIZE]:
+            response += (
+                f"📍 {place['name']}\n"
+                f"{languages[lang]['address']}: {place['address']}\n"
+                f"{languages[lang]['map']}: {place['map_link']}\n\n"
+            )
+        if pages > 1:
+            response += f"{page + 1}/{pages}"
+        buttons = []
+        if page > 0:
+            buttons.append(bot.InlineKeyboardButton(languages[lang]["previous_results"], callback_data=f"page_{cursor_id}_{page - 1}"))
+        if page < pages - 1:
+            buttons.append(bot.InlineKeyboardButton(languages[lang]["more_results"], callback_data=f"page_{cursor_id}_{page + 1}"))
+        return response, bot.InlineKeyboardMarkup([buttons]) if buttons else None
+
+    def tickets_message(tickets, from_st, to_st, date, lang):
+        response = f"🚂 {languages[lang]['rzd_tickets']} {from_st} - {to_st} ({date}):\n\n"
+        for ticket in tickets:
+            response += (
+                f"{languages[lang]['rzd_train']} {ticket['train']}\n"
+                f"{languages[lang]['rzd_departure']}: {ticket['departure']}\n"
+                f"{languages[lang]['rzd_arrival']}: {ticket['arrival']}\n"
+                f"{languages[lang]['rzd_duration']}: {ticket['duration']}\n"
+            )
+            for cls, info in ticket['classes'].items():
+                response += f"- {cls}: {info['price']} {languages[lang]['rzd_price_rub']} ({languages[lang]['rzd_seats_available']}: {info['seats']})\n"
+            response += "\n"
+        response += f"{languages[lang]['rzd_buy_tickets']} https://pass.rzd.ru"
+        return response
+
+    return places_page, tickets_message
+
+
+def bot_pages(bot, repeat):
+    """(страница, мкс до, мкс после): страница результатов (5 мест) и список из 5 поездов."""
+    legacy_places, legacy_tickets = legacy_bot_pages(bot)
+    results = []
+    for lang in ("ru", "zh", "tr"):
+        header = bot.tr(lang, "welcome").split("\n")[0] + ": Beaches\n\n"
+        cursor_id = bot.create_places_cursor(header, PLACES)
+        for page, legacy, current, args in (
+                ("bot places", legacy_places, bot.render_places_page, (cursor_id, 1, lang)),
+                ("bot tickets", legacy_tickets, bot.format_tickets_message,
+                 (TICKETS, "Сочи", "Москва", "01.01.2025", lang))):
+            timings = []
+            for render in (legacy, current):
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    render(*args)
+                timings.append((time.perf_counter() - started) / repeat * 1e6)
+            results.append((f"{page} {lang}", *timings))
+    return results
+
+
+def per_page_us(translate, calls, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for lang, key, kwargs in calls:
+            translate(lang, key, **kwargs)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.update(RZD_BACKGROUND_REFRESH="0", OPENAI_API_KEY="", SHARED_CACHE_PATH="",
+                      LLM_CACHE_PATH=os.path.join(workdir, "cache.sqlite3"),
+                      LLM_PRECOMPUTED_PATH=os.path.join(workdir, "missing.sqlite3"),
+                      TELEGRAM_BOT_TOKEN=os.environ.get("TELEGRAM_BOT_TOKEN", "bench"))
+    logging.disable(logging.CRITICAL)
+    load_rzd()
+    web = load_module("sochi_app", "app (5).py")
+    bot = load_module("sochi_bot", "main.py")
+
+    def web_dict(lang, text_key, **kwargs):
+        languages, default = web.LANGUAGES, web.DEFAULT_LANGUAGE
+        return languages.get(lang, {}).get(text_key, languages.get(default, {}).get(text_key, text_key)).format(**kwargs)
+
+    with FakeGeoapifyServer() as geoapify:
+        pages = web_pages(web, geoapify)
+
+    print(f"{'страница':<20}{'переводов':>10}{'dict, мкс':>11}{'catalog, мкс':>14}{'ускорение':>11}")
+    for page, calls in pages.items():
+        before = per_page_us(web_dict, calls, args.repeat)
+        after = per_page_us(web.catalog.translate, calls, args.repeat)
+        print(f"{page:<20}{len(calls):>10}{before:>11.2f}{after:>14.2f}{before / after:>10.1f}x")
+    for page, before, after in bot_pages(bot, args.repeat):
+        print(f"{page:<20}{'-':>10}{before:>11.2f}{after:>14.2f}{before / after:>10.1f}x")
+
+    for name, module in (("web", web), ("bot", bot)):
+        started = time.perf_counter()
+        fresh = Catalog(module.LANGUAGES, module.catalog.default_language, module.CATEGORIES)
+        for lang in module.LANGUAGES:
+            fresh.language(lang)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"компиляция каталога {name}: {elapsed:.2f} мс на {len(module.LANGUAGES)} языка(ов), "
+              f"{elapsed / len(module.LANGUAGES):.2f} мс на язык")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк /search с потоковыми рекомендациями LLM против ожидания полного ответа.
+
+Веб-приложение запускается на локальном сервере werkzeug; Geoapify и OpenAI
+заменены заглушками (FakeGeoapifyServer, FakeCompletionServer с задержкой
+до первого слова и паузой между словами). Для каждого режима измеряются:
+  * TTFB - время до первого байта страницы /search;
+  * первый текст - время до появления первого фрагмента рекомендаций;
+  * полная страница - время до получения всего текста рекомендаций.
+
+Запуск: python benchmarks/bench_llm_streaming.py [--first-token 0.5] [--token-delay 0.01] [--words 150]
+"""
+
+import argparse
+import http.client
+import logging
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+import requests
+from werkzeug.serving import make_server
+
+from fakes import FakeCompletionServer, FakeGeoapifyServer
+from modules import load_module, load_rzd
+from openai_service import OpenAIService
+
+CATEGORY = ("en", "Beaches")
+
+
+def timed_get(port, path):
+    """GET path; возвращает (TTFB, время полного ответа, тело)."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    started = time.perf_counter()
+    connection.request("GET", path)
+    response = connection.getresponse()
+    first = response.read(1)
+    ttfb = time.perf_counter() - started
+    body = first + response.read()
+    connection.close()
+    return ttfb, time.perf_counter() - started, body.decode("utf-8")
+
+
+def read_stream(port, path):
+    """Читает поток SSE; возвращает (время до первого текста, время до события done)."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    started = time.perf_counter()
+    connection.request("GET", path)
+    response = connection.getresponse()
+    first_text = None
+    while True:
+        line = response.fp.readline()
+        if not line:
+            raise RuntimeError("поток рекомендаций оборвался")
+        if line.startswith(b"event: text") and first_text is None:
+            first_text = time.perf_counter() - started
+        if line.startswith(b"event: done"):
+            break
+        if line.startswith(b"event: failure"):
+            raise RuntimeError("поток рекомендаций завершился ошибкой")
+    connection.close()
+    return first_text, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-token", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--words", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.update(RZD_BACKGROUND_REFRESH="0", LLM_CACHE_PATH=os.path.join(workdir, "cache.sqlite3"),
+                      SHARED_CACHE_PATH=os.path.join(workdir, "shared.sqlite3"),
+                      LLM_PRECOMPUTED_PATH=os.path.join(workdir, "missing.sqlite3"))
+    logging.disable(logging.CRITICAL)
+    with FakeGeoapifyServer() as geoapify, \
+            FakeCompletionServer(delay=args.first_token, words=args.words, token_delay=args.token_delay) as llm:
+        original_get = requests.get
+
+        def get(url, *a, **kw):
+            if "api.geoapify.com" in url:
+                url = geoapify.places_url
+            return original_get(url, *a, **kw)
+
+        requests.get = get
+        load_rzd()  # приложение импортирует парсер как модуль RZD
+        app = load_module("sochi_app", "app (5).py")
+        app.openai_service = OpenAIService("sk-test", base_url=llm.base_url)
+        server = make_server("127.0.0.1", 0, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_port
+        lang, category = CATEGORY
+        path = "/search?" + urlencode({"lang": lang, "category": category})
+
+        results = {}
+        for streaming in (False, True):
+            app.LLM_STREAMING = streaming
+            runs = []
+            for _ in range(args.repeat):
+                app.llm_cache.clear()
+                ttfb, page_time, body = timed_get(port, path)
+                if streaming:
+                    stream_path = urlparse(re.search(r'data-stream-url="([^"]+)"', body).group(1)).path
+                    first_text, stream_time = read_stream(port, stream_path)
+                    runs.append((ttfb, page_time + first_text, page_time + stream_time))
+                else:
+                    runs.append((ttfb, page_time, page_time))
+            results["поток" if streaming else "целиком"] = [statistics.median(values) for values in zip(*runs)]
+        server.shutdown()
+        requests.get = original_get
+
+    print(f"OpenAI: первое слово через {args.first_token * 1000:.0f} мс, {args.words} слов по {args.token_delay * 1000:.0f} мс")
+    print(f"{'режим':<10}{'TTFB, мс':>10}{'первый текст, мс':>18}{'полная страница, мс':>21}")
+    for mode, (ttfb, first_text, full) in results.items():
+        print(f"{mode:<10}{ttfb * 1000:>10.0f}{first_text * 1000:>18.0f}{full * 1000:>21.0f}")
+
+
+if __name__ == "__main__":
+    main()
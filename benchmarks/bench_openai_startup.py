@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк холодного старта веб-приложения с ключом OpenAI.
+
+Каждый запуск - отдельный процесс: импорт "app (5).py", затем первые
+запросы / и /search через тестовый клиент Flask. OpenAI заменен заглушкой
+FakeCompletionServer, которая отвечает с задержкой --probe-delay (медленная
+или недоступная сеть), Geoapify - FakeGeoapifyServer. Сравниваются режимы:
+  * eager - проверка ключа models.list() синхронно до первого запроса,
+    как раньше делалось при импорте;
+  * lazy  - OpenAIService: клиент создается по требованию, проверка идет в фоне.
+Для каждого режима выводится время до ответа на первый запрос и число
+обращений к OpenAI, сделанных до этого ответа.
+
+Запуск: python benchmarks/bench_openai_startup.py [--probe-delay 2] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def child(mode, probe_delay):
+    import logging
+    import time
+    import requests
+    from fakes import FakeCompletionServer, FakeGeoapifyServer
+    from modules import load_module, load_rzd
+
+    logging.disable(logging.CRITICAL)
+    with FakeGeoapifyServer() as geoapify, FakeCompletionServer(delay=probe_delay) as llm:
+        original_get = requests.get
+
+        def get(url, *a, **kw):
+            if "api.geoapify.com" in url:
+                url = geoapify.places_url
+            return original_get(url, *a, **kw)
+
+        requests.get = get
+        os.environ["OPENAI_BASE_URL"] = llm.base_url
+        ready = time.perf_counter()
+        load_rzd()
+        app = load_module("sochi_app", "app (5).py")
+        app.app.template_folder = os.path.join(os.path.dirname(HERE), "templates")
+        if mode == "eager":
+            app.openai_service.probe()
+        imported = time.perf_counter()
+        client = app.app.test_client()
+        client.get("/")
+        first = time.perf_counter()
+        calls_before_first = llm.requests_served
+        client.get("/search", query_string={"lang": "en", "category": "Beaches"})
+        search = time.perf_counter()
+
+    print(json.dumps({
+        "startup": imported - ready,
+        "first": first - ready,
+        "search": search - first,
+        "calls_before_first": calls_before_first,
+    }))
+
+
+def run_child(mode, probe_delay):
+    env = dict(os.environ, OPENAI_API_KEY="sk-bench", RZD_BACKGROUND_REFRESH="0", LLM_STREAMING="1",
+               LLM_CACHE_PATH=os.path.join(tempfile.mkdtemp(), "cache.sqlite3"),
+               SHARED_CACHE_PATH=os.path.join(tempfile.mkdtemp(), "shared.sqlite3"),
+               LLM_PRECOMPUTED_PATH=os.path.join(tempfile.mkdtemp(), "missing.sqlite3"),
+               PYTHONPATH=HERE)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode,
+                             "--probe-delay", str(probe_delay)],
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--probe-delay", type=float, default=2.0, help="задержка ответа OpenAI, секунды")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=("eager", "lazy"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.probe_delay)
+        return
+
+    print(f"OpenAI отвечает через {args.probe_delay * 1000:.0f} мс, медиана {args.repeat} запусков")
+    print(f"{'режим':<8}{'старт, мс':>11}{'первый /, мс':>14}{'первый /search, мс':>20}{'вызовов OpenAI до /':>21}")
+    for mode in ("eager", "lazy"):
+        runs = [run_child(mode, args.probe_delay) for _ in range(args.repeat)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{mode:<8}{median['startup'] * 1000:>11.0f}{median['first'] * 1000:>14.0f}"
+              f"{median['search'] * 1000:>20.0f}{median['calls_before_first']:>21.0f}")
+
+
+if __name__ == "__main__":
+    main()
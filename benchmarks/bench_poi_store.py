@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк локальной базы POI: время запроса "категории в радиусе R, ближайшие первыми".
+
+База заполняется случайными объектами в окрестностях Сочи; результат каждого
+запроса сверяется с полным перебором.
+
+Запуск: python benchmarks/bench_poi_store.py [--pois 50000] [--queries 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from place_search import haversine_meters  # noqa: E402
+from poi_store import POIStore, category_prefixes  # noqa: E402
+
+SOCHI_LAT, SOCHI_LON = 43.5855, 39.7303
+CODES = [
+    "natural", "leisure.park", "catering.restaurant", "catering.cafe", "catering.fast_food", "beach",
+    "accommodation.hotel", "accommodation.guest_house", "entertainment.culture.theatre",
+    "entertainment.culture.gallery", "entertainment.aquarium", "commercial.gift_and_souvenir", "tourism",
+]
+
+
+def make_store(count, rng):
+    store = POIStore()
+    features = []
+    for i in range(count):
+        lat = SOCHI_LAT + rng.uniform(-0.3, 0.3)
+        lon = SOCHI_LON + rng.uniform(-0.4, 0.4)
+        features.append({'properties': {
+            'name': f"POI {i}", 'lat': lat, 'lon': lon, 'place_id': str(i),
+            'categories': [rng.choice(CODES)],
+        }})
+    store.add_features(features)
+    return store, features
+
+
+def brute_force(features, codes, lat, lon, radius, limit):
+    ranked = []
+    for feature in features:
+        p = feature['properties']
+        if not any(prefix in codes for c in p['categories'] for prefix in category_prefixes(c)):
+            continue
+        distance = haversine_meters(lat, lon, p['lat'], p['lon'])
+        if distance <= radius:
+            ranked.append((distance, p['place_id']))
+    ranked.sort()
+    return [place_id for _, place_id in ranked[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pois", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    started = time.perf_counter()
+    store, features = make_store(args.pois, rng)
+    print(f"Загрузка {args.pois} объектов: {time.perf_counter() - started:.2f} c")
+
+    for radius in (1000, 3000, 15000):
+        queries = []
+        for _ in range(args.queries):
+            codes = rng.sample(CODES, rng.randint(1, 3))
+            lat = SOCHI_LAT + rng.uniform(-0.05, 0.05)
+            lon = SOCHI_LON + rng.uniform(-0.05, 0.05)
+            queries.append((codes, lat, lon))
+
+        started = time.perf_counter()
+        for codes, lat, lon in queries:
+            store.query(codes, lat, lon, radius, 50)
+        per_query = (time.perf_counter() - started) / len(queries)
+
+        for codes, lat, lon in queries[:20]:
+            got = [f['properties']['place_id'] for f in store.query(codes, lat, lon, radius, 50)]
+            assert got == brute_force(features, set(codes), lat, lon, radius, 50), "результат расходится с перебором"
+        print(f"радиус {radius:>6} м: {per_query * 1e6:10.1f} мкс/запрос")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк бэкендов парсера расписания РЖД на сохраненных страницах станции.
+
+Для каждой страницы из benchmarks/fixtures проверяется, что все бэкенды
+возвращают одинаковый результат, и измеряется время разбора в пересчете
+на один сегмент (article.SearchSegment).
+
+Страницы в fixtures воспроизводят разметку rasp.yandex.ru и создаются
+функцией fakes.make_schedule_html; вместо них можно положить настоящие
+сохраненные страницы с именами sochi_<arrival|departure>*.html.
+Совпадение бэкендов на этих страницах проверяет и tests/test_rzd_parser.py.
+
+Запуск: python benchmarks/bench_rzd_parser.py [--repeat 20]
+"""
+
+import argparse
+import glob
+import logging
+import os
+import time
+
+from modules import load_rzd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    RZD = load_rzd()
+    logging.disable(logging.CRITICAL)
+
+    print(f"{'страница':<24}{'бэкенд':<8}{'сегм.':>7}{'мс/стр.':>10}{'мкс/сегм.':>12}")
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "sochi_*.html"))):
+        with open(path, encoding="utf-8") as f:
+            html_content = f.read()
+        event_type = "arrival" if "arrival" in os.path.basename(path) else "departure"
+        segments = html_content.count('<article class="SearchSegment')
+
+        reference = None
+        for backend in RZD.PARSER_BACKENDS:
+            result = RZD.parse_schedule_data(html_content, event_type, backend=backend)
+            if reference is None:
+                reference = result
+            elif result != reference:
+                raise SystemExit(f"{path}: бэкенд {backend} вернул результат, отличный от остальных")
+
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                RZD.parse_schedule_data(html_content, event_type, backend=backend)
+            per_page = (time.perf_counter() - started) / args.repeat
+            print(f"{os.path.basename(path):<24}{backend:<8}{segments:>7}{per_page * 1e3:>10.2f}"
+                  f"{per_page / max(segments, 1) * 1e6:>12.1f}")
+        print(f"{'':<24}результаты совпадают: {len(reference)} рейсов")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк сводного табло Большого Сочи на заглушке rasp.yandex.ru.
+
+Сравнивает последовательную загрузку страниц всех станций (как если бы
+get_sochi_schedule вызывался для каждой станции по очереди) с параллельной
+загрузкой get_greater_sochi_board. Каждая страница отвечает с задержкой
+--delay секунд, поэтому параллельное табло должно укладываться примерно
+в время одной, самой медленной, загрузки.
+
+Запуск: python benchmarks/bench_rzd_stations.py [--delay 0.3] [--segments 60]
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from fakes import FakeRaspServer
+
+# Коды для всех станций реестра, чтобы ни одна не была пропущена
+os.environ.setdefault("RZD_STATION_CODES", "adler=1001,khosta=1002,matsesta=1003,lazarevskaya=1004,airport=1005")
+
+from modules import load_rzd  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.3)
+    parser.add_argument("--segments", type=int, default=60)
+    args = parser.parse_args()
+
+    RZD = load_rzd()
+    logging.disable(logging.CRITICAL)
+    stations = RZD.stations_with_codes()
+
+    with FakeRaspServer(delay=args.delay, segments=args.segments) as server:
+        RZD.BASE_URL = server.base_url
+
+        started = time.perf_counter()
+        sequential = 0
+        for station in stations:
+            for event_type in RZD.EVENT_TYPES:
+                sequential += len(RZD._fetch_and_parse(station.code, event_type, RZD.get_today_date_string()))
+        sequential_time = time.perf_counter() - started
+
+        RZD._pages.clear()
+        started = time.perf_counter()
+        arrivals, departures, failed = RZD.get_greater_sochi_board()
+        board_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        RZD.get_greater_sochi_board()
+        cached_time = time.perf_counter() - started
+
+    pages = len(stations) * len(RZD.EVENT_TYPES)
+    print(f"Станций: {len(stations)}, страниц: {pages}, задержка страницы: {args.delay * 1000:.0f} мс")
+    print(f"{'последовательно':<24}{sequential_time * 1000:>10.1f} мс  ({sequential} рейсов)")
+    print(f"{'сводное табло':<24}{board_time * 1000:>10.1f} мс  ({len(arrivals) + len(departures)} рейсов, ошибок: {len(failed)})")
+    print(f"{'табло из кэша':<24}{cached_time * 1000:>10.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
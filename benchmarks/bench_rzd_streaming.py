@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк раннего выхода (parse_next_trains) против полного разбора страницы.
+
+Для страниц из benchmarks/fixtures и больших сгенерированных табло
+(рейсы по возрастанию времени, как на rasp.yandex.ru) измеряется время
+получения LAST_FLIGHTS_COUNT ближайших рейсов после заданного времени:
+полным parse_schedule_data с последующим отбором и потоковым parse_next_trains.
+Результаты обоих способов сверяются.
+
+Запуск: python benchmarks/bench_rzd_streaming.py [--repeat 20] [--segments 1000]
+"""
+
+import argparse
+import glob
+import logging
+import os
+import time
+
+from fakes import make_schedule_html
+from modules import load_rzd
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+AFTER_TIMES = ("06:00", "12:00", "18:00", "23:00")
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--segments", type=int, default=1000)
+    args = parser.parse_args()
+
+    RZD = load_rzd()
+    logging.disable(logging.CRITICAL)
+    count = RZD.LAST_FLIGHTS_COUNT
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "sochi_*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), "arrival" if "arrival" in path else "departure", f.read()))
+    for event_type in RZD.EVENT_TYPES:
+        pages.append((f"generated_{event_type}", event_type,
+                      make_schedule_html(event_type, args.segments, ordered=True)))
+
+    print(f"{'страница':<26}{'после':>7}{'полный, мс':>12}{'ранний выход, мс':>18}{'ускорение':>11}")
+    for name, event_type, html_content in pages:
+        for after in AFTER_TIMES:
+            after_minutes = RZD.parse_minutes(after)
+
+            def full():
+                return [entry for entry in RZD.parse_schedule_data(html_content, event_type)
+                        if RZD.parse_minutes(entry['time']) >= after_minutes][:count]
+
+            def streaming():
+                return RZD.parse_next_trains(html_content, event_type, count, after_minutes)
+
+            full_time, expected = timed(full, args.repeat)
+            stream_time, result = timed(streaming, args.repeat)
+            if result != expected:
+                raise SystemExit(f"{name} после {after}: результаты раннего выхода и полного разбора различаются")
+            print(f"{name:<26}{after:>7}{full_time * 1000:>12.2f}{stream_time * 1000:>18.2f}"
+                  f"{full_time / stream_time:>10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк поиска поездов на неделю вперед на заглушке pass.rzd.ru.
+
+Сравниваются:
+  * последовательный поиск по одной дате (как вызовы get_rzd_tickets в цикле);
+  * TicketService.search_dates - все даты одним раундом параллельных запросов;
+  * повторный search_dates, который обслуживается из кэша.
+
+Запуск: python benchmarks/bench_rzd_tickets.py [--days 7] [--delay 0.3]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rzd_tickets import RzdPassProvider, TicketService  # noqa: E402
+from fakes import FakeRzdPassServer  # noqa: E402
+
+
+async def bench(days, delay):
+    dates = [(datetime.now() + timedelta(days=i + 1)).strftime("%d.%m.%Y") for i in range(days)]
+    with FakeRzdPassServer(delay=delay) as server:
+        provider = RzdPassProvider(base_url=server.search_url, poll_interval=0)
+        try:
+            started = time.perf_counter()
+            for date in dates:
+                await provider.search("Сочи", "Москва", date)
+            sequential = time.perf_counter() - started
+
+            service = TicketService(provider)
+            started = time.perf_counter()
+            results = await service.search_dates("Сочи", "Москва", dates)
+            batched = time.perf_counter() - started
+            errors = [date for date, result in results.items() if isinstance(result, Exception)]
+
+            started = time.perf_counter()
+            await service.search_dates("Сочи", "Москва", dates)
+            cached = time.perf_counter() - started
+        finally:
+            await provider.aclose()
+
+    print(f"Дат: {days}, задержка ответа: {delay * 1000:.0f} мс (два запроса на поиск)")
+    print(f"{'последовательно':<20}{sequential * 1000:>10.1f} мс")
+    print(f"{'одним раундом':<20}{batched * 1000:>10.1f} мс  (ошибок: {len(errors)})")
+    print(f"{'из кэша':<20}{cached * 1000:>10.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--delay", type=float, default=0.3)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    asyncio.run(bench(args.days, args.delay))
+
+
+if __name__ == "__main__":
+    main()
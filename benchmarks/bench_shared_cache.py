@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк кэша мест при нескольких воркерах: TTLLRUCache в каждом процессе
+против общего SharedCache (SQLite WAL + mmap).
+
+Запускается --workers процессов (как воркеры gunicorn), каждый выполняет
+--lookups поисков по --keys ключам с распределением Ципфа (популярные
+наборы категорий запрашиваются чаще). Промах кэша означает запрос к
+Geoapify: значение - список из 50 фиктивных features, как в ответе API.
+Для каждого варианта выводятся доля попаданий, общее число запросов к
+Geoapify, время чтения из кэша (p50/p99) и размер кэшей.
+
+Запуск: python benchmarks/bench_shared_cache.py [--workers 4] [--lookups 2000] [--keys 200]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from place_cache import TTLLRUCache, places_cache_key  # noqa: E402
+from shared_cache import SharedCache  # noqa: E402
+from fakes import make_geoapify_features  # noqa: E402
+
+LAT, LON, RADIUS, LIMIT = 43.5855, 39.7303, 15000, 50
+MAX_ENTRIES = 256
+
+
+def make_keys(count):
+    return [places_cache_key([f"category.{i}"], LAT, LON, RADIUS, LIMIT, "ru") for i in range(count)]
+
+
+def worker(kind, path, keys, lookups, seed, queue):
+    if kind == "shared":
+        cache = SharedCache(path, "places", max_entries=MAX_ENTRIES)
+    else:
+        cache = TTLLRUCache(max_entries=MAX_ENTRIES)
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(keys))]
+    upstream = 0
+    read_times = []
+    for key in rng.choices(keys, weights, k=lookups):
+        started = time.perf_counter()
+        value = cache.get(key)
+        read_times.append(time.perf_counter() - started)
+        if value is None:
+            upstream += 1
+            cache.set(key, make_geoapify_features([key[0][0]], LIMIT))
+    stats = cache.stats()
+    queue.put(json.dumps({"upstream": upstream, "hits": stats["hits"], "misses": stats["misses"],
+                          "entries": stats["entries"], "read_times": read_times}))
+
+
+def run(kind, workers, lookups, keys):
+    path = os.path.join(tempfile.mkdtemp(), "shared.sqlite3")
+    if kind == "shared":
+        SharedCache(path, "places")  # схема создается до запуска воркеров
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(kind, path, keys, lookups, seed, queue))
+                 for seed in range(workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    results = [json.loads(queue.get()) for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    read_times = sorted(t for result in results for t in result["read_times"])
+    hits = sum(result["hits"] for result in results)
+    lookups_total = hits + sum(result["misses"] for result in results)
+    if kind == "shared":
+        entries = results[0]["entries"]  # одна копия на всю машину
+        size = os.path.getsize(path) + sum(os.path.getsize(path + suffix) for suffix in ("-wal", "-shm")
+                                           if os.path.exists(path + suffix))
+    else:
+        entries = sum(result["entries"] for result in results)  # у каждого воркера своя копия
+        size = None
+    return {
+        "hit_rate": hits / lookups_total,
+        "upstream": sum(result["upstream"] for result in results),
+        "p50_us": statistics.median(read_times) * 1e6,
+        "p99_us": read_times[int(len(read_times) * 0.99)] * 1e6,
+        "entries": entries,
+        "file_kb": size / 1024 if size is not None else None,
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--lookups", type=int, default=2000, help="поисков на воркер")
+    parser.add_argument("--keys", type=int, default=200, help="различных наборов категорий")
+    args = parser.parse_args()
+
+    keys = make_keys(args.keys)
+    print(f"{args.workers} воркеров x {args.lookups} поисков, {args.keys} ключей (Ципф)")
+    print(f"{'кэш':<8}{'попаданий':>11}{'в Geoapify':>12}{'чтение p50, мкс':>17}{'p99, мкс':>10}"
+          f"{'копий записей':>15}{'файл, КБ':>10}")
+    for kind in ("process", "shared"):
+        result = run(kind, args.workers, args.lookups, keys)
+        file_kb = f"{result['file_kb']:.0f}" if result["file_kb"] is not None else "-"
+        print(f"{kind:<8}{result['hit_rate']:>11.1%}{result['upstream']:>12}{result['p50_us']:>17.1f}"
+              f"{result['p99_us']:>10.1f}{result['entries']:>15}{file_kb:>10}")
+
+
+if __name__ == "__main__":
+    main()
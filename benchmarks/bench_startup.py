@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк времени импорта веб-приложения и бота (python -X importtime).
+
+Каждая точка входа импортируется в отдельном процессе с -X importtime;
+из отчета интерпретатора берутся модули верхнего уровня и их суммарное
+время. Тяжелые зависимости, которые должны загружаться только при первом
+использовании (openai, requests, bs4, парсер РЖД, telegram.ext), не должны
+попадать в профиль старта: если такой модуль появился, бенчмарк печатает
+его и завершается с кодом 1.
+
+Результат сравнивается с отчетом benchmarks/startup_importtime.txt,
+который хранится в репозитории; --write перезаписывает этот отчет.
+
+Запуск: python benchmarks/bench_startup.py [--repeat 5] [--write]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+REPORT_PATH = os.path.join(HERE, "startup_importtime.txt")
+TOP_MODULES = 15
+SLOWDOWN_WARNING = 1.5  # во сколько раз старт может замедлиться без предупреждения
+
+# Точка входа -> модули, которых не должно быть в профиле старта
+ENTRY_POINTS = {
+    "app (5).py": ("openai", "requests", "bs4", "RZD", "lxml"),
+    "main.py": ("telegram.ext", "requests", "bs4", "openai"),
+}
+# run_path выполняет файл как модуль (не __main__), поэтому его импорты оказываются на верхнем уровне профиля
+ENTRY_CODE = "import runpy; runpy.run_path({path!r}, run_name='startup_bench')"
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def profile(code):
+    """Профиль -X importtime: [(имя, собственное время мкс, суммарное мкс, уровень вложенности)]."""
+    # Фоновый поток обновления РЖД импортировал бы парсер во время замера
+    env = dict(os.environ, PYTHONPATH=ROOT, RZD_BACKGROUND_REFRESH="0",
+               LLM_CACHE_PATH=os.path.join(tempfile.gettempdir(), "bench_startup_llm.sqlite3"),
+               SHARED_CACHE_PATH=os.path.join(tempfile.gettempdir(), "bench_startup_shared.sqlite3"))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return modules
+
+
+def summarize(modules, deferred, interpreter):
+    """
+    Суммарное время (мс), самые тяжелые модули верхнего уровня и загруженные отложенные модули.
+    interpreter - модули, которые импортирует сам интерпретатор при запуске; они не учитываются.
+    """
+    top_level = [(name, cumulative) for name, _, cumulative, level in modules
+                 if level == 0 and name not in interpreter]
+    total = sum(cumulative for _, cumulative in top_level) / 1000
+    heaviest = sorted(top_level, key=lambda item: -item[1])[:TOP_MODULES]
+    loaded = {name for name, *_ in modules}
+    leaked = sorted(name for name in deferred if name in loaded)
+    return total, heaviest, leaked
+
+
+def read_report_totals(path=REPORT_PATH):
+    totals = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                match = re.match(r"^== (.+): (\d+(?:\.\d+)?) ms ==$", line.strip())
+                if match:
+                    totals[match.group(1)] = float(match.group(2))
+    return totals
+
+
+def format_report(results):
+    lines = [
+        "# Время импорта точек входа: python benchmarks/bench_startup.py --write",
+        "# Модули верхнего уровня по суммарному времени (мкс), как в python -X importtime.",
+        "",
+    ]
+    for entry, (total, heaviest, _) in results.items():
+        lines.append(f"== {entry}: {total:.0f} ms ==")
+        lines.append(f"{'cumulative':>12} | module")
+        lines.extend(f"{cumulative:>12} | {name}" for name, cumulative in heaviest)
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--write", action="store_true", help="перезаписать startup_importtime.txt")
+    args = parser.parse_args()
+
+    baseline = read_report_totals()
+    interpreter = {name for name, *_ in profile("pass")} | {"runpy"}
+    results = {}
+    failed = False
+    for entry, deferred in ENTRY_POINTS.items():
+        code = ENTRY_CODE.format(path=os.path.join(ROOT, entry))
+        runs = [summarize(profile(code), deferred, interpreter) for _ in range(args.repeat)]
+        # Для отчета берется запуск с медианным временем
+        runs.sort(key=lambda run: run[0])
+        total, heaviest, leaked = runs[len(runs) // 2]
+        results[entry] = (total, heaviest, leaked)
+
+        previous = baseline.get(entry)
+        note = f" (в отчете {previous:.0f} мс)" if previous else ""
+        print(f"{entry}: импорт {total:.0f} мс, медиана {args.repeat} запусков{note}")
+        for name, cumulative in heaviest[:5]:
+            print(f"    {cumulative / 1000:>8.1f} мс  {name}")
+        if leaked:
+            failed = True
+            print(f"    ОШИБКА: при старте загружены отложенные модули: {', '.join(leaked)}")
+        if previous and total > previous * SLOWDOWN_WARNING:
+            print(f"    ВНИМАНИЕ: старт медленнее отчета в {total / previous:.1f} раза")
+
+    if args.write:
+        with open(REPORT_PATH, "w", encoding="utf-8") as f:
+            f.write(format_report(results))
+        print(f"Отчет записан в {REPORT_PATH}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Локальные заглушки внешних сервисов для бенчмарков.
+
+Серверы запускаются в отдельном потоке на 127.0.0.1 со случайным портом
+и имитируют задержку ответа настоящих API.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_geoapify_features(categories, count=50):
+    """Генерирует фиктивные 'features' в формате Geoapify Places API."""
+    features = []
+    for i in range(count):
+        category = categories[i % len(categories)] if categories else "tourism"
+        lat = 43.5855 + (i % 10) * 0.002
+        lon = 39.7303 + (i // 10) * 0.002
+        features.append({
+            "type": "Feature",
+            "properties": {
+                "name": f"{category} #{i}",
+                "lat": lat,
+                "lon": lon,
+                "formatted": f"Сочи, улица Тестовая, {i}",
+                "categories": [category],
+                "place_id": f"{category}-{i}",
+            },
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        })
+    return features
+
+
+class _BenchHTTPServer(ThreadingHTTPServer):
+    # Стандартная очередь в 5 соединений теряет SYN при пачке одновременных запросов
+    request_queue_size = 256
+
+
+class FakeServer:
+    """Базовый фоновый HTTP-сервер; handler_class задается в наследниках."""
+
+    handler_class = None
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.requests_served = 0
+        self._lock = threading.Lock()
+        handler = type("Handler", (self.handler_class,), {"server_state": self})
+        self.httpd = _BenchHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._lock:
+            self.requests_served += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят одним пакетом, без задержек Nagle/delayed ACK
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _GeoapifyHandler(_QuietHandler):
+    def do_GET(self):
+        state = self.server_state
+        state.count_request()
+        if state.delay:
+            time.sleep(state.delay)
+        query = parse_qs(urlparse(self.path).query)
+        categories = query.get("categories", [""])[0].split(",")
+        limit = int(query.get("limit", ["50"])[0])
+        self.send_json({"type": "FeatureCollection", "features": make_geoapify_features(categories, limit)})
+
+
+class FakeGeoapifyServer(FakeServer):
+    """Заглушка https://api.geoapify.com/v2/places с настраиваемой задержкой."""
+
+    handler_class = _GeoapifyHandler
+
+    @property
+    def places_url(self):
+        return f"{self.url}/v2/places"
+
+
+def make_schedule_html(event_type, count=60, seed=0, ordered=False):
+    """
+    Генерирует страницу расписания станции с разметкой rasp.yandex.ru
+    (article.SearchSegment и классы, которые использует parse_schedule_data).
+    ordered=True - рейсы равномерно распределены по суткам по возрастанию времени, как на настоящем табло.
+    """
+    cities = ["Москва", "Санкт-Петербург", "Адлер", "Краснодар", "Туапсе", "Ростов-на-Дону", "Имеретинский курорт"]
+    segments = []
+    for i in range(count):
+        minutes = i * 24 * 60 // count if ordered else (i * 23 + seed * 7) % (24 * 60)
+        time_str = f"{minutes // 60:02d}:{minutes % 60:02d}"
+        origin = cities[(i + seed) % len(cities)]
+        destination = cities[(i + seed + 3) % len(cities)]
+        number = f"{(i * 7 + seed) % 900 + 1:03d}С"
+        title = f"{origin} — {destination}"
+        name = "" if i % 3 else f'<span class="SearchSegment__headerTitle">«Фирменный {i}»</span>'
+        # Разновидности разметки: поезд без номера (только значок) и сегмент без маршрута
+        icon = (f'<span class="TransportIcon">Ласточка</span>' if i % 7 == 5 else
+                f'<span class="TransportIcon"><span class="TransportIcon__number">{number}</span></span>')
+        subtitle = "" if i % 11 == 10 else f'<div class="SearchSegment__headerSubtitle">{title}\n&nbsp;поезд</div>'
+        segments.append(f"""
+<article class="SearchSegment SearchSegment_type_train" data-index="{i}">
+  <header class="SearchSegment__header">
+    <div class="SearchSegment__transport">{icon}</div>
+    {name}
+    {subtitle}
+  </header>
+  <div class="SearchSegment__times">
+    <div class="SearchSegment__departure"><span class="SegmentTime"><span class="SegmentTime__time">{time_str if event_type == 'departure' else ''}</span></span></div>
+    <div class="SearchSegment__arrival"><span class="SegmentTime"><span class="SegmentTime__time">{time_str if event_type == 'arrival' else ''}</span></span></div>
+  </div>
+  <footer class="SearchSegment__footer"><a class="Link" href="/thread/{number}">Подробнее</a><div class="SearchSegment__stops">{'<span>остановка</span>' * 5}</div></footer>
+</article>""")
+    filler = "".join(f'<div class="Promo Promo_{i}"><img src="/i/{i}.png" alt=""><p>Реклама {i}</p></div>' for i in range(40))
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>Расписание поездов по станции Сочи</title>
+<script>window.__INITIAL_STATE__ = {{"page": "station", "event": "{event_type}"}};</script>
+<style>.SearchSegment{{display:block}}</style></head>
+<body><div class="Layout"><header class="Header"><nav>{filler}</nav></header>
+<main class="StationPage"><h1>Сочи</h1><section class="SearchSegments">{''.join(segments)}
+</section></main><footer class="Footer">{filler}</footer></div></body></html>"""
+
+
+class _RaspHandler(_QuietHandler):
+    def do_GET(self):
+        state = self.server_state
+        state.count_request()
+        query = parse_qs(urlparse(self.path).query)
+        event_type = query.get("event", ["departure"])[0]
+        delay = state.event_delays.get(event_type, state.delay)
+        if delay:
+            time.sleep(delay)
+        if event_type in state.failing_events:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = make_schedule_html(event_type, state.segments).encode("utf-8")
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            state.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        headers = {"Content-Type": "text/html; charset=utf-8", "ETag": etag,
+                   "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+        state.bytes_sent += len(body)
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeRaspServer(FakeServer):
+    """
+    Заглушка страниц станций rasp.yandex.ru (/station/<код>/?date=...&event=...).
+    Поддерживает gzip и условные запросы по ETag.
+    """
+
+    handler_class = _RaspHandler
+
+    def __init__(self, delay=0.0, segments=60, event_delays=None, failing_events=()):
+        self.segments = segments
+        self.event_delays = event_delays or {}
+        self.failing_events = set(failing_events)
+        self.not_modified = 0
+        self.bytes_sent = 0
+        super().__init__(delay)
+
+    @property
+    def base_url(self):
+        return f"{self.url}/station/{{}}/"
+
+
+def make_pass_trains(code0, code1, date, count=6):
+    """Генерирует ответ pass.rzd.ru ('tp' -> 'list' -> 'cars') для направления и даты."""
+    trains = []
+    for i in range(count):
+        departure_minutes = (i * 197 + 6 * 60) % (24 * 60)
+        trains.append({
+            "number": f"{(i * 37 + int(date[:2])) % 900 + 1:03d}С",
+            "date0": date, "time0": f"{departure_minutes // 60:02d}:{departure_minutes % 60:02d}",
+            "date1": date, "time1": f"{(departure_minutes // 60 + 12) % 24:02d}:{departure_minutes % 60:02d}",
+            "timeInWay": "12:00",
+            "cars": [
+                {"typeLoc": "Плацкарт", "tariff": 2500 + i * 100, "freeSeats": 10 + i},
+                {"typeLoc": "Купе", "tariff": 4500 + i * 100, "freeSeats": 5 + i},
+                {"typeLoc": "Купе", "tariff": 4700 + i * 100, "freeSeats": 2},
+            ],
+        })
+    return {"result": "OK", "tp": [{"from": code0, "where": code1, "date": date, "list": trains}]}
+
+
+class _RzdPassHandler(_QuietHandler):
+    def do_GET(self):
+        state = self.server_state
+        state.count_request()
+        if state.delay:
+            time.sleep(state.delay)
+        query = {name: values[0] for name, values in parse_qs(urlparse(self.path).query).items()}
+        if "rid" in query:
+            pending = state.take_rid(query["rid"], self.headers.get("Cookie", ""))
+            if pending is None:
+                self.send_json({"result": "FAIL", "message": "сессия не найдена"})
+            else:
+                self.send_json(make_pass_trains(*pending))
+            return
+        rid, session = state.new_rid((query.get("code0"), query.get("code1"), query.get("dt0")))
+        body = json.dumps({"result": "RID", "RID": rid}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Set-Cookie", f"JSESSIONID={session}; Path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeRzdPassServer(FakeServer):
+    """
+    Заглушка поиска поездов pass.rzd.ru: первый запрос возвращает RID и cookie
+    сессии, второй (с rid и той же cookie) - список поездов.
+    """
+
+    handler_class = _RzdPassHandler
+
+    def __init__(self, delay=0.0):
+        self._pending = {}
+        self._next_rid = 0
+        super().__init__(delay)
+
+    def new_rid(self, search):
+        with self._lock:
+            self._next_rid += 1
+            rid = str(self._next_rid)
+            session = f"s{self._next_rid}"
+            self._pending[rid] = (session, search)
+        return rid, session
+
+    def take_rid(self, rid, cookie):
+        with self._lock:
+            session, search = self._pending.get(rid, (None, None))
+            if session is None or f"JSESSIONID={session}" not in cookie:
+                return None
+            del self._pending[rid]
+        return search
+
+    @property
+    def search_url(self):
+        return f"{self.url}/timetable/public/ru"
+
+
+def make_completion_text(messages, words=120):
+    """Детерминированный 'ответ модели' длиной words слов, зависящий от промпта."""
+    seed = sum(len(message.get("content", "")) for message in messages)
+    return " ".join(f"совет{(seed + i) % 97}" for i in range(words))
+
+
+class _CompletionHandler(_QuietHandler):
+    def do_GET(self):
+        # GET /v1/models - проверка ключа (OpenAIService.probe)
+        state = self.server_state
+        state.count_request()
+        if state.delay:
+            time.sleep(state.delay)
+        self.send_json({"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model", "created": 0,
+                                                    "owned_by": "fake"}]})
+
+    def do_POST(self):
+        state = self.server_state
+        state.count_request()
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if state.delay:
+            time.sleep(state.delay)
+        text = make_completion_text(payload.get("messages", []), state.words)
+        if payload.get("stream"):
+            self.send_stream(payload.get("model", "fake"), text)
+            return
+        # Без потока ответ приходит целиком, когда сгенерировано последнее слово
+        if state.token_delay:
+            time.sleep(state.token_delay * state.words)
+        self.send_json({
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": state.words, "total_tokens": state.words},
+        })
+
+
+    def send_stream(self, model, text):
+        """Ответ stream=True: события SSE по одному слову с паузой token_delay."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            if i and self.server_state.token_delay:
+                time.sleep(self.server_state.token_delay)
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "finish_reason": None,
+                                                  "delta": {"content": word if i == 0 else " " + word}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class FakeCompletionServer(FakeServer):
+    """
+    Заглушка OpenAI Chat Completions (POST /v1/chat/completions) и списка моделей (GET /v1/models).
+    delay - задержка до первого слова (и ответа на список моделей), token_delay - пауза между словами;
+    поддерживает stream=True.
+    """
+
+    handler_class = _CompletionHandler
+
+    def __init__(self, delay=0.0, words=120, token_delay=0.0):
+        self.words = words
+        self.token_delay = token_delay
+        super().__init__(delay)
+
+    @property
+    def base_url(self):
+        return f"{self.url}/v1"
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""Загрузка модулей проекта, чьи файлы нельзя импортировать по имени (пробелы и скобки)."""
+
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def load_module(name, filename):
+    """Загружает ROOT/filename как модуль name и регистрирует его в sys.modules."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_rzd():
+    """Парсер РЖД ("RZD (1).py"), под именем RZD, как его импортирует веб-приложение."""
+    return load_module("RZD", "RZD (1).py")
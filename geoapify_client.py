@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# --- Константы ---
+GEOAPIFY_PLACES_URL = "https://api.geoapify.com/v2/places"
+DEFAULT_TIMEOUT = 20
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE_CONNECTIONS = 10
+KEEPALIVE_EXPIRY = 60
+
+
+def build_places_params(categories, lat, lon, radius, limit, api_key, lang=None):
+    """Собирает параметры запроса к Geoapify Places API."""
+    params = {
+        'categories': ",".join(categories),
+        'filter': f"circle:{lon},{lat},{radius}",
+        'bias': f"proximity:{lon},{lat}",
+        'limit': limit,
+        'apiKey': api_key,
+    }
+    if lang:
+        params['lang'] = lang
+    return params
+
+
+class AsyncGeoapifyClient:
+    """
+    Асинхронный клиент Geoapify с пулом keep-alive соединений.
+
+    Один экземпляр разделяется всеми обработчиками бота: TLS-соединение
+    открывается один раз и переиспользуется, а ожидание ответа не блокирует
+    цикл событий python-telegram-bot.
+    """
+
+    def __init__(self, api_key, base_url=GEOAPIFY_PLACES_URL, timeout=DEFAULT_TIMEOUT,
+                 max_connections=MAX_CONNECTIONS, transport=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._transport = transport
+        self._client = None
+
+    def _get_client(self):
+        # Клиент создается лениво, внутри работающего цикла событий
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=min(MAX_KEEPALIVE_CONNECTIONS, self.max_connections),
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            )
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits, transport=self._transport)
+        return self._client
+
+    async def search_features(self, categories, lat, lon, radius, limit, lang=None):
+        """
+        Выполняет поиск мест и возвращает список 'features' из ответа Geoapify.
+
+        Исключения httpx (TimeoutException, HTTPStatusError, RequestError)
+        пробрасываются вызывающему коду, который сам формирует сообщение об ошибке.
+        """
+        params = build_places_params(categories, lat, lon, radius, limit, self.api_key, lang)
+        logger.info(f"Geoapify: запрос categories={params['categories']}")
+        response = await self._get_client().get(self.base_url, params=params)
+        response.raise_for_status()
+        return response.json().get('features', [])
+
+    async def aclose(self):
+        """Закрывает пул соединений."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
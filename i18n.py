@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Скомпилированные каталоги переводов для веб-приложения и бота.
+
+Словари LANGUAGES ({язык: {ключ: текст}}) и CATEGORIES ({язык: {название:
+коды Geoapify}}) остаются в приложениях в исходном виде, а Catalog при
+первом обращении к языку превращает их в плоскую таблицу этого языка:
+  * ключи, которых нет в языке, сразу заполнены текстом языка по
+    умолчанию, поэтому поиск - одно обращение к словарю без цепочки .get;
+  * тексты без подстановок хранятся готовыми строками и не проходят через
+    str.format, а шаблоны вида "... {categories} ..." разобраны заранее
+    на куски текста и имена полей;
+  * коды категорий уже разбиты по запятым.
+Язык компилируется один раз при первом запросе на нем, остальные языки
+не занимают ни времени старта, ни памяти, пока к ним не обратились.
+"""
+
+import string
+import threading
+
+
+class Template:
+    """Текст с полями {name}, разобранный один раз; render(kwargs) подставляет значения."""
+
+    __slots__ = ('text', 'fields', '_literals', '_format')
+
+    def __init__(self, text):
+        self.text = text
+        literals, fields = [], []
+        simple = True
+        for literal, field, format_spec, conversion in string.Formatter().parse(text):
+            literals.append(literal)
+            if field is not None:
+                fields.append(field)
+                simple = simple and field.isidentifier() and not format_spec and not conversion
+        if len(literals) == len(fields):
+            literals.append("")
+        self.fields = tuple(fields)
+        self._literals = tuple(literals)
+        # Поля с форматом, преобразованием или атрибутами ({x:.1f}, {x!r}, {a.b}) подставляет str.format
+        self._format = None if simple else text.format
+
+    def render(self, kwargs):
+        if self._format is not None:
+            return self._format(**kwargs)
+        literals = self._literals
+        parts = [literals[0]]
+        for i, field in enumerate(self.fields):
+            value = kwargs[field]
+            parts.append(value if type(value) is str else str(value))
+            parts.append(literals[i + 1])
+        return "".join(parts)
+
+    def __repr__(self):
+        return f"Template({self.text!r})"
+
+
+def compile_text(text):
+    """Готовая строка для текста без полей (с раскрытыми {{ и }}), иначе Template."""
+    template = Template(text)
+    return template.render({}) if not template.fields else template
+
+
+class Language:
+    """Скомпилированный каталог одного языка."""
+
+    __slots__ = ('code', 'texts', 'categories', 'category_names', 'category_codes')
+
+    def __init__(self, code, texts, categories):
+        self.code = code
+        self.texts = {key: compile_text(text) for key, text in texts.items()}
+        self.categories = dict(categories)  # название на языке -> внутреннее значение
+        self.category_names = tuple(categories)
+        self.category_codes = {name: tuple(code.strip() for code in value.split(",") if code.strip())
+                               for name, value in categories.items()}
+
+    def translate(self, key, /, **kwargs):
+        """Текст по ключу; неизвестный ключ возвращается как есть."""
+        text = self.texts.get(key, key)
+        return text if type(text) is str else text.render(kwargs)
+
+
+class Catalog:
+    """
+    Переводы и категории приложения; языки компилируются лениво.
+
+    Для неизвестного языка используется язык по умолчанию, для отсутствующего
+    в языке ключа - текст языка по умолчанию, а если нет и его - сам ключ
+    (как прежняя цепочка LANGUAGES.get(...).get(...)).
+    """
+
+    def __init__(self, languages, default_language, categories=None):
+        self.default_language = default_language
+        self._languages = languages
+        self._categories = categories or {}
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def language(self, code):
+        compiled = self._compiled.get(code)
+        if compiled is None:
+            if code not in self._languages and code != self.default_language:
+                return self.language(self.default_language)
+            compiled = self._compile(code)
+        return compiled
+
+    def _compile(self, code):
+        with self._lock:
+            compiled = self._compiled.get(code)
+            if compiled is None:
+                default = self._languages.get(self.default_language, {})
+                texts = {**default, **self._languages.get(code, {})}
+                categories = self._categories.get(code)
+                if categories is None:
+                    categories = self._categories.get(self.default_language, {})
+                compiled = self._compiled[code] = Language(code, texts, categories)
+            return compiled
+
+    def translate(self, lang, key, /, **kwargs):
+        """
+        Текст по ключу на языке lang; Language.translate развернут здесь, это самый частый вызов.
+
+        lang и key только позиционные: шаблоны используют поля с такими же именами ({lang}).
+        """
+        compiled = self._compiled.get(lang) or self.language(lang)
+        text = compiled.texts.get(key, key)
+        return text if type(text) is str else text.render(kwargs)
+
+    def categories(self, lang):
+        return self.language(lang).categories
+
+    def stats(self):
+        return {'languages': len(self._languages), 'compiled': sorted(self._compiled)}
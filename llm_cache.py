@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Постоянный кэш рекомендаций LLM и хранилище заранее сгенерированных рекомендаций.
+
+Текст рекомендаций зависит только от набора выбранных категорий, языка
+и версии промпта, поэтому ответ модели сохраняется в общем для всех
+воркеров кэше SQLite (shared_cache.py) по ключу из этих значений и
+переживает перезапуски приложения. Перед диском стоит
+небольшой in-process TTLLRUCache: повторные попадания обслуживаются
+из памяти за микросекунды, а диск читается только при первом обращении
+процесса к записи.
+
+Вытеснение или invalidate() в общем кэше (в том числе другим воркером)
+не удаляет копии из памяти остальных процессов. Поэтому запись живет в
+памяти не дольше MEMORY_TTL_SECONDS и не дольше, чем в общем кэше:
+удаленная из файла рекомендация может отдаваться процессом еще не более
+нескольких минут. Текст при этом остается верным для своего ключа.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from place_cache import TTLLRUCache
+from shared_cache import SharedCache
+
+logger = logging.getLogger(__name__)
+
+# --- Константы ---
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60  # рекомендации по Сочи не устаревают быстро
+DEFAULT_MAX_ENTRIES = 5000
+MEMORY_ENTRIES = 256
+MEMORY_TTL_SECONDS = 5 * 60  # сколько процесс может отдавать запись, удаленную из общего кэша другим воркером
+NAMESPACE = "llm"  # пространство имен в общем кэше
+
+
+def recommendation_cache_key(internal_values, lang, prompt_version):
+    """
+    Ключ записи: версия промпта, язык и отсортированные внутренние значения
+    категорий ('beach', 'rzd_schedule', ...), а не их локализованные названия.
+    """
+    values = sorted({value.strip() for value in internal_values if value and value.strip()})
+    return f"{prompt_version}|{lang}|{';'.join(values)}"
+
+
+class RecommendationCache:
+    """
+    Кэш рекомендаций в общем файле SQLite (shared_cache.SharedCache,
+    пространство имен 'llm') с временем жизни записей и ограничением размера:
+    при превышении max_entries удаляются давно не читавшиеся записи. Файл общий для
+    всех воркеров, поэтому рекомендацию, полученную одним из них, видят все.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 memory_entries=MEMORY_ENTRIES, memory_ttl=MEMORY_TTL_SECONDS, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Файл и схема создаются сразу, чтобы ошибки конфигурации были видны при старте
+        self._shared = SharedCache(path, NAMESPACE, ttl=ttl, max_entries=max_entries, clock=clock)
+        self._memory = TTLLRUCache(max_entries=memory_entries, ttl=min(ttl, memory_ttl), clock=clock)
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Рекомендация из кэша или None, если записи нет или она устарела."""
+        value = self._memory.get(key)
+        if value is not None:
+            self._count(True)
+            return value
+        entry = self._shared.get_entry(key)
+        if entry is None:
+            self._count(False)
+            return None
+        value, expires_at = entry
+        # В памяти запись живет не дольше, чем в общем кэше, и не дольше memory_ttl
+        self._memory.set(key, value, ttl=min(expires_at - self._clock(), self._memory.ttl))
+        self._count(True)
+        return value
+
+    def set(self, key, value):
+        """Сохраняет рекомендацию; при переполнении общий кэш удаляет устаревшие и давно не читавшиеся записи."""
+        self._shared.set(key, value)
+        self._memory.set(key, value)
+
+    def invalidate(self, key):
+        self._shared.invalidate(key)
+        self._memory.invalidate(key)
+
+    def clear(self):
+        self._shared.clear()
+        self._memory.clear()
+
+    def __len__(self):
+        return len(self._shared)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            }
+        shared = self._shared.stats()
+        stats['evictions'] = shared['evictions']
+        stats['entries'] = shared.get('entries')
+        stats['max_entries'] = self.max_entries
+        stats['memory'] = self._memory.stats()
+        return stats
+
+
+_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recommendations (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+)
+"""
+
+
+class RecommendationStore:
+    """
+    Заранее сгенерированные рекомендации (см. llm_precompute.py).
+
+    Файл SQLite с текстами, сжатыми zlib; при открытии все записи читаются
+    в словарь и дальше отдаются без обращения к диску. Записей немного
+    (наборы категорий x языки), поэтому в памяти хранится сжатый текст,
+    а распаковка происходит при чтении.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._data = {}
+        self.meta = {}
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            connection = sqlite3.connect(path)
+            try:
+                self._data = dict(connection.execute("SELECT key, value FROM recommendations"))
+                self.meta = dict(connection.execute("SELECT name, value FROM meta"))
+            except sqlite3.DatabaseError as e:
+                logger.error(f"Не удалось прочитать хранилище рекомендаций {path}: {e}")
+            finally:
+                connection.close()
+            logger.info(f"Хранилище рекомендаций {path}: {len(self._data)} записей.")
+
+    def get(self, key):
+        compressed = self._data.get(key)
+        if compressed is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return zlib.decompress(compressed).decode('utf-8')
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'meta': self.meta,
+        }
+
+
+class RecommendationStoreWriter:
+    """Запись в хранилище рекомендаций; каждая запись фиксируется сразу, поэтому прерванную генерацию можно продолжить."""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.executescript(_STORE_SCHEMA)
+
+    def keys(self):
+        return {row[0] for row in self.connection.execute("SELECT key FROM recommendations")}
+
+    def put(self, key, value):
+        self.connection.execute("INSERT OR REPLACE INTO recommendations (key, value) VALUES (?, ?)",
+                                (key, zlib.compress(value.encode('utf-8'), 9)))
+
+    def set_meta(self, **values):
+        self.connection.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                                    [(name, str(value)) for name, value in values.items()])
+
+    def close(self):
+        self.connection.close()
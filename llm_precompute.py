@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Офлайн-генерация рекомендаций LLM для наборов категорий веб-приложения.
+
+Категорий всего 9, языков 3, поэтому все наборы (или наборы до --max-size
+категорий) перебираются заранее, а /search берет готовый текст из
+хранилища (llm_cache.RecommendationStore) вместо запроса к OpenAI.
+
+Промпт, модель и список категорий берутся из самого приложения, поэтому
+ключи хранилища совпадают с теми, что ищет /search. Модель входит в ключ:
+хранилище, построенное с --model X, не используется приложением с другой
+LLM_MODEL. Запросы идут с
+ограниченной параллельностью; каждая запись сохраняется сразу, и
+повторный запуск продолжает с того места, где прервался предыдущий.
+
+Запуск:
+    python llm_precompute.py [--max-size 3] [--concurrency 4] [--base-url http://127.0.0.1:8000/v1]
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from itertools import combinations
+
+from llm_cache import RecommendationStoreWriter, recommendation_cache_key
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_APP_FILE = "app (5).py"
+
+
+def load_app(filename=DEFAULT_APP_FILE):
+    """Модуль веб-приложения (имя файла содержит пробел, поэтому через importlib)."""
+    # Импорт модуля фоновых задач не запускает (они стартуют с первым запросом), расписания РЖД задаче не нужны
+    spec = importlib.util.spec_from_file_location("sochi_app", os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def iter_selections(categories, max_size=None):
+    """Все непустые наборы категорий языка: (названия в порядке формы, внутренние значения)."""
+    items = list(categories.items())
+    for size in range(1, min(max_size or len(items), len(items)) + 1):
+        for selection in combinations(items, size):
+            yield [name for name, _ in selection], [value for _, value in selection]
+
+
+def plan(app, languages, max_size, done, model):
+    """Задания (ключ, названия, язык), которых еще нет в хранилище; ключ включает версию промпта и модель."""
+    tasks = []
+    version = app.llm_key_version(model)
+    for lang in languages:
+        for names, values in iter_selections(app.CATEGORIES[lang], max_size):
+            key = recommendation_cache_key(values, lang, version)
+            if key not in done:
+                tasks.append((key, names, lang))
+    return tasks
+
+
+def generate(client, app, model, names, lang):
+    response = client.chat.completions.create(
+        model=model,
+        messages=app.build_llm_messages(names, lang),
+        temperature=app.LLM_TEMPERATURE,
+        max_tokens=app.LLM_MAX_TOKENS,
+    )
+    return (response.choices[0].message.content or "").strip()
+
+
+def run(app, client, writer, tasks, model, concurrency):
+    """Выполняет задания не более чем concurrency одновременно; возвращает (успешно, с ошибкой)."""
+    generated = failed = 0
+    started = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="llm-precompute")
+    try:
+        futures = {executor.submit(generate, client, app, model, names, lang): key for key, names, lang in tasks}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                text = future.result()
+            except Exception as e:
+                failed += 1
+                logger.error(f"{key}: ошибка генерации: {e}")
+                continue
+            if not text:
+                failed += 1
+                logger.warning(f"{key}: пустой ответ модели")
+                continue
+            writer.put(key, text)
+            generated += 1
+            if generated % 25 == 0:
+                logger.info(f"Готово {generated + failed} из {len(tasks)} ({time.perf_counter() - started:.0f} с)")
+    except KeyboardInterrupt:
+        logger.warning("Прервано: сохраненные записи останутся, повторный запуск продолжит генерацию.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return generated, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default=DEFAULT_APP_FILE, help="файл веб-приложения с CATEGORIES и промптом")
+    parser.add_argument("--out", help="файл хранилища (по умолчанию LLM_PRECOMPUTED_PATH приложения)")
+    parser.add_argument("--languages", help="языки через запятую (по умолчанию SUPPORTED_LANGUAGES)")
+    parser.add_argument("--max-size", type=int, help="максимальное число категорий в наборе (по умолчанию все)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--model", help="модель (по умолчанию LLM_MODEL приложения)")
+    parser.add_argument("--base-url", default=os.environ.get("OPENAI_BASE_URL"),
+                        help="адрес OpenAI-совместимого API")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    import openai
+
+    app = load_app(args.app)
+    out = args.out or app.LLM_PRECOMPUTED_PATH
+    languages = args.languages.split(",") if args.languages else app.SUPPORTED_LANGUAGES
+    model = args.model or app.LLM_MODEL
+
+    writer = RecommendationStoreWriter(out)
+    try:
+        tasks = plan(app, languages, args.max_size, writer.keys(), model)
+        logger.info(f"Хранилище {out}: к генерации {len(tasks)} наборов (модель {model}, параллельно {args.concurrency}).")
+        if not tasks:
+            return
+        client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY", "not-needed"), base_url=args.base_url,
+                               timeout=args.timeout, max_retries=3)
+        generated, failed = run(app, client, writer, tasks, model, args.concurrency)
+        writer.set_meta(prompt_version=app.LLM_PROMPT_VERSION, model=model, base_url=args.base_url or "",
+                        updated_at=datetime.now().isoformat(timespec="seconds"))
+        logger.info(f"Сгенерировано {generated}, с ошибкой {failed}.")
+        if failed:
+            sys.exit(1)
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,28 @@
+from __future__ import annotations  # аннотации обработчиков не требуют импорта telegram.ext
+
 import logging
 import os
-import requests
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import (
-    ApplicationBuilder,
-    CommandHandler,
-    MessageHandler,
-    CallbackQueryHandler,
-    filters,
-    ContextTypes,
-)
+import secrets
+from typing import TYPE_CHECKING
+
+import httpx
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from datetime import datetime, timedelta
 
+if TYPE_CHECKING:
+    # telegram.ext (Application, обработчики, JobQueue) импортируется только в main()
+    from telegram import Update
+    from telegram.ext import ContextTypes
+
+from geoapify_client import AsyncGeoapifyClient
+from place_cache import TTLLRUCache
+from shared_cache import open_shared_cache
+from i18n import Catalog
+from place_search import MODE_FANOUT, PlaceSearchEngine
+from poi_store import load_store
+from rzd_tickets import TicketService, create_provider, load_express_codes
+from station_index import StationIndex
+
 # Настройка логирования
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -31,6 +42,30 @@ SOCHI_LON = 39.7303
 SEARCH_RADIUS_METERS = 15000
 RESULT_LIMIT = 50
 
+# Общий асинхронный клиент Geoapify (пул keep-alive соединений)
+geoapify_client = AsyncGeoapifyClient(GEOAPIFY_API_KEY, timeout=20)
+
+# Кэш ответов Geoapify: ключ - коды категорий, а не их названия на языке пользователя.
+# Хранится в общем с веб-приложением файле (shared_cache.py); SHARED_CACHE_PATH="" - кэш в памяти процесса
+PLACES_CACHE_TTL_SECONDS = int(os.environ.get("PLACES_CACHE_TTL_SECONDS", 12 * 60 * 60))
+PLACES_CACHE_MAX_ENTRIES = int(os.environ.get("PLACES_CACHE_MAX_ENTRIES", 1000))
+places_cache = open_shared_cache("places", ttl=PLACES_CACHE_TTL_SECONDS, max_entries=PLACES_CACHE_MAX_ENTRIES)
+if places_cache is None:
+    places_cache = TTLLRUCache(max_entries=256, ttl=PLACES_CACHE_TTL_SECONDS)
+# fanout: каждая категория кэшируется отдельно, комбинации собираются локально
+PLACES_SEARCH_MODE = os.environ.get("PLACES_SEARCH_MODE", MODE_FANOUT)
+# Локальная база POI (см. poi_store.py); если файл задан, Geoapify в поиске не участвует
+POI_STORE_PATH = os.environ.get("POI_STORE_PATH")
+places_engine = PlaceSearchEngine(
+    places_cache, SOCHI_LAT, SOCHI_LON, SEARCH_RADIUS_METERS, RESULT_LIMIT, mode=PLACES_SEARCH_MODE,
+    store=load_store(POI_STORE_PATH),
+)
+
+# Поиск поездов: провайдер задается RZD_TICKET_PROVIDER (stub | rzd), ответы кэшируются на несколько минут
+ticket_service = TicketService(create_provider())
+# Сколько следующих дат запрашивает кнопка "Поезда на N дня вперед" (одним раундом параллельных запросов)
+TICKETS_DAYS_AHEAD = 3
+
 # --- Многоязычные категории ---
 CATEGORIES = {
     "ru": {
@@ -116,6 +151,7 @@ LANGUAGES = {
         "rzd_sochi_spb": "Сочи - СПб",
         "rzd_sochi_krasnodar": "Сочи - Краснодар",
         "rzd_other_route": "Другой маршрут",
+        "rzd_next_days": "Поезда на {days} дня вперед",
         "rzd_enter_route": "Введите маршрут: Город - Город",
         "rzd_train": "Поезд",
         "rzd_departure": "Отправление",
@@ -124,6 +160,11 @@ LANGUAGES = {
         "rzd_price_rub": "руб.",
         "rzd_seats_available": "мест",
         "rzd_buy_tickets": "🔗 Купить билеты:",
+        "more_results": "Ещё ▶",
+        "previous_results": "◀ Назад",
+        "results_expired": "Результаты устарели. Повторите поиск.",
+        "rzd_unknown_station": "Станция «{name}» не найдена.",
+        "rzd_did_you_mean": "Возможно, вы имели в виду: {suggestions}",
     },
     "en": {
         "welcome": "Hello! I'm a bot for finding places in Sochi and buying tickets.\nChoose categories:",
@@ -148,6 +189,7 @@ LANGUAGES = {
         "rzd_sochi_spb": "Sochi - Saint Petersburg",
         "rzd_sochi_krasnodar": "Sochi - Krasnodar",
         "rzd_other_route": "Other route",
+        "rzd_next_days": "Trains for the next {days} days",
         "rzd_enter_route": "Enter route: City - City",
         "rzd_train": "Train",
         "rzd_departure": "Departure",
@@ -156,6 +198,11 @@ LANGUAGES = {
         "rzd_price_rub": "RUB",
         "rzd_seats_available": "seats",
         "rzd_buy_tickets": "🔗 Buy tickets:",
+        "more_results": "More ▶",
+        "previous_results": "◀ Back",
+        "results_expired": "These results have expired. Please search again.",
+        "rzd_unknown_station": "Station \"{name}\" was not found.",
+        "rzd_did_you_mean": "Did you mean: {suggestions}",
     },
     "zh": {
         "welcome": "你好！我是索契景点搜索和购票机器人。\n选择类别：",
@@ -180,6 +227,7 @@ LANGUAGES = {
         "rzd_sochi_spb": "索契 - 圣彼得堡",
         "rzd_sochi_krasnodar": "索契 - 克拉斯诺达尔",
         "rzd_other_route": "其他路线",
+        "rzd_next_days": "未来{days}天的列车",
         "rzd_enter_route": "输入路线：城市 - 城市",
         "rzd_train": "列车",
         "rzd_departure": "出发",
@@ -188,6 +236,11 @@ LANGUAGES = {
         "rzd_price_rub": "卢布",
         "rzd_seats_available": "座位",
         "rzd_buy_tickets": "🔗 购买车票：",
+        "more_results": "更多 ▶",
+        "previous_results": "◀ 返回",
+        "results_expired": "结果已过期，请重新搜索。",
+        "rzd_unknown_station": "未找到车站“{name}”。",
+        "rzd_did_you_mean": "您是不是要找：{suggestions}",
     },
     "fa": {
         "welcome": "سلام! من رباتی برای یافتن مکان‌ها در سوچی و خرید بلیط هستم.\nدسته‌ها را انتخاب کنید:",
@@ -212,6 +265,7 @@ LANGUAGES = {
         "rzd_sochi_spb": "سوچی - سن پترزبورگ",
         "rzd_sochi_krasnodar": "سوچی - کراسنودار",
         "rzd_other_route": "مسیر دیگر",
+        "rzd_next_days": "قطارهای {days} روز آینده",
         "rzd_enter_route": "مسیر را وارد کنید: شهر - شهر",
         "rzd_train": "قطار",
         "rzd_departure": "حرکت",
@@ -220,6 +274,11 @@ LANGUAGES = {
         "rzd_price_rub": "روبل",
         "rzd_seats_available": "صندلی",
         "rzd_buy_tickets": "🔗 خرید بلیط:",
+        "more_results": "بیشتر ▶",
+        "previous_results": "◀ بازگشت",
+        "results_expired": "این نتایج منقضی شده‌اند. لطفاً دوباره جستجو کنید.",
+        "rzd_unknown_station": "ایستگاه «{name}» پیدا نشد.",
+        "rzd_did_you_mean": "شاید منظورتان این بود: {suggestions}",
     },
     "tr": {
         "welcome": "Merhaba! Soçi'de yer bulma ve bilet satın alma botuyum.\nKategorileri seçin:",
@@ -244,6 +303,7 @@ LANGUAGES = {
         "rzd_sochi_spb": "Soçi - St. Petersburg",
         "rzd_sochi_krasnodar": "Soçi - Krasnodar",
         "rzd_other_route": "Diğer güzergah",
+        "rzd_next_days": "Sonraki {days} günün trenleri",
         "rzd_enter_route": "Güzergahı girin: Şehir - Şehir",
         "rzd_train": "Tren",
         "rzd_departure": "Kalkış",
@@ -252,116 +312,319 @@ LANGUAGES = {
         "rzd_price_rub": "RUB",
         "rzd_seats_available": "koltuk",
         "rzd_buy_tickets": "🔗 Bilet satın al:",
+        "more_results": "Daha fazla ▶",
+        "previous_results": "◀ Geri",
+        "results_expired": "Bu sonuçların süresi doldu. Lütfen tekrar arayın.",
+        "rzd_unknown_station": "\"{name}\" istasyonu bulunamadı.",
+        "rzd_did_you_mean": "Bunu mu demek istediniz: {suggestions}",
     },
 }
 
 
-# Функция для запроса билетов РЖД (заглушка)
-def get_rzd_tickets(from_station, to_station, date, lang="ru"):
+# Индекс названий станций: опечатки и написания на любом языке бота сводятся к станции до запроса билетов
+station_index = StationIndex(codes=load_express_codes())
+station_index.add_route_labels(LANGUAGES, {
+    "rzd_sochi_moscow": ("Сочи", "Москва"),
+    "rzd_sochi_spb": ("Сочи", "Санкт-Петербург"),
+    "rzd_sochi_krasnodar": ("Сочи", "Краснодар"),
+})
+
+# Переводы и категории компилируются в плоские таблицы при первом обращении к языку (см. i18n.py);
+# tr(lang, key, **поля) - текст бота с подстановкой полей шаблона
+catalog = Catalog(LANGUAGES, "ru", CATEGORIES)
+tr = catalog.translate
+
+
+# --- Клавиатуры ---
+LANGUAGE_PROMPT = "Выберите язык / Choose language / 选择语言 / زبان را انتخاب کنید / Dil seçin:"
+LANGUAGE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Русский", callback_data="lang_ru")],
+    [InlineKeyboardButton("English", callback_data="lang_en")],
+    [InlineKeyboardButton("中文", callback_data="lang_zh")],
+    [InlineKeyboardButton("فارسی", callback_data="lang_fa")],
+    [InlineKeyboardButton("Türkçe", callback_data="lang_tr")],
+])
+
+CATEGORY_CALLBACK_PREFIX = "cat_"             # cat_<номер категории в языке>
+LEGACY_CATEGORY_CALLBACK_PREFIX = "category_"  # кнопки, отправленные до перехода на номера
+
+
+class CategoryKeyboards:
+    """
+    Клавиатуры выбора категорий по (язык, битовая маска выбранных категорий).
+
+    Выбор пользователя хранится в user_data["selected_mask"]: бит i - i-я
+    категория языка (catalog.language(lang).category_names). Разметка для
+    каждой маски собирается один раз и дальше берется из словаря, поэтому
+    нажатие на категорию - смена бита и поиск в словаре. Вариантов не больше
+    2^10 на язык; собираются только встретившиеся, кнопки разделяются между ними.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._buttons = {}  # язык -> ((кнопка, кнопка с ✅) для каждой категории)
+        self._markups = {}  # (язык, маска, есть ли "Готово") -> InlineKeyboardMarkup
+
+    def _category_buttons(self, lang):
+        buttons = self._buttons.get(lang)
+        if buttons is None:
+            buttons = self._buttons[lang] = tuple(
+                (InlineKeyboardButton(name, callback_data=f"{CATEGORY_CALLBACK_PREFIX}{index}"),
+                 InlineKeyboardButton(f"✅ {name}", callback_data=f"{CATEGORY_CALLBACK_PREFIX}{index}"))
+                for index, name in enumerate(self.catalog.language(lang).category_names)
+            )
+        return buttons
+
+    def markup(self, lang, mask=0, done=True):
+        lang = self.catalog.language(lang).code
+        key = (lang, mask, done)
+        markup = self._markups.get(key)
+        if markup is None:
+            rows = [[pair[mask >> index & 1]] for index, pair in enumerate(self._category_buttons(lang))]
+            if done:
+                rows.append([InlineKeyboardButton(tr(lang, "done"), callback_data="done")])
+            markup = self._markups[key] = InlineKeyboardMarkup(rows)
+        return markup
+
+    def callback_index(self, lang, callback_data):
+        """Номер категории из callback_data (cat_<номер> или прежний category_<название>), None если не найдена."""
+        names = self.catalog.language(lang).category_names
+        if callback_data.startswith(CATEGORY_CALLBACK_PREFIX):
+            index = callback_data[len(CATEGORY_CALLBACK_PREFIX):]
+            index = int(index) if index.isdigit() else -1
+        else:
+            name = callback_data[len(LEGACY_CATEGORY_CALLBACK_PREFIX):]
+            index = names.index(name) if name in names else -1
+        return index if 0 <= index < len(names) else None
+
+    def selected_names(self, lang, mask):
+        return [name for index, name in enumerate(self.catalog.language(lang).category_names) if mask >> index & 1]
+
+    def stats(self):
+        return {'languages': len(self._buttons), 'markups': len(self._markups)}
+
+
+category_keyboards = CategoryKeyboards(catalog)
+
+
+TICKET_KEYWORDS = ["билет", "поезд", "ржд", "ticket", "train"]
+
+
+def strip_ticket_keywords(text):
+    """'Билеты Сочи' -> 'Сочи': слова-признаки запроса билетов не входят в название станции."""
+    return " ".join(word for word in text.split() if not any(word.lower().startswith(k) for k in TICKET_KEYWORDS))
+
+
+def resolve_station(name, lang="ru"):
+    """
+    Станция (StationName: каноническое название и код "Экспресс-3") или (None, сообщение
+    с вариантами для пользователя). Если провайдер билетов ищет по кодам, станция без кода
+    считается ненайденной, а в вариантах остаются только станции с кодом.
+    """
+    needs_codes = ticket_service.provider.needs_codes
+    match = station_index.resolve(name)
+    if match is not None and (match.station.code or not needs_codes):
+        return match.station, None
+    message = tr(lang, "rzd_unknown_station", name=name)
+    suggestions = station_index.suggest(name, with_code=needs_codes)
+    if suggestions:
+        message += "\n" + tr(lang, "rzd_did_you_mean", suggestions=", ".join(suggestions))
+    return None, message
+
+
+def _tickets_error_message(error, lang):
+    if isinstance(error, httpx.TimeoutException):
+        return tr(lang, "timeout_error")
+    if isinstance(error, httpx.HTTPError):
+        return tr(lang, "connection_error", error=error)
+    return tr(lang, "general_error", error=error)
+
+
+# Функция для запроса билетов РЖД
+async def get_rzd_tickets(from_station, to_station, date, lang="ru"):
     try:
-        tickets = [
-            {
-                "train": "044С",
-                "departure": f"{date} 08:30",
-                "arrival": f"{date} 20:45",
-                "duration": "12ч 15м",
-                "classes": {
-                    "Плацкарт": {"price": 2500, "seats": 15},
-                    "Купе": {"price": 4500, "seats": 8}
-                }
-            },
-            {
-                "train": "104В",
-                "departure": f"{date} 18:15",
-                "arrival": f"{date} 06:30+1",
-                "duration": "12ч 15м",
-                "classes": {
-                    "Плацкарт": {"price": 2700, "seats": 10},
-                    "Купе": {"price": 4900, "seats": 5},
-                    "СВ": {"price": 7500, "seats": 3}
-                }
-            }
-        ]
-        return tickets, None
+        return await ticket_service.search(from_station, to_station, date), None
     except Exception as e:
         logger.error(f"Ошибка при запросе билетов РЖД: {e}")
-        return None, LANGUAGES[lang]["general_error"].format(error=e)
+        return None, _tickets_error_message(e, lang)
+
+
+# Билеты на несколько дат одним раундом параллельных запросов: {date: (tickets, error)}
+async def get_rzd_tickets_for_dates(from_station, to_station, dates, lang="ru"):
+    results = await ticket_service.search_dates(from_station, to_station, dates)
+    answers = {}
+    for date, result in results.items():
+        if isinstance(result, Exception):
+            logger.error(f"Ошибка при запросе билетов РЖД на {date}: {result}")
+            answers[date] = (None, _tickets_error_message(result, lang))
+        else:
+            answers[date] = (result, None)
+    return answers
 
 
 # Функция для поиска мест через Geoapify
-def search_places(selected_keys, lang="ru"):
+async def search_places(selected_keys, lang="ru"):
     if "rzd_tickets" in selected_keys:
         return [], None
 
-    geoapify_categories_set = set()
-    for key in selected_keys:
-        if key in CATEGORIES[lang]:
-            codes = CATEGORIES[lang][key].split(',')
-            geoapify_categories_set.update(c.strip() for c in codes if c.strip())
-
-    if not geoapify_categories_set:
-        return None, LANGUAGES[lang]["no_results"].format(categories=", ".join(selected_keys))
-
-    api_params = {
-        'categories': ",".join(geoapify_categories_set),
-        'filter': f"circle:{SOCHI_LON},{SOCHI_LAT},{SEARCH_RADIUS_METERS}",
-        'bias': f"proximity:{SOCHI_LON},{SOCHI_LAT}",
-        'limit': RESULT_LIMIT,
-        'apiKey': GEOAPIFY_API_KEY
-    }
+    # По группе кодов на категорию: каждая группа кэшируется отдельно (см. PlaceSearchEngine)
+    category_codes = catalog.language(lang).category_codes
+    geoapify_category_groups = [category_codes[key] for key in selected_keys if category_codes.get(key)]
+
+    if not geoapify_category_groups:
+        return None, tr(lang, "no_results", categories=", ".join(selected_keys))
 
-    api_url = "https://api.geoapify.com/v2/places"
     found_places = []
     error_message = None
 
     try:
-        response = requests.get(api_url, params=api_params, timeout=20)
-        response.raise_for_status()
-        data = response.json()
-
-        if data.get('features'):
-            for feature in data['features']:
-                properties = feature.get('properties', {})
-                name = properties.get('name')
-                lon = properties.get('lon')
-                lat = properties.get('lat')
-                if name and lon is not None and lat is not None:
-                    address = properties.get('formatted', LANGUAGES[lang]["no_address"])
-                    map_link = f"https://www.openstreetmap.org/?mlat={lat}&mlon={lon}#map=16/{lat}/{lon}"
-                    found_places.append({
-                        'name': name,
-                        'address': address,
-                        'map_link': map_link,
-                    })
+        async def fetch(codes):
+            return await geoapify_client.search_features(
+                codes, SOCHI_LAT, SOCHI_LON, SEARCH_RADIUS_METERS, RESULT_LIMIT
+            )
+
+        features = await places_engine.search_async(geoapify_category_groups, fetch)
+
+        for feature in features:
+            properties = feature.get('properties', {})
+            name = properties.get('name')
+            lon = properties.get('lon')
+            lat = properties.get('lat')
+            if name and lon is not None and lat is not None:
+                address = properties.get('formatted', tr(lang, "no_address"))
+                map_link = f"https://www.openstreetmap.org/?mlat={lat}&mlon={lon}#map=16/{lat}/{lon}"
+                found_places.append({
+                    'name': name,
+                    'address': address,
+                    'map_link': map_link,
+                })
 
         if not found_places:
             selected_names = ", ".join(selected_keys)
-            error_message = LANGUAGES[lang]["no_results"].format(categories=selected_names)
+            error_message = tr(lang, "no_results", categories=selected_names)
 
-    except requests.exceptions.Timeout:
-        error_message = LANGUAGES[lang]["timeout_error"]
-    except requests.exceptions.RequestException as e:
-        error_message = LANGUAGES[lang]["connection_error"].format(error=e)
+    except httpx.TimeoutException:
+        error_message = tr(lang, "timeout_error")
+    except httpx.HTTPError as e:
+        error_message = tr(lang, "connection_error", error=e)
     except Exception as e:
-        error_message = LANGUAGES[lang]["general_error"].format(error=e)
+        error_message = tr(lang, "general_error", error=e)
 
     return found_places, error_message
 
 
+# Курсоры результатов: уже полученный список мест листается кнопками без нового запроса.
+# Курсор живет PLACES_CURSOR_TTL_SECONDS с момента последнего обращения.
+PLACES_PAGE_SIZE = 5
+PLACES_CURSOR_TTL_SECONDS = 30 * 60
+places_cursors = TTLLRUCache(max_entries=1000, ttl=PLACES_CURSOR_TTL_SECONDS)
+
+
+def create_places_cursor(header, places):
+    cursor_id = secrets.token_hex(6)
+    places_cursors.set(cursor_id, {"header": header, "places": places})
+    return cursor_id
+
+
+def render_places_page(cursor_id, page, lang):
+    """Возвращает (текст, клавиатура) для страницы курсора или (None, None), если курсор истек."""
+    cursor = places_cursors.get(cursor_id)
+    if cursor is None:
+        return None, None
+    places_cursors.set(cursor_id, cursor)  # продлеваем жизнь активного курсора
+
+    places = cursor["places"]
+    pages = (len(places) + PLACES_PAGE_SIZE - 1) // PLACES_PAGE_SIZE
+    page = max(0, min(page, pages - 1))
+    response = cursor["header"]
+    address_label, map_label = tr(lang, "address"), tr(lang, "map")
+    for place in places[page * PLACES_PAGE_SIZE:(page + 1) * PLACES_PAGE_SIZE]:
+        response += (
+            f"📍 {place['name']}\n"
+            f"{address_label}: {place['address']}\n"
+            f"{map_label}: {place['map_link']}\n\n"
+        )
+    if pages > 1:
+        response += f"{page + 1}/{pages}"
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(tr(lang, "previous_results"), callback_data=f"page_{cursor_id}_{page - 1}"))
+    if page < pages - 1:
+        buttons.append(InlineKeyboardButton(tr(lang, "more_results"), callback_data=f"page_{cursor_id}_{page + 1}"))
+    return response, InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+def format_tickets_message(tickets, from_st, to_st, date, lang):
+    """Текст ответа со списком поездов; подписи берутся из каталога один раз на сообщение."""
+    train, departure, arrival, duration, price_rub, seats = (
+        tr(lang, key) for key in ("rzd_train", "rzd_departure", "rzd_arrival", "rzd_duration",
+                                  "rzd_price_rub", "rzd_seats_available"))
+    response = f"🚂 {tr(lang, 'rzd_tickets')} {from_st} - {to_st} ({date}):\n\n"
+    for ticket in tickets:
+        response += (
+            f"{train} {ticket['train']}\n"
+            f"{departure}: {ticket['departure']}\n"
+            f"{arrival}: {ticket['arrival']}\n"
+            f"{duration}: {ticket['duration']}\n"
+        )
+        for cls, info in ticket['classes'].items():
+            response += f"- {cls}: {info['price']} {price_rub} ({seats}: {info['seats']})\n"
+        response += "\n"
+
+    response += f"{tr(lang, 'rzd_buy_tickets')} https://pass.rzd.ru"
+    return response
+
+
+def _tickets_answer(tickets, error, from_st, to_st, date, lang):
+    """Текст ответа для одной даты: список поездов, ошибка или "ничего не найдено"."""
+    if error:
+        return error
+    if not tickets:
+        return tr(lang, "no_results", categories=f"{from_st} - {to_st} ({date})")
+    return format_tickets_message(tickets, from_st, to_st, date, lang)
+
+
+async def reply_with_tickets(message, user_data, from_st, to_st, lang):
+    """Поезда на завтра и кнопка запроса следующих TICKETS_DAYS_AHEAD дат того же маршрута."""
+    date = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%Y")
+    tickets, error = await get_rzd_tickets(from_st, to_st, date, lang)
+    if error:
+        await message.reply_text(error)
+        return
+    user_data["last_tickets_query"] = (from_st, to_st, date)
+    next_days = InlineKeyboardMarkup([[InlineKeyboardButton(
+        tr(lang, "rzd_next_days", days=TICKETS_DAYS_AHEAD), callback_data="tickets_next_days")]])
+    await message.reply_text(_tickets_answer(tickets, None, from_st, to_st, date, lang), reply_markup=next_days)
+
+
+async def reply_with_next_days(message, from_st, to_st, date, lang):
+    """Поезда на TICKETS_DAYS_AHEAD дат после date: все даты запрашиваются одновременно, ответ - по сообщению на дату."""
+    first = datetime.strptime(date, "%d.%m.%Y")
+    dates = [(first + timedelta(days=offset)).strftime("%d.%m.%Y") for offset in range(1, TICKETS_DAYS_AHEAD + 1)]
+    answers = await get_rzd_tickets_for_dates(from_st, to_st, dates, lang)
+    for day in dates:
+        tickets, error = answers[day]
+        await message.reply_text(_tickets_answer(tickets, error, from_st, to_st, day, lang))
+
+
+async def reply_with_places(message, places, error, selected, lang):
+    """Отправляет первую страницу найденных мест (или сообщение об ошибке)."""
+    response = tr(lang, "welcome").split("\n")[0] + f": {', '.join(selected)}\n\n"
+
+    if error:
+        await message.reply_text(response + error)
+    elif places:
+        cursor_id = create_places_cursor(response, places)
+        text, reply_markup = render_places_page(cursor_id, 0, lang)
+        await message.reply_text(text, reply_markup=reply_markup)
+    else:
+        await message.reply_text(response + tr(lang, "no_results", categories=", ".join(selected)))
+
+
 # Команда /language
 async def language(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [InlineKeyboardButton("Русский", callback_data="lang_ru")],
-        [InlineKeyboardButton("English", callback_data="lang_en")],
-        [InlineKeyboardButton("中文", callback_data="lang_zh")],
-        [InlineKeyboardButton("فارسی", callback_data="lang_fa")],
-        [InlineKeyboardButton("Türkçe", callback_data="lang_tr")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(
-        "Выберите язык / Choose language / 选择语言 / زبان را انتخاب کنید / Dil seçin:",
-        reply_markup=reply_markup
-    )
+    await update.message.reply_text(LANGUAGE_PROMPT, reply_markup=LANGUAGE_KEYBOARD)
 
 
 # Команда /start
@@ -392,7 +655,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         await update.message.reply_text(
-            LANGUAGES[detected_lang]["detected_language"],
+            tr(detected_lang, "detected_language"),
             reply_markup=reply_markup
         )
     else:
@@ -408,126 +671,98 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_data = context.user_data
     lang = user_data.get("language", "ru")
 
-    if "selected_categories" not in user_data:
-        user_data["selected_categories"] = []
-
     callback_data = query.data
 
     # Обработка подтверждения языка
     if callback_data.startswith("confirm_lang_"):
         lang = callback_data[13:]
         user_data["language"] = lang
-        keyboard = [
-            [InlineKeyboardButton(cat, callback_data=f"category_{cat}")]
-            for cat in CATEGORIES[lang].keys()
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # Индексы категорий у языков разные, поэтому выбор начинается заново
+        user_data["selected_mask"] = 0
+        reply_markup = category_keyboards.markup(lang, 0, done=False)
         # Удаляем старое сообщение
         await query.message.delete()
         # Отправляем новое сообщение с категориями
         await query.message.reply_text(
-            LANGUAGES[lang]["language_set"].format(lang=lang),
+            tr(lang, "language_set", lang=lang),
             reply_markup=reply_markup
         )
         return
 
     # Обработка смены языка
     if callback_data == "change_lang":
-        keyboard = [
-            [InlineKeyboardButton("Русский", callback_data="lang_ru")],
-            [InlineKeyboardButton("English", callback_data="lang_en")],
-            [InlineKeyboardButton("中文", callback_data="lang_zh")],
-            [InlineKeyboardButton("فارسی", callback_data="lang_fa")],
-            [InlineKeyboardButton("Türkçe", callback_data="lang_tr")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
         # Удаляем старое сообщение
         await query.message.delete()
-        await query.message.reply_text(
-            "Выберите язык / Choose language / 选择语言 / زبان را انتخاب کنید / Dil seçin:",
-            reply_markup=reply_markup
-        )
+        await query.message.reply_text(LANGUAGE_PROMPT, reply_markup=LANGUAGE_KEYBOARD)
         return
 
     # Обработка выбора языка
     if callback_data.startswith("lang_"):
         lang = callback_data[5:]
         user_data["language"] = lang
-        keyboard = [
-            [InlineKeyboardButton(cat, callback_data=f"category_{cat}")]
-            for cat in CATEGORIES[lang].keys()
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # Индексы категорий у языков разные, поэтому выбор начинается заново
+        user_data["selected_mask"] = 0
+        reply_markup = category_keyboards.markup(lang, 0, done=False)
         # Удаляем старое сообщение
         await query.message.delete()
         # Отправляем новое сообщение с категориями
         await query.message.reply_text(
-            LANGUAGES[lang]["language_set"].format(lang=lang),
+            tr(lang, "language_set", lang=lang),
             reply_markup=reply_markup
         )
         return
 
     # Обработка категорий
-    if callback_data.startswith("category_"):
-        category = callback_data[9:]
-        if category in user_data["selected_categories"]:
-            user_data["selected_categories"].remove(category)
-            await query.edit_message_text(f"{category} {LANGUAGES[lang]['done'].lower()}.")
-        else:
-            user_data["selected_categories"].append(category)
-            await query.edit_message_text(f"{category} {LANGUAGES[lang]['done'].lower()}.")
-
-        # Обновляем клавиатуру
-        keyboard = [
-            [InlineKeyboardButton(
-                f"{'✅ ' if cat in user_data['selected_categories'] else ''}{cat}",
-                callback_data=f"category_{cat}"
-            )]
-            for cat in CATEGORIES[lang].keys()
-        ]
-        keyboard.append([InlineKeyboardButton(LANGUAGES[lang]["done"], callback_data="done")])
-
-        await query.edit_message_reply_markup(
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+    if callback_data.startswith((CATEGORY_CALLBACK_PREFIX, LEGACY_CATEGORY_CALLBACK_PREFIX)):
+        index = category_keyboards.callback_index(lang, callback_data)
+        if index is None:
+            return
+        mask = user_data.get("selected_mask", 0) ^ (1 << index)
+        user_data["selected_mask"] = mask
+        category = catalog.language(lang).category_names[index]
+        # Текст и клавиатура обновляются одним запросом; разметка для маски уже собрана
+        await query.edit_message_text(f"{category} {tr(lang, 'done').lower()}.",
+                                      reply_markup=category_keyboards.markup(lang, mask))
 
     elif callback_data == "done":
-        selected = user_data.get("selected_categories", [])
+        selected = category_keyboards.selected_names(lang, user_data.get("selected_mask", 0))
         if not selected:
-            await query.message.reply_text(LANGUAGES[lang]["error_no_selection"])
+            await query.message.reply_text(tr(lang, "error_no_selection"))
             return
 
         # Проверяем, выбрана ли категория "Поезда РЖД" по значению в словаре
-        is_rzd_selected = any(CATEGORIES[lang].get(cat) == "rzd_tickets" for cat in selected)
+        is_rzd_selected = any(catalog.categories(lang).get(cat) == "rzd_tickets" for cat in selected)
         if is_rzd_selected:
             keyboard = [
-                [InlineKeyboardButton(LANGUAGES[lang]["rzd_sochi_moscow"], callback_data="route_sochi_moscow")],
-                [InlineKeyboardButton(LANGUAGES[lang]["rzd_sochi_spb"], callback_data="route_sochi_spb")],
-                [InlineKeyboardButton(LANGUAGES[lang]["rzd_sochi_krasnodar"], callback_data="route_sochi_krasnodar")],
-                [InlineKeyboardButton(LANGUAGES[lang]["rzd_other_route"], callback_data="route_custom")],
+                [InlineKeyboardButton(tr(lang, "rzd_sochi_moscow"), callback_data="route_sochi_moscow")],
+                [InlineKeyboardButton(tr(lang, "rzd_sochi_spb"), callback_data="route_sochi_spb")],
+                [InlineKeyboardButton(tr(lang, "rzd_sochi_krasnodar"), callback_data="route_sochi_krasnodar")],
+                [InlineKeyboardButton(tr(lang, "rzd_other_route"), callback_data="route_custom")],
             ]
             await query.message.reply_text(
-                LANGUAGES[lang]["select_transport"],
+                tr(lang, "select_transport"),
                 reply_markup=InlineKeyboardMarkup(keyboard)
             )
         else:
-            places, error = search_places(selected, lang)
-            response = LANGUAGES[lang]["welcome"].split("\n")[0] + f": {', '.join(selected)}\n\n"
-
-            if error:
-                response += error
-            elif places:
-                for place in places[:5]:
-                    response += (
-                        f"📍 {place['name']}\n"
-                        f"{LANGUAGES[lang]['address']}: {place['address']}\n"
-                        f"{LANGUAGES[lang]['map']}: {place['map_link']}\n\n"
-                    )
-            else:
-                response += LANGUAGES[lang]["no_results"].format(categories=", ".join(selected))
-
-            await query.message.reply_text(response)
-            user_data["selected_categories"] = []
+            places, error = await search_places(selected, lang)
+            await reply_with_places(query.message, places, error, selected, lang)
+            user_data["selected_mask"] = 0
+
+    # Листание результатов поиска
+    elif callback_data.startswith("page_"):
+        cursor_id, _, page = callback_data[5:].rpartition("_")
+        try:
+            page = int(page)
+        except ValueError:
+            # Поврежденные данные кнопки отвечаем так же, как истекший курсор
+            logger.warning(f"Некорректные данные кнопки страницы: {callback_data!r}")
+            text, reply_markup = None, None
+        else:
+            text, reply_markup = render_places_page(cursor_id, page, lang)
+        if text is None:
+            await query.edit_message_text(tr(lang, "results_expired"))
+        else:
+            await query.edit_message_text(text, reply_markup=reply_markup)
 
     # Обработка маршрутов
     elif callback_data.startswith("route_"):
@@ -541,34 +776,18 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE):
             from_st, to_st = "Сочи", "Краснодар"
         else:
             await query.message.reply_text(
-                LANGUAGES[lang]["general_error"].format(error=LANGUAGES[lang]["rzd_enter_route"]))
+                tr(lang, "general_error", error=tr(lang, "rzd_enter_route")))
             return
 
-        date = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%Y")
-        tickets, error = get_rzd_tickets(from_st, to_st, date, lang)
+        await reply_with_tickets(query.message, user_data, from_st, to_st, lang)
 
-        if error:
-            await query.message.reply_text(error)
+    # Тот же маршрут на следующие даты
+    elif callback_data == "tickets_next_days":
+        last = user_data.get("last_tickets_query")
+        if last is None:
+            await query.edit_message_text(tr(lang, "results_expired"))
             return
-
-        if not tickets:
-            await query.message.reply_text(f"{LANGUAGES[lang]['no_results'].format(categories=f'{from_st} - {to_st}')}")
-            return
-
-        response = f"🚂 {LANGUAGES[lang]['rzd_tickets']} {from_st} - {to_st} ({date}):\n\n"
-        for ticket in tickets:
-            response += (
-                f"{LANGUAGES[lang]['rzd_train']} {ticket['train']}\n"
-                f"{LANGUAGES[lang]['rzd_departure']}: {ticket['departure']}\n"
-                f"{LANGUAGES[lang]['rzd_arrival']}: {ticket['arrival']}\n"
-                f"{LANGUAGES[lang]['rzd_duration']}: {ticket['duration']}\n"
-            )
-            for cls, info in ticket['classes'].items():
-                response += f"- {cls}: {info['price']} {LANGUAGES[lang]['rzd_price_rub']} ({LANGUAGES[lang]['rzd_seats_available']}: {info['seats']})\n"
-            response += "\n"
-
-        response += f"{LANGUAGES[lang]['rzd_buy_tickets']} https://pass.rzd.ru"
-        await query.message.reply_text(response)
+        await reply_with_next_days(query.message, *last, lang)
 
 
 # Обработка текстовых сообщений
@@ -579,68 +798,49 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Обработка запроса транспорта
     if " - " in text and any(
-            word in text.lower() for word in ["билет", "поезд", "ржд", "ticket", "train"]):
-        parts = [p.strip() for p in text.split(" - ") if p.strip()]
+            word in text.lower() for word in TICKET_KEYWORDS):
+        parts = [strip_ticket_keywords(p) for p in text.split(" - ") if strip_ticket_keywords(p)]
         if len(parts) == 2:
-            from_st, to_st = parts
-            date = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%Y")
-            tickets, error = get_rzd_tickets(from_st, to_st, date, lang)
-
-            if error:
-                await update.message.reply_text(error)
+            from_st, from_error = resolve_station(parts[0], lang)
+            to_st, to_error = resolve_station(parts[1], lang)
+            if from_error or to_error:
+                await update.message.reply_text("\n".join(filter(None, (from_error, to_error))))
                 return
-
-            if not tickets:
-                await update.message.reply_text(LANGUAGES[lang]["no_results"].format(categories=f"{from_st} - {to_st}"))
-                return
-
-            response = f"🚂 {LANGUAGES[lang]['rzd_tickets']} {from_st} - {to_st} ({date}):\n\n"
-            for ticket in tickets:
-                response += (
-                    f"{LANGUAGES[lang]['rzd_train']} {ticket['train']}\n"
-                    f"{LANGUAGES[lang]['rzd_departure']}: {ticket['departure']}\n"
-                    f"{LANGUAGES[lang]['rzd_arrival']}: {ticket['arrival']}\n"
-                    f"{LANGUAGES[lang]['rzd_duration']}: {ticket['duration']}\n"
-                )
-                for cls, info in ticket['classes'].items():
-                    response += f"- {cls}: {info['price']} {LANGUAGES[lang]['rzd_price_rub']} ({LANGUAGES[lang]['rzd_seats_available']}: {info['seats']})\n"
-                response += "\n"
-
-            response += f"{LANGUAGES[lang]['rzd_buy_tickets']} https://pass.rzd.ru"
-            await update.message.reply_text(response)
+            await reply_with_tickets(update.message, user_data, from_st.name, to_st.name, lang)
             return
 
     # Обработка обычных категорий
-    selected = [cat.strip() for cat in text.split(',') if cat.strip() in CATEGORIES[lang]]
+    selected = [cat.strip() for cat in text.split(',') if cat.strip() in catalog.categories(lang)]
     if not selected:
-        categories_list = "\n".join(f"- {cat}" for cat in CATEGORIES[lang].keys())
+        categories_list = "\n".join(f"- {cat}" for cat in catalog.language(lang).category_names)
         await update.message.reply_text(
-            f"{LANGUAGES[lang]['categories']}\n{categories_list}\n"
+            f"{tr(lang, 'categories')}\n{categories_list}\n"
             f"Или используйте /start для выбора."
         )
         return
 
-    places, error = search_places(selected, lang)
-    response = f"{LANGUAGES[lang]['welcome'].split('\n')[0]}: {', '.join(selected)}\n\n"
+    places, error = await search_places(selected, lang)
+    await reply_with_places(update.message, places, error, selected, lang)
 
-    if error:
-        response += error
-    elif places:
-        for place in places[:5]:
-            response += (
-                f"📍 {place['name']}\n"
-                f"{LANGUAGES[lang]['address']}: {place['address']}\n"
-                f"{LANGUAGES[lang]['map']}: {place['map_link']}\n\n"
-            )
-    else:
-        response += LANGUAGES[lang]["no_results"].format(categories=", ".join(selected))
 
-    await update.message.reply_text(response)
+# Закрытие пулов соединений Geoapify и провайдера билетов при остановке бота
+async def post_shutdown(application):
+    await geoapify_client.aclose()
+    await ticket_service.aclose()
 
 
 # Главная функция
 def main():
-    app = ApplicationBuilder().token(TOKEN).build()
+    from telegram.ext import ApplicationBuilder, CallbackQueryHandler, CommandHandler, MessageHandler, filters
+
+    # concurrent_updates: пока один пользователь ждет Geoapify, остальные обновления обрабатываются
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .concurrent_updates(True)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("language", language))
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Ленивый клиент OpenAI с фоновой проверкой ключа.
+
+Раньше приложения при импорте создавали клиента и синхронно вызывали
+models.list(): каждый запуск воркера (и каждый fork gunicorn) ждал
+сетевого ответа, а без сети зависал до таймаута. OpenAIService создает
+клиента при первом обращении, а ключ проверяет в фоновом потоке, который
+запускается при первой проверке enabled и никого не задерживает.
+Результат проверки кэшируется; если сервис был недоступен, проверка
+повторяется через retry_interval.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Константы ---
+PROBE_TIMEOUT = 10            # таймаут фоновой проверки ключа, секунды
+RETRY_INTERVAL = 60           # повторная проверка, если OpenAI был недоступен
+RECHECK_INTERVAL = 30 * 60    # периодическая перепроверка рабочего ключа
+
+STATUS_DISABLED = "disabled"        # ключ не задан или не похож на ключ OpenAI
+STATUS_UNKNOWN = "unknown"          # проверка еще не завершилась
+STATUS_OK = "ok"
+STATUS_AUTH_ERROR = "auth_error"    # ключ отклонен; повторно не проверяется
+STATUS_UNAVAILABLE = "unavailable"  # сеть или сервис недоступны; проверка повторится
+
+
+class OpenAIService:
+    """
+    Клиент OpenAI, создаваемый по требованию, и кэшированный статус ключа.
+
+    enabled истинно, пока ключ не отклонен и сервис не признан недоступным;
+    до окончания первой проверки запросы разрешены (ошибки обрабатываются
+    как обычно), поэтому первый запрос не ждет проверки.
+    """
+
+    def __init__(self, api_key, base_url=None, probe_timeout=PROBE_TIMEOUT, retry_interval=RETRY_INTERVAL,
+                 recheck_interval=RECHECK_INTERVAL, clock=time.monotonic, **client_kwargs):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.probe_timeout = probe_timeout
+        self.retry_interval = retry_interval
+        self.recheck_interval = recheck_interval
+        self._clock = clock
+        self._client_kwargs = client_kwargs
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._probe_pid = None  # поток проверки не переживает fork, поэтому запоминаем процесс
+        self.status = STATUS_UNKNOWN if api_key and api_key.startswith("sk-") else STATUS_DISABLED
+        self.checked_at = None
+        self.last_error = None
+        self.probes = 0
+        if self.status == STATUS_DISABLED:
+            logger.warning("!!! ВНИМАНИЕ: OpenAI API Ключ не установлен или недействителен !!!")
+            logger.warning("Сервис персональных рекомендаций будет недоступен.")
+
+    @property
+    def configured(self):
+        return self.status != STATUS_DISABLED
+
+    @property
+    def enabled(self):
+        """Можно ли обращаться к OpenAI (без сетевого запроса; при первом вызове запускает проверку)."""
+        if self.status == STATUS_DISABLED:
+            return False
+        self.start_probe()
+        return self.status in (STATUS_UNKNOWN, STATUS_OK)
+
+    @property
+    def client(self):
+        """Клиент openai.OpenAI, создается при первом обращении (сам по себе в сеть не ходит)."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import openai
+                    self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url,
+                                                 **self._client_kwargs)
+        return self._client
+
+    @property
+    def async_client(self):
+        """Клиент openai.AsyncOpenAI для ASGI-приложения (asgi_app.py), тоже создается при первом обращении."""
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    import openai
+                    self._async_client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                                            **self._client_kwargs)
+        return self._async_client
+
+    # --- Проверка ключа ---
+
+    def probe(self):
+        """Одна синхронная проверка ключа через models.list(); возвращает новый статус."""
+        import openai
+        try:
+            self.client.with_options(timeout=self.probe_timeout, max_retries=0).models.list()
+            status, error = STATUS_OK, None
+        except openai.AuthenticationError as e:
+            status, error = STATUS_AUTH_ERROR, e
+        except Exception as e:
+            status, error = STATUS_UNAVAILABLE, e
+        self._set_status(status, error)
+        return status
+
+    def _set_status(self, status, error=None):
+        with self._lock:
+            changed = status != self.status
+            self.status = status
+            self.last_error = str(error) if error else None
+            self.checked_at = self._clock()
+            self.probes += 1
+        if not changed:
+            return
+        if status == STATUS_OK:
+            logger.info("OpenAI API ключ проверен, сервис рекомендаций доступен.")
+        elif status == STATUS_AUTH_ERROR:
+            logger.warning("Ошибка аутентификации OpenAI: Неверный API ключ.")
+            logger.warning("Сервис персональных рекомендаций будет недоступен.")
+        else:
+            logger.error(f"OpenAI недоступен ({error}), повторная проверка через {self.retry_interval} с.")
+
+    def start_probe(self):
+        """Запускает фоновую проверку в текущем процессе (повторный вызов ничего не делает)."""
+        if self._probe_pid == os.getpid() or self.status in (STATUS_DISABLED, STATUS_AUTH_ERROR):
+            return
+        with self._lock:
+            if self._probe_pid == os.getpid():
+                return
+            self._probe_pid = os.getpid()
+
+        def loop():
+            while True:
+                status = self.probe()
+                if status == STATUS_AUTH_ERROR:
+                    return  # отклоненный ключ сам не исправится
+                self._wakeup.wait(self.recheck_interval if status == STATUS_OK else self.retry_interval)
+                self._wakeup.clear()
+
+        threading.Thread(target=loop, name="openai-probe", daemon=True).start()
+
+    def record_failure(self, error):
+        """
+        Учитывает ошибку запроса к OpenAI: отклоненный ключ сразу отключает сервис,
+        ошибка соединения запускает внеочередную проверку.
+        """
+        import openai
+        if isinstance(error, openai.AuthenticationError):
+            self._set_status(STATUS_AUTH_ERROR, error)
+        elif isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            self._wakeup.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'status': self.status,
+                'checked_seconds_ago': round(self._clock() - self.checked_at, 1) if self.checked_at is not None else None,
+                'last_error': self.last_error,
+                'probes': self.probes,
+                'client_created': self._client is not None,
+            }
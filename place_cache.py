@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import OrderedDict
+
+# --- Константы ---
+DEFAULT_TTL_SECONDS = 12 * 60 * 60  # POI Сочи меняются редко, полдня - безопасный срок
+DEFAULT_MAX_ENTRIES = 256
+
+
+def places_cache_key(codes, lat, lon, radius, limit, lang=None):
+    """
+    Нормализованный ключ кэша поиска мест.
+
+    Ключ строится по отсортированному набору кодов Geoapify, а не по
+    локализованным названиям категорий, поэтому "Пляжи" и "Beaches"
+    попадают в одну запись.
+    """
+    normalized_codes = tuple(sorted({c.strip() for c in codes if c and c.strip()}))
+    return (normalized_codes, round(float(lat), 5), round(float(lon), 5), int(radius), int(limit), lang or "")
+
+
+class TTLLRUCache:
+    """
+    Потокобезопасный in-process кэш с ограничением числа записей,
+    вытеснением по LRU и временем жизни каждой записи.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        if max_entries <= 0:
+            raise ValueError("max_entries должен быть положительным")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Возвращает значение или default, если записи нет или она устарела."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Сохраняет значение; при переполнении вытесняет самую старую по использованию запись."""
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+            self._data[key] = (expires_at, value)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Счетчики попаданий/промахов для логов и страницы статистики."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from place_cache import places_cache_key
+from singleflight import AsyncSingleFlight, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# --- Режимы поиска ---
+MODE_COMBINED = "combined"  # один запрос со всеми кодами через запятую
+MODE_FANOUT = "fanout"      # отдельный (кэшируемый) запрос на каждую категорию
+SEARCH_MODES = (MODE_COMBINED, MODE_FANOUT)
+
+EARTH_RADIUS_METERS = 6371000
+MAX_FANOUT_WORKERS = 10
+
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    """Расстояние между двумя точками по поверхности Земли, в метрах."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+def normalize_codes(codes):
+    """Отсортированный список уникальных кодов Geoapify без пустых значений."""
+    return sorted({c.strip() for c in codes if c and c.strip()})
+
+
+def normalize_groups(groups):
+    """
+    Группы кодов категорий в виде отсортированных кортежей, без пустых групп и повторов.
+    Группа - последовательность кодов или строка кодов через запятую, как в CATEGORIES.
+    """
+    normalized = set()
+    for group in groups:
+        if isinstance(group, str):
+            group = group.split(",")
+        codes = normalize_codes(group)
+        if codes:
+            normalized.add(tuple(codes))
+    return sorted(normalized)
+
+
+def feature_identity(feature):
+    """Ключ для удаления дублей: place_id, а при его отсутствии - имя и координаты."""
+    properties = feature.get('properties', {})
+    place_id = properties.get('place_id')
+    if place_id:
+        return place_id
+    lat, lon = properties.get('lat'), properties.get('lon')
+    return (properties.get('name'), round(lat, 6) if lat is not None else None,
+            round(lon, 6) if lon is not None else None)
+
+
+class PlaceSearchEngine:
+    """
+    Поиск мест поверх кэша Geoapify.
+
+    Поиск получает группы кодов - по одной на выбранную категорию (например,
+    ("catering.cafe", "catering.fast_food", "catering.restaurant") для "Заведений").
+    В режиме fanout каждая группа запрашивается и кэшируется отдельно, а объединение
+    дедуплицируется и ранжируется по удаленности от центра локально. Так 2^8
+    комбинаций категорий с местами сводятся к 8 кэшируемым запросам, а холодный поиск
+    по одной категории стоит один запрос к Geoapify. Поскольку каждая группа приходит
+    с ближайшими `limit` объектами, итоговые `limit` ближайших совпадают с результатом
+    объединенного запроса.
+
+    Функция загрузки fetch(codes) получает список кодов одной "единицы" запроса и
+    возвращает список 'features' Geoapify; исключения пробрасываются вызывающему коду.
+    Одновременные загрузки одной и той же единицы схлопываются в один запрос.
+
+    Если задана локальная база store (poi_store.POIStore), запросы обслуживаются
+    из нее целиком, без кэша и без обращения к Geoapify.
+    """
+
+    def __init__(self, cache, lat, lon, radius, limit, mode=MODE_FANOUT, store=None):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Неизвестный режим поиска: {mode}")
+        self.cache = cache
+        self.lat = lat
+        self.lon = lon
+        self.radius = radius
+        self.limit = limit
+        self.mode = mode
+        self.store = store
+        self.flight = SingleFlight()
+        self.async_flight = AsyncSingleFlight()
+
+    def units(self, groups):
+        """Разбивает группы кодов на единицы запроса к Geoapify: группа на единицу или одна общая."""
+        groups = normalize_groups(groups)
+        if self.mode == MODE_FANOUT or len(groups) <= 1:
+            return groups
+        return [tuple(normalize_codes(code for group in groups for code in group))]
+
+    def cache_key(self, unit, lang=None):
+        return places_cache_key(unit, self.lat, self.lon, self.radius, self.limit, lang)
+
+    def merge(self, feature_lists):
+        """Объединяет ответы, удаляет дубли и сортирует по расстоянию до центра."""
+        seen = set()
+        ranked = []
+        for features in feature_lists:
+            for feature in features:
+                identity = feature_identity(feature)
+                if identity in seen:
+                    continue
+                seen.add(identity)
+                properties = feature.get('properties', {})
+                lat, lon = properties.get('lat'), properties.get('lon')
+                if lat is None or lon is None:
+                    distance = math.inf
+                else:
+                    distance = haversine_meters(self.lat, self.lon, lat, lon)
+                ranked.append((distance, len(ranked), feature))
+        ranked.sort(key=lambda item: (item[0], item[1]))
+        return [feature for _, _, feature in ranked[:self.limit]]
+
+    def stats(self):
+        """Счетчики кэша и схлопнутых одновременных запросов."""
+        return {
+            'backend': 'local' if self.store is not None else 'geoapify',
+            'cache': self.cache.stats(),
+            'coalesced': self.flight.stats(),
+            'coalesced_async': self.async_flight.stats(),
+        }
+
+    def _split_cached(self, units, lang):
+        cached, missing = {}, []
+        for unit in units:
+            features = self.cache.get(self.cache_key(unit, lang))
+            if features is None:
+                missing.append(unit)
+            else:
+                cached[unit] = features
+        return cached, missing
+
+    def _store(self, cached, fetched, lang):
+        """Кэширует успешно загруженные единицы; первую ошибку пробрасывает после этого."""
+        error = None
+        for unit, result in fetched:
+            if isinstance(result, Exception):
+                error = error or result
+                continue
+            cached[unit] = result
+            self.cache.set(self.cache_key(unit, lang), result)
+        if error is not None:
+            raise error
+
+    def _assemble(self, units, cached, missing):
+        if missing:
+            logger.info(f"Поиск мест: {len(units) - len(missing)} из {len(units)} единиц из кэша, загружено {len(missing)}")
+        if len(units) == 1:
+            return cached[units[0]]
+        return self.merge(cached[unit] for unit in units)
+
+    def _fetch_unit(self, fetch, unit, lang):
+        return self.flight.do(self.cache_key(unit, lang), lambda: fetch(list(unit)))
+
+    async def _fetch_unit_async(self, fetch, unit, lang):
+        return await self.async_flight.do(self.cache_key(unit, lang), lambda: fetch(list(unit)))
+
+    def search_local(self, groups):
+        """Поиск по локальной базе POI."""
+        codes = {code for group in normalize_groups(groups) for code in group}
+        return self.store.query(codes, self.lat, self.lon, self.radius, self.limit)
+
+    def search(self, groups, fetch, lang=None):
+        """Синхронный поиск по группам кодов; недостающие единицы загружаются параллельно в потоках."""
+        if self.store is not None:
+            return self.search_local(groups)
+        units = self.units(groups)
+        cached, missing = self._split_cached(units, lang)
+        fetched = []
+        if len(missing) == 1:
+            fetched.append((missing[0], self._fetch_unit(fetch, missing[0], lang)))
+        elif missing:
+            with ThreadPoolExecutor(max_workers=min(MAX_FANOUT_WORKERS, len(missing))) as executor:
+                futures = [(unit, executor.submit(self._fetch_unit, fetch, unit, lang)) for unit in missing]
+            for unit, future in futures:
+                error = future.exception()
+                fetched.append((unit, error if error is not None else future.result()))
+        self._store(cached, fetched, lang)
+        return self._assemble(units, cached, missing)
+
+    async def search_async(self, groups, fetch, lang=None):
+        """Асинхронный поиск по группам кодов; fetch - корутина, недостающие единицы загружаются через gather."""
+        if self.store is not None:
+            return self.search_local(groups)
+        units = self.units(groups)
+        cached, missing = self._split_cached(units, lang)
+        results = await asyncio.gather(*(self._fetch_unit_async(fetch, unit, lang) for unit in missing),
+                                       return_exceptions=True)
+        self._store(cached, zip(missing, results), lang)
+        return self._assemble(units, cached, missing)
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная база POI Сочи с пространственным индексом.
+
+База загружается из выгрузки OpenStreetMap (Overpass JSON или OSM XML) либо из
+собранного дампа Geoapify (GeoJSON FeatureCollection) и отвечает на запросы
+"категория X в радиусе R метров от точки P, ближайшие первыми" без обращения к сети.
+Объекты хранятся в формате 'features' Geoapify, поэтому PlaceSearchEngine может
+использовать базу вместо Geoapify, а сам Geoapify остается источником обновления.
+
+Использование из командной строки:
+    python poi_store.py import-osm sochi.osm.json --out sochi_pois.json
+    python poi_store.py harvest --out sochi_pois.json   (нужен GEOAPIFY_API_KEY)
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import xml.etree.ElementTree as ET
+
+from place_search import haversine_meters, normalize_codes
+
+logger = logging.getLogger(__name__)
+
+# --- Константы ---
+CELL_SIZE_DEGREES = 0.01  # ~1.1 км по широте
+METERS_PER_DEGREE_LAT = 111320.0
+
+# Соответствие тегов OSM кодам категорий Geoapify (только используемые приложением)
+OSM_TAG_CATEGORIES = {
+    ('natural', 'beach'): ['beach', 'natural'],
+    ('leisure', 'beach_resort'): ['beach'],
+    ('leisure', 'park'): ['leisure.park'],
+    ('leisure', 'garden'): ['leisure.park'],
+    ('amenity', 'restaurant'): ['catering.restaurant'],
+    ('amenity', 'cafe'): ['catering.cafe'],
+    ('amenity', 'fast_food'): ['catering.fast_food'],
+    ('tourism', 'hotel'): ['accommodation.hotel'],
+    ('tourism', 'guest_house'): ['accommodation.guest_house'],
+    ('amenity', 'theatre'): ['entertainment.culture.theatre'],
+    ('tourism', 'gallery'): ['entertainment.culture.gallery'],
+    ('amenity', 'arts_centre'): ['entertainment.culture.gallery'],
+    ('tourism', 'aquarium'): ['entertainment.aquarium'],
+    ('shop', 'gift'): ['commercial.gift_and_souvenir'],
+    ('shop', 'souvenir'): ['commercial.gift_and_souvenir'],
+    ('tourism', 'attraction'): ['tourism.attraction'],
+    ('tourism', 'viewpoint'): ['tourism.attraction.viewpoint'],
+    ('tourism', 'museum'): ['tourism.sights', 'entertainment.museum'],
+    ('historic', 'monument'): ['tourism.sights.memorial'],
+    ('historic', 'memorial'): ['tourism.sights.memorial'],
+}
+# Любой объект с тегом natural=* относится к категории natural
+OSM_KEY_CATEGORIES = {
+    'natural': ['natural'],
+}
+
+
+def category_prefixes(category):
+    """'catering.restaurant.halal' -> ['catering', 'catering.restaurant', 'catering.restaurant.halal']."""
+    parts = category.split('.')
+    return ['.'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def osm_tags_to_categories(tags):
+    """Переводит теги OSM в список категорий Geoapify."""
+    categories = []
+    for key, value in tags.items():
+        categories.extend(OSM_TAG_CATEGORIES.get((key, value), ()))
+        categories.extend(OSM_KEY_CATEGORIES.get(key, ()))
+    if 'catering.restaurant' in categories and tags.get('diet:halal') in ('yes', 'only'):
+        categories.append('catering.restaurant.halal')
+    return sorted(set(categories))
+
+
+def osm_element_to_feature(osm_type, osm_id, lat, lon, tags):
+    """Строит feature в формате Geoapify из элемента OSM; None, если объект не интересен."""
+    name = tags.get('name')
+    categories = osm_tags_to_categories(tags)
+    if not name or not categories or lat is None or lon is None:
+        return None
+    street = tags.get('addr:street')
+    housenumber = tags.get('addr:housenumber')
+    properties = {
+        'name': name,
+        'lat': lat,
+        'lon': lon,
+        'categories': categories,
+        'place_id': f"osm:{osm_type}/{osm_id}",
+    }
+    if street:
+        properties['street'] = street
+        properties['formatted'] = ", ".join(filter(None, [tags.get('addr:city'), street, housenumber]))
+    if housenumber:
+        properties['housenumber'] = housenumber
+    return {
+        'type': 'Feature',
+        'properties': properties,
+        'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+    }
+
+
+class POIStore:
+    """
+    In-memory база POI с сеточным индексом.
+
+    Для каждого префикса категории хранится отдельная сетка ячеек, поэтому запрос
+    просматривает только ячейки нужных категорий внутри ограничивающего квадрата.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE_DEGREES):
+        self.cell_size = cell_size
+        self._features = []
+        self._coords = []  # (lat, lon) по индексу объекта
+        self._ids = {}     # place_id -> индекс объекта
+        self._grid = {}    # префикс категории -> {ячейка: [индексы]}
+
+    def __len__(self):
+        return len(self._features)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def add_feature(self, feature):
+        """Добавляет объект; повторный place_id заменяет данные объекта. Возвращает True при успехе."""
+        properties = feature.get('properties', {})
+        lat, lon = properties.get('lat'), properties.get('lon')
+        if lat is None or lon is None:
+            coordinates = (feature.get('geometry') or {}).get('coordinates')
+            if not coordinates:
+                return False
+            lon, lat = coordinates[0], coordinates[1]
+            properties = dict(properties, lat=lat, lon=lon)
+            feature = dict(feature, properties=properties)
+        if not properties.get('name'):
+            return False
+
+        place_id = properties.get('place_id')
+        if place_id is not None and place_id in self._ids:
+            index = self._ids[place_id]
+            if self._coords[index] == (lat, lon):
+                self._features[index] = feature
+                return True
+            # Объект переехал - проще перестроить индекс целиком
+            self._features[index] = feature
+            self._coords[index] = (lat, lon)
+            self._rebuild_index()
+            return True
+
+        index = len(self._features)
+        self._features.append(feature)
+        self._coords.append((lat, lon))
+        if place_id is not None:
+            self._ids[place_id] = index
+        self._index(index)
+        return True
+
+    def _index(self, index):
+        lat, lon = self._coords[index]
+        cell = self._cell(lat, lon)
+        prefixes = set()
+        for category in self._features[index]['properties'].get('categories', []):
+            prefixes.update(category_prefixes(category))
+        for prefix in prefixes:
+            self._grid.setdefault(prefix, {}).setdefault(cell, []).append(index)
+
+    def _rebuild_index(self):
+        self._grid = {}
+        for index in range(len(self._features)):
+            self._index(index)
+
+    def add_features(self, features):
+        added = sum(1 for feature in features if self.add_feature(feature))
+        logger.info(f"POI store: загружено {added} объектов, всего {len(self)}")
+        return added
+
+    def categories(self):
+        return sorted(self._grid)
+
+    def query(self, codes, lat, lon, radius, limit=None):
+        """
+        Объекты любой из категорий codes в радиусе radius метров от (lat, lon),
+        отсортированные по расстоянию (ближайшие первыми).
+
+        Ячейки обходятся кольцами от центра; при заданном limit обход
+        останавливается, как только следующее кольцо заведомо дальше
+        limit-го найденного объекта.
+        """
+        grids = [self._grid[code] for code in normalize_codes(codes) if code in self._grid]
+        if not grids:
+            return []
+
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        d_lat = radius / METERS_PER_DEGREE_LAT
+        d_lon = radius / (METERS_PER_DEGREE_LAT * cos_lat)
+        center = self._cell(lat, lon)
+        min_cell = self._cell(lat - d_lat, lon - d_lon)
+        max_cell = self._cell(lat + d_lat, lon + d_lon)
+        max_ring = max(center[0] - min_cell[0], max_cell[0] - center[0],
+                       center[1] - min_cell[1], max_cell[1] - center[1])
+        # Наименьшая сторона ячейки в метрах - нижняя оценка расстояния до кольца
+        cell_meters = self.cell_size * METERS_PER_DEGREE_LAT * min(1.0, cos_lat)
+
+        # Внутри одной сетки индекс встречается один раз; дубли возможны только между сетками
+        seen = set() if len(grids) > 1 else None
+        coords = self._coords
+        best = []  # max-heap (-distance, index) из не более чем limit ближайших
+        found = []
+        for ring in range(max_ring + 1):
+            if limit is not None and len(best) >= limit and -best[0][0] <= (ring - 1) * cell_meters:
+                break
+            for cell in self._ring_cells(center, ring):
+                for grid in grids:
+                    indexes = grid.get(cell)
+                    if not indexes:
+                        continue
+                    for index in indexes:
+                        if seen is not None:
+                            if index in seen:
+                                continue
+                            seen.add(index)
+                        poi_lat, poi_lon = coords[index]
+                        distance = haversine_meters(lat, lon, poi_lat, poi_lon)
+                        if distance > radius:
+                            continue
+                        if limit is None:
+                            found.append((distance, index))
+                        elif len(best) < limit:
+                            heapq.heappush(best, (-distance, index))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, index))
+
+        if limit is not None:
+            found = [(-neg_distance, index) for neg_distance, index in best]
+        found.sort()
+        return [self._features[index] for _, index in found]
+
+    @staticmethod
+    def _ring_cells(center, ring):
+        """Ячейки на расстоянии ring (по Чебышеву) от центральной."""
+        row, col = center
+        if ring == 0:
+            yield center
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield (row - ring, c)
+            yield (row + ring, c)
+        for r in range(row - ring + 1, row + ring):
+            yield (r, col - ring)
+            yield (r, col + ring)
+
+    # --- Загрузка и сохранение ---
+
+    def load_geoapify_dump(self, path):
+        """Загружает GeoJSON FeatureCollection (ответ или собранный дамп Geoapify)."""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return self.add_features(data.get('features', []))
+
+    def load_overpass_json(self, path):
+        """Загружает ответ Overpass API в формате JSON (для путей нужен 'out center')."""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        features = []
+        for element in data.get('elements', []):
+            lat = element.get('lat', (element.get('center') or {}).get('lat'))
+            lon = element.get('lon', (element.get('center') or {}).get('lon'))
+            feature = osm_element_to_feature(element.get('type'), element.get('id'), lat, lon, element.get('tags', {}))
+            if feature:
+                features.append(feature)
+        return self.add_features(features)
+
+    def load_osm_xml(self, path):
+        """Загружает выгрузку OSM XML (.osm); для путей берется центр их узлов."""
+        node_coords = {}
+        features = []
+        current = None
+        for event, element in ET.iterparse(path, events=('start', 'end')):
+            if event == 'start':
+                if element.tag in ('node', 'way'):
+                    current = {'type': element.tag, 'id': element.get('id'), 'tags': {}, 'refs': []}
+                    if element.tag == 'node':
+                        current['lat'] = float(element.get('lat'))
+                        current['lon'] = float(element.get('lon'))
+                continue
+            if current is None:
+                continue
+            if element.tag == 'tag':
+                current['tags'][element.get('k')] = element.get('v')
+            elif element.tag == 'nd':
+                current['refs'].append(element.get('ref'))
+            elif element.tag in ('node', 'way'):
+                if element.tag == 'node':
+                    node_coords[current['id']] = (current['lat'], current['lon'])
+                    lat, lon = current['lat'], current['lon']
+                else:
+                    points = [node_coords[ref] for ref in current['refs'] if ref in node_coords]
+                    lat = sum(p[0] for p in points) / len(points) if points else None
+                    lon = sum(p[1] for p in points) / len(points) if points else None
+                if current['tags']:
+                    feature = osm_element_to_feature(current['type'], current['id'], lat, lon, current['tags'])
+                    if feature:
+                        features.append(feature)
+                current = None
+                element.clear()
+        return self.add_features(features)
+
+    def load(self, path):
+        """Загружает файл, определяя формат по содержимому/расширению."""
+        if path.endswith(('.osm', '.xml')):
+            return self.load_osm_xml(path)
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if 'elements' in data:
+            return self.load_overpass_json(path)
+        return self.add_features(data.get('features', []))
+
+    def save(self, path):
+        """Сохраняет базу как GeoJSON FeatureCollection."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'type': 'FeatureCollection', 'features': self._features}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def refresh_from_geoapify(self, fetch, codes):
+        """
+        Обновляет базу из Geoapify: fetch(codes) возвращает 'features' для списка кодов.
+        Каждый код запрашивается отдельно, как в режиме fanout.
+        """
+        total = 0
+        for code in normalize_codes(codes):
+            total += self.add_features(fetch([code]))
+        return total
+
+
+def load_store(path):
+    """Создает и загружает POIStore из файла; None, если файла нет."""
+    if not path or not os.path.exists(path):
+        return None
+    store = POIStore()
+    store.load(path)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная база POI Сочи")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import-osm', help="Импорт выгрузки OSM (Overpass JSON или OSM XML)")
+    import_parser.add_argument('source')
+    import_parser.add_argument('--out', required=True)
+    harvest_parser = subparsers.add_parser('harvest', help="Сбор объектов из Geoapify по всем кодам категорий")
+    harvest_parser.add_argument('--out', required=True)
+    harvest_parser.add_argument('--codes', default=(
+        "natural,leisure.park,catering.restaurant,catering.cafe,catering.fast_food,beach,"
+        "accommodation.hotel,accommodation.guest_house,entertainment.culture.theatre,"
+        "entertainment.culture.gallery,entertainment.aquarium,commercial.gift_and_souvenir,"
+        "tourism,catering.restaurant.halal"))
+    harvest_parser.add_argument('--lat', type=float, default=43.5855)
+    harvest_parser.add_argument('--lon', type=float, default=39.7303)
+    harvest_parser.add_argument('--radius', type=int, default=15000)
+    harvest_parser.add_argument('--limit', type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    store = load_store(args.out) or POIStore()
+    if args.command == 'import-osm':
+        store.load(args.source)
+    else:
+        import requests
+        from geoapify_client import GEOAPIFY_PLACES_URL, build_places_params
+
+        api_key = os.environ["GEOAPIFY_API_KEY"]
+
+        def fetch(codes):
+            params = build_places_params(codes, args.lat, args.lon, args.radius, args.limit, api_key)
+            response = requests.get(GEOAPIFY_PLACES_URL, params=params, timeout=60)
+            response.raise_for_status()
+            return response.json().get('features', [])
+
+        store.refresh_from_geoapify(fetch, args.codes.split(','))
+    store.save(args.out)
+    logger.info(f"POI store: сохранено {len(store)} объектов в {args.out}")
+
+
+if __name__ == "__main__":
+    main()
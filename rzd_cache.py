@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# --- Константы ---
+FRESH_SECONDS = 15 * 60        # запись считается свежей
+STALE_SECONDS = 6 * 60 * 60    # после этого устаревшая запись больше не отдается
+REFRESH_INTERVAL = 10 * 60     # период фонового обновления отслеживаемых станций
+MAX_ENTRIES = 500              # даты табло задаются в запросе (/rzd/board?date=...), поэтому кэш ограничен
+
+
+class ScheduleCache:
+    """
+    Кэш распарсенных расписаний по ключу (код станции, дата, тип события).
+
+    Работает по схеме stale-while-revalidate: устаревшая запись отдается сразу,
+    а обновление запускается в фоне. Фоновый поток держит теплыми записи
+    отслеживаемых станций на текущую дату и, незадолго до полуночи, на
+    следующую. Записи прошедших дат удаляются при первом обращении после смены
+    даты (и фоновым потоком, и без него), а сверх max_entries вытесняются
+    загруженные раньше всех.
+
+    Если задан shared (shared_cache.SharedCache), загруженные расписания
+    сохраняются и в общий для всех воркеров кэш: промах в памяти процесса
+    сначала ищется там, а фоновое обновление не загружает страницу заново,
+    если ее недавно обновил другой воркер.
+
+    loader(station_code, event_type, date) возвращает список рейсов или None при ошибке.
+    today() возвращает текущую дату в формате YYYY-MM-DD (как get_today_date_string()).
+    """
+
+    def __init__(self, loader, today, fresh_seconds=FRESH_SECONDS, stale_seconds=STALE_SECONDS,
+                 refresh_interval=REFRESH_INTERVAL, clock=time.monotonic, now=datetime.now,
+                 shared=None, wall_clock=time.time, max_entries=MAX_ENTRIES):
+        self.loader = loader
+        self.today = today
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._now = now
+        self.shared = shared
+        self._wall_clock = wall_clock  # время записей общего кэша: монотонные часы у процессов разные
+        self.max_entries = max_entries
+        self._entries = {}     # key -> (loaded_at, schedule)
+        self._purged_on = None  # дата (today()), на которую уже удалены записи прошедших дат
+        self._refreshing = set()
+        self._watched = set()  # (station_code, event_type)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+
+    def _purge_past_locked(self):
+        """Удаляет записи прошедших дат, если дата сменилась с прошлой проверки (под self._lock)."""
+        today = self.today()
+        if today == self._purged_on:
+            return
+        for key in [key for key in self._entries if key[1] < today]:
+            del self._entries[key]
+        self._purged_on = today
+
+    def _insert_locked(self, key, entry):
+        """Сохраняет запись в памяти процесса, удерживая не больше max_entries записей (под self._lock)."""
+        self._entries[key] = entry
+        self._purge_past_locked()
+        while len(self._entries) > self.max_entries:
+            oldest = min(self._entries, key=lambda k: self._entries[k][0])
+            del self._entries[oldest]
+
+    def put(self, key, schedule):
+        with self._lock:
+            self._insert_locked(key, (self._clock(), schedule))
+        if self.shared is not None:
+            self.shared.set(key, (self._wall_clock(), schedule))
+
+    def _load_shared(self, key, max_age):
+        """Запись из общего кэша, если она моложе max_age секунд; сохраняется и в памяти процесса."""
+        if self.shared is None or max_age <= 0:
+            return None
+        value = self.shared.get(key)
+        if value is None:
+            return None
+        stored_at, schedule = value
+        age = max(self._wall_clock() - stored_at, 0)
+        if age >= max_age:
+            return None
+        entry = (self._clock() - age, schedule)
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current[0] >= entry[0]:
+                return current
+            self._insert_locked(key, entry)
+            self.shared_hits += 1
+        return entry
+
+    def get(self, key):
+        """
+        Возвращает расписание из кэша или None, если записи нет (или она слишком старая).
+        Для устаревшей записи в фоне запускается обновление.
+        """
+        with self._lock:
+            self._purge_past_locked()
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self._load_shared(key, self.stale_seconds)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            age = self._clock() - entry[0]
+            if age > self.stale_seconds:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            if age <= self.fresh_seconds:
+                self.hits += 1
+                return entry[1]
+            self.stale_hits += 1
+        self.refresh_async(key)
+        return entry[1]
+
+    def refresh(self, key):
+        """Синхронно перезагружает запись; при ошибке загрузки старая запись сохраняется."""
+        # Другой воркер мог только что обновить эту страницу
+        entry = self._load_shared(key, self.fresh_seconds - self.refresh_interval)
+        if entry is not None:
+            return entry[1]
+        station_code, date, event_type = key
+        try:
+            schedule = self.loader(station_code, event_type, date)
+        except Exception as e:
+            logger.error(f"RZD cache: ошибка обновления {key}: {e}", exc_info=True)
+            schedule = None
+        if schedule is not None:
+            self.put(key, schedule)
+        return schedule
+
+    def refresh_async(self, key):
+        """Запускает фоновое обновление записи, если оно еще не идет."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                self.refresh(key)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name="rzd-cache-refresh", daemon=True).start()
+
+    # --- Фоновое обновление ---
+
+    def watch(self, station_code, event_types):
+        """Добавляет станцию в список поддерживаемых в теплом состоянии."""
+        with self._lock:
+            self._watched.update((station_code, event_type) for event_type in event_types)
+
+    def _dates_to_keep_warm(self):
+        today = self.today()
+        dates = [today]
+        now = self._now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        if (midnight - now).total_seconds() <= self.refresh_interval:
+            # До смены даты меньше одного периода: прогреваем завтрашние страницы заранее
+            dates.append((now.date() + timedelta(days=1)).strftime("%Y-%m-%d"))
+        return dates
+
+    def refresh_watched(self):
+        """Один проход фонового обновления: прогрев нужных дат и удаление прошедших."""
+        dates = self._dates_to_keep_warm()
+        with self._lock:
+            self._purge_past_locked()
+            watched = sorted(self._watched)
+        for date in dates:
+            for station_code, event_type in watched:
+                key = (station_code, date, event_type)
+                with self._lock:
+                    entry = self._entries.get(key)
+                # Обновляем заранее, чтобы к следующему проходу запись не успела устареть
+                if entry is None or self._clock() - entry[0] >= self.fresh_seconds - self.refresh_interval:
+                    self.refresh(key)
+
+    def start(self):
+        """Запускает фоновый поток обновления (повторный вызов ничего не делает)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.refresh_watched()
+                except Exception as e:
+                    logger.error(f"RZD cache: ошибка фонового обновления: {e}", exc_info=True)
+                self._stop.wait(self.refresh_interval)
+
+        self._thread = threading.Thread(target=loop, name="rzd-cache-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self):
+        shared = self.shared.stats() if self.shared is not None else None
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+                'watched': len(self._watched),
+                'shared': shared,
+            }
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Типизированные записи о поездах и индекс расписания по времени.
+
+parse_schedule_data() отдает словари со временем в виде строки "ЧЧ:ММ";
+здесь время один раз переводится в минуты от полуночи, а записи
+сортируются, чтобы запросы "следующие N после T" и "между T1 и T2"
+выполнялись бинарным поиском, без разбора и перебора всего дня.
+"""
+
+import re
+from bisect import bisect_left, bisect_right
+
+MINUTES_PER_DAY = 24 * 60
+
+_TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})')
+
+
+def parse_minutes(time_text):
+    """'07:45' -> 465; None, если время не распознано."""
+    match = _TIME_PATTERN.search(time_text or "")
+    if match is None:
+        return None
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if hours >= 24 or minutes >= 60:
+        return None
+    return hours * 60 + minutes
+
+
+def minutes_of(moment):
+    """Минуты от полуночи для datetime/time."""
+    return moment.hour * 60 + moment.minute
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class TrainRecord:
+    """Запись о рейсе: время в минутах от полуночи плюс исходные тексты страницы."""
+
+    __slots__ = ('minutes', 'time', 'train', 'route', 'station', 'station_code')
+
+    def __init__(self, minutes, time, train, route, station=None, station_code=None):
+        self.minutes = minutes
+        self.time = time
+        self.train = train
+        self.route = route
+        self.station = station
+        self.station_code = station_code
+
+    @classmethod
+    def from_entry(cls, entry):
+        """Из словаря parse_schedule_data() / get_greater_sochi_board()."""
+        return cls(parse_minutes(entry['time']), entry['time'], entry['train'], entry['route'],
+                   entry.get('station'), entry.get('station_code'))
+
+    def as_dict(self):
+        """Обратно в словарь того же вида, что отдает парсер (для шаблонов и JSON)."""
+        entry = {'time': self.time, 'train': self.train, 'route': self.route}
+        if self.station is not None:
+            entry['station'] = self.station
+            entry['station_code'] = self.station_code
+        return entry
+
+    def __repr__(self):
+        return f"TrainRecord({self.time!r}, {self.train!r}, {self.route!r})"
+
+
+class TrainTimetable:
+    """
+    Отсортированный по времени индекс рейсов одного табло.
+
+    Рейсы с нераспознанным временем в индекс не попадают (их число - в unparsed).
+    """
+
+    __slots__ = ('records', '_minutes', 'unparsed')
+
+    def __init__(self, records):
+        timed = [record for record in records if record.minutes is not None]
+        timed.sort(key=lambda record: record.minutes)  # сортировка устойчивая: порядок страницы сохраняется
+        self.records = timed
+        self._minutes = [record.minutes for record in timed]
+        self.unparsed = len(records) - len(timed)
+
+    @classmethod
+    def from_schedule(cls, schedule):
+        return cls([TrainRecord.from_entry(entry) for entry in schedule])
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def next_after(self, minutes, count):
+        """Ближайшие count рейсов, начиная с минуты minutes (включительно), без перехода через полночь."""
+        start = bisect_left(self._minutes, minutes)
+        return self.records[start:start + count]
+
+    def between(self, start, end):
+        """
+        Рейсы с временем в интервале [start, end] (в минутах).
+        Если start > end, интервал проходит через полночь (например, 23:00-01:00).
+        """
+        if start <= end:
+            return self.records[bisect_left(self._minutes, start):bisect_right(self._minutes, end)]
+        return self.records[bisect_left(self._minutes, start):] + self.records[:bisect_right(self._minutes, end)]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Реестр железнодорожных станций Большого Сочи для парсера расписаний.
+
+Код станции - идентификатор страницы https://rasp.yandex.ru/station/<код>/.
+Проверенный код есть только у станции Сочи (SOCHI_STATION_CODE в RZD.py);
+коды остальных станций задаются переменной окружения RZD_STATION_CODES
+("adler=...,khosta=...") или JSON-файлом RZD_STATIONS_FILE ({"adler": "...", ...}).
+Станции без кода пропускаются агрегатором с предупреждением в логе.
+Сводное табло /rzd/board, пока кодов меньше двух, отвечает ошибкой 503:
+табло из одной станции Сочи повторяло бы /rzd/upcoming.
+"""
+
+import json
+import logging
+import os
+from collections import OrderedDict, namedtuple
+
+logger = logging.getLogger(__name__)
+
+Station = namedtuple('Station', ['key', 'code', 'name_ru', 'name_en'])
+
+_STATIONS = [
+    # key, код rasp.yandex.ru, название (ru), название (en)
+    ('sochi', "9623103", "Сочи", "Sochi"),
+    ('adler', None, "Адлер", "Adler"),
+    ('khosta', None, "Хоста", "Khosta"),
+    ('matsesta', None, "Мацеста", "Matsesta"),
+    ('lazarevskaya', None, "Лазаревская", "Lazarevskaya"),
+    ('airport', None, "Аэропорт Сочи", "Sochi Airport"),
+]
+
+
+def _configured_codes():
+    """Коды станций из RZD_STATIONS_FILE и RZD_STATION_CODES (последняя имеет приоритет)."""
+    codes = {}
+    path = os.environ.get("RZD_STATIONS_FILE")
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                codes.update(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.error(f"RZD stations: не удалось прочитать {path}: {e}")
+    for item in os.environ.get("RZD_STATION_CODES", "").split(','):
+        key, _, code = item.partition('=')
+        if key.strip() and code.strip():
+            codes[key.strip()] = code.strip()
+    return codes
+
+
+def load_stations():
+    """Реестр станций с учетом настроенных кодов: OrderedDict key -> Station."""
+    codes = _configured_codes()
+    return OrderedDict(
+        (key, Station(key, codes.get(key, code), name_ru, name_en))
+        for key, code, name_ru, name_en in _STATIONS
+    )
+
+
+GREATER_SOCHI_STATIONS = load_stations()
+
+
+def stations_with_codes(keys=None):
+    """Станции (все или перечисленные в keys), для которых известен код."""
+    selected = [GREATER_SOCHI_STATIONS[key] for key in (keys or GREATER_SOCHI_STATIONS)]
+    missing = [station.key for station in selected if not station.code]
+    if missing:
+        logger.warning(f"RZD stations: не заданы коды станций {', '.join(missing)}, они пропущены.")
+    return [station for station in selected if station.code]
+
+
+def stations_without_codes(keys=None):
+    """Станции (все или перечисленные в keys), которые пропускаются из-за отсутствия кода."""
+    return [GREATER_SOCHI_STATIONS[key] for key in (keys or GREATER_SOCHI_STATIONS)
+            if not GREATER_SOCHI_STATIONS[key].code]
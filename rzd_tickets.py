@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Поиск поездов между городами для бота.
+
+Провайдер билетов - объект с признаком needs_codes (нужен ли станциям код
+"Экспресс-3") и корутиной search(from_station, to_station, date), которая
+возвращает список поездов в формате бота:
+
+    {"train": "044С", "departure": "25.10.2026 08:30", "arrival": "25.10.2026 20:45",
+     "duration": "12:15", "classes": {"Купе": {"price": 4500, "seats": 8}}}
+
+и пробрасывает исключения (httpx, TicketProviderError) вызывающему коду.
+TicketService добавляет к провайдеру кэш с коротким TTL по ключу
+(откуда, куда, дата), схлопывание одинаковых запросов и пакетный поиск
+на несколько дат одним раундом параллельных запросов.
+"""
+
+import asyncio
+import json
+import logging
+import os
+
+import httpx
+
+from place_cache import TTLLRUCache
+from singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+# --- Константы ---
+RZD_PASS_URL = "https://pass.rzd.ru/timetable/public/ru"
+RZD_PASS_LAYER_ID = 5827
+DEFAULT_TIMEOUT = 20
+MAX_CONNECTIONS = 10
+RID_POLL_ATTEMPTS = 10     # сколько раз спрашивать результат по RID
+RID_POLL_INTERVAL = 1.0    # пауза между опросами, секунды
+TICKETS_CACHE_TTL = 5 * 60  # места и цены меняются быстро
+TICKETS_CACHE_ENTRIES = 512
+
+# Коды станций "Экспресс-3" для pass.rzd.ru. Дополняются/переопределяются
+# JSON-объектом в RZD_EXPRESS_CODES: {"Адлер": "2064150", ...}
+EXPRESS_CODES = {
+    "москва": "2000000",
+    "санкт-петербург": "2004000",
+    "спб": "2004000",
+    "сочи": "2064130",
+    "краснодар": "2064001",
+}
+
+
+class TicketProviderError(Exception):
+    """Провайдер ответил, но поиск не удался (неизвестная станция, ошибка сервиса)."""
+
+
+class StubTicketProvider:
+    """Фиксированный ответ для разработки без доступа к сервису билетов."""
+
+    name = "stub"
+    needs_codes = False  # отвечает для любых названий станций
+
+    async def search(self, from_station, to_station, date):
+        return [
+            {
+                "train": "044С",
+                "departure": f"{date} 08:30",
+                "arrival": f"{date} 20:45",
+                "duration": "12ч 15м",
+                "classes": {
+                    "Плацкарт": {"price": 2500, "seats": 15},
+                    "Купе": {"price": 4500, "seats": 8}
+                }
+            },
+            {
+                "train": "104В",
+                "departure": f"{date} 18:15",
+                "arrival": f"{date} 06:30+1",
+                "duration": "12ч 15м",
+                "classes": {
+                    "Плацкарт": {"price": 2700, "seats": 10},
+                    "Купе": {"price": 4900, "seats": 5},
+                    "СВ": {"price": 7500, "seats": 3}
+                }
+            }
+        ]
+
+    async def aclose(self):
+        pass
+
+
+def load_express_codes():
+    codes = dict(EXPRESS_CODES)
+    extra = os.environ.get("RZD_EXPRESS_CODES")
+    if extra:
+        try:
+            codes.update({name.strip().lower(): str(code) for name, code in json.loads(extra).items()})
+        except (ValueError, AttributeError) as e:
+            logger.error(f"RZD tickets: не удалось разобрать RZD_EXPRESS_CODES: {e}")
+    return codes
+
+
+def convert_pass_trains(payload):
+    """Переводит ответ pass.rzd.ru ('tp' -> 'list' -> 'cars') в формат бота."""
+    tickets = []
+    for direction in payload.get("tp", []):
+        for train in direction.get("list", []):
+            classes = {}
+            for car in train.get("cars", []):
+                car_type = car.get("typeLoc") or car.get("type") or "?"
+                price = int(float(car.get("tariff", 0)))
+                seats = int(car.get("freeSeats", 0))
+                info = classes.setdefault(car_type, {"price": price, "seats": 0})
+                info["price"] = min(info["price"], price)
+                info["seats"] += seats
+            tickets.append({
+                "train": train.get("number", ""),
+                "departure": f"{train.get('date0', '')} {train.get('time0', '')}".strip(),
+                "arrival": f"{train.get('date1', '')} {train.get('time1', '')}".strip(),
+                "duration": train.get("timeInWay", ""),
+                "classes": classes,
+            })
+    return tickets
+
+
+class RzdPassProvider:
+    """
+    Поиск поездов через публичный JSON-интерфейс pass.rzd.ru.
+
+    Запрос выполняется в два шага: первый ответ содержит RID и сессионные
+    cookie, по которым затем опрашивается результат. Cookie передаются
+    явно для каждого поиска, поэтому одновременные поиски через общий
+    пул соединений не мешают друг другу. base_url можно направить на
+    локальную заглушку (benchmarks/fakes.py, FakeRzdPassServer).
+    """
+
+    name = "rzd"
+    needs_codes = True  # ищет по кодам "Экспресс-3" (station_code)
+
+    def __init__(self, base_url=RZD_PASS_URL, timeout=DEFAULT_TIMEOUT, max_connections=MAX_CONNECTIONS,
+                 poll_interval=RID_POLL_INTERVAL, poll_attempts=RID_POLL_ATTEMPTS, codes=None, transport=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.poll_interval = poll_interval
+        self.poll_attempts = poll_attempts
+        self.codes = codes if codes is not None else load_express_codes()
+        self._transport = transport
+        self._client = None
+
+    def _get_client(self):
+        # Клиент создается лениво, внутри работающего цикла событий
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits, transport=self._transport)
+        return self._client
+
+    def station_code(self, name):
+        code = self.codes.get(name.strip().lower())
+        if code is None:
+            raise TicketProviderError(f"неизвестная станция: {name}")
+        return code
+
+    async def search(self, from_station, to_station, date):
+        params = {
+            "layer_id": RZD_PASS_LAYER_ID, "dir": 0, "tfl": 3, "checkSeats": 1,
+            "code0": self.station_code(from_station), "code1": self.station_code(to_station), "dt0": date,
+        }
+        client = self._get_client()
+        logger.info(f"RZD tickets: поиск {from_station} - {to_station} на {date}")
+        response = await client.get(self.base_url, params=params)
+        response.raise_for_status()
+        payload = response.json()
+        cookie = "; ".join(f"{name}={value}" for name, value in response.cookies.items())
+
+        for _ in range(self.poll_attempts):
+            result = payload.get("result")
+            if result == "OK":
+                return convert_pass_trains(payload)
+            if result != "RID":
+                raise TicketProviderError(payload.get("message") or f"ответ {result}")
+            await asyncio.sleep(self.poll_interval)
+            response = await client.get(self.base_url, params={"layer_id": RZD_PASS_LAYER_ID, "rid": payload["RID"]},
+                                        headers={"Cookie": cookie} if cookie else None)
+            response.raise_for_status()
+            payload = response.json()
+        raise TicketProviderError("результат поиска не готов")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+TICKET_PROVIDERS = {
+    StubTicketProvider.name: StubTicketProvider,
+    RzdPassProvider.name: RzdPassProvider,
+}
+
+
+def create_provider(name=None, **kwargs):
+    """Провайдер по имени (RZD_TICKET_PROVIDER: stub | rzd); параметры передаются конструктору."""
+    name = name or os.environ.get("RZD_TICKET_PROVIDER", StubTicketProvider.name)
+    if name not in TICKET_PROVIDERS:
+        raise ValueError(f"Неизвестный провайдер билетов: {name}")
+    if name == RzdPassProvider.name and "base_url" not in kwargs and os.environ.get("RZD_PASS_URL"):
+        kwargs["base_url"] = os.environ["RZD_PASS_URL"]
+    return TICKET_PROVIDERS[name](**kwargs)
+
+
+def tickets_cache_key(from_station, to_station, date):
+    return (from_station.strip().lower(), to_station.strip().lower(), date)
+
+
+class TicketService:
+    """Кэш и пакетный поиск поверх провайдера билетов."""
+
+    def __init__(self, provider, cache=None):
+        self.provider = provider
+        self.cache = cache if cache is not None else TTLLRUCache(TICKETS_CACHE_ENTRIES, TICKETS_CACHE_TTL)
+        self.flight = AsyncSingleFlight()
+
+    async def search(self, from_station, to_station, date):
+        """Поезда на одну дату; исключения провайдера пробрасываются."""
+        key = tickets_cache_key(from_station, to_station, date)
+        tickets = self.cache.get(key)
+        if tickets is None:
+            tickets = await self.flight.do(key, lambda: self.provider.search(from_station, to_station, date))
+            self.cache.set(key, tickets)
+        return tickets
+
+    async def search_dates(self, from_station, to_station, dates):
+        """
+        Поезда на несколько дат: все даты, которых нет в кэше, запрашиваются одновременно.
+
+        Returns:
+            dict: {date: list | Exception} в порядке dates.
+        """
+        results = await asyncio.gather(*(self.search(from_station, to_station, date) for date in dates),
+                                       return_exceptions=True)
+        return dict(zip(dates, results))
+
+    def stats(self):
+        return {
+            'provider': self.provider.name,
+            'cache': self.cache.stats(),
+            'coalesced': self.flight.stats(),
+        }
+
+    async def aclose(self):
+        await self.provider.aclose()
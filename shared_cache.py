@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш, общий для всех процессов приложения на одной машине.
+
+Под gunicorn каждый воркер - отдельный процесс, и in-process кэши
+(TTLLRUCache) у каждого свои: доля попаданий делится на число воркеров,
+а память умножается на него. SharedCache хранит записи в одном файле
+SQLite в режиме WAL с mmap: читатели не блокируют друг друга и писателя,
+а страницы файла разделяются процессами через страничный кэш ОС.
+
+Интерфейс совпадает с TTLLRUCache (get/set/invalidate/clear/stats), поэтому
+кэш можно подставить в PlaceSearchEngine без изменений. В одном файле живут
+несколько пространств имен (места Geoapify, расписания РЖД, рекомендации
+LLM), у каждого свои срок жизни и ограничение размера.
+
+Срок жизни проверяется в том же запросе, что и чтение записи, поэтому
+устаревшее значение не отдается ни одним процессом, даже если его еще не
+удалили. Запись, очистка устаревших и вытеснение лишних записей
+выполняются одной транзакцией. Вытесняются давно не читавшиеся записи
+(LRU): время последнего чтения обновляется не чаще раза в TOUCH_INTERVAL
+секунд на запись, чтобы частые попадания не превращались в запись в файл
+на каждое чтение. Ошибки SQLite (занятый или поврежденный файл) и
+нечитаемые значения не ломают запрос: чтение считается промахом, запись
+пропускается.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Константы ---
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shared_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 12 * 60 * 60
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+BUSY_TIMEOUT = 2  # секунды ожидания блокировки записи другим процессом
+TOUCH_INTERVAL = 60  # не чаще этого (секунды) чтение обновляет accessed_at записи
+
+# Версия схемы файла (PRAGMA user_version); файл со старой схемой - это просто кэш, он очищается
+SCHEMA_VERSION = 2
+# Отдельные команды, а не executescript: тот завершил бы транзакцию миграции
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL,
+        accessed_at REAL NOT NULL,
+        PRIMARY KEY (namespace, key)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS entries_expiry ON entries (namespace, expires_at)",
+)
+
+# Оставляет недавно прочитанные или записанные записи пространства имен в пределах max_entries и max_bytes
+_EVICT = """
+DELETE FROM entries WHERE namespace = :namespace AND key IN (
+    SELECT key FROM (
+        SELECT key,
+               ROW_NUMBER() OVER recent AS position,
+               SUM(size) OVER recent AS total
+        FROM entries WHERE namespace = :namespace
+        WINDOW recent AS (ORDER BY accessed_at DESC, key)
+    ) WHERE position > :max_entries OR total > :max_bytes
+)
+"""
+
+# Поврежденное или несовместимое значение (обрезанный файл, удаленный класс) - промах, а не ошибка запроса
+_UNPICKLE_ERRORS = (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError, TypeError, ValueError)
+
+
+def shared_cache_path():
+    """Путь к файлу общего кэша из SHARED_CACHE_PATH (читается при вызове, после load_dotenv)."""
+    return os.environ.get("SHARED_CACHE_PATH", DEFAULT_PATH)
+
+
+def open_shared_cache(namespace, path=None, **kwargs):
+    """SharedCache для пространства имен или None, если общий кэш отключен (SHARED_CACHE_PATH="")."""
+    path = shared_cache_path() if path is None else path
+    if not path:
+        return None
+    try:
+        return SharedCache(path, namespace, **kwargs)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Общий кэш {path} недоступен, используется кэш процесса: {e}")
+        return None
+
+
+class SharedCache:
+    """
+    Кэш с временем жизни записей в общем файле SQLite (WAL + mmap).
+
+    Ключи - любые значения с детерминированным repr (строки, числа, кортежи
+    из них), значения сериализуются pickle. Время жизни отсчитывается по
+    time.time(), так как монотонные часы у процессов не общие.
+    """
+
+    def __init__(self, path, namespace, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 max_bytes=DEFAULT_MAX_BYTES, clock=time.time):
+        if max_entries <= 0:
+            raise ValueError("max_entries должен быть положительным")
+        self.path = path
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._connection()  # создаем файл и схему сразу, чтобы ошибки конфигурации были видны при старте
+
+    def _connection(self):
+        # Соединение SQLite нельзя использовать после fork, поэтому оно привязано к потоку и процессу
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            _migrate(connection)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _failed(self, operation, error):
+        self._count('errors')
+        logger.warning(f"Общий кэш '{self.namespace}': ошибка {operation}: {error}")
+
+    def get_entry(self, key):
+        """(значение, момент истечения по time.time()) или None, если записи нет или она устарела."""
+        now = self._clock()
+        try:
+            connection = self._connection()
+            row = connection.execute(
+                "SELECT value, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (self.namespace, repr(key), now)).fetchone()
+            entry = None if row is None else (pickle.loads(row[0]), row[1])
+            if row is not None and now - row[2] >= TOUCH_INTERVAL:
+                connection.execute("UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                                   (now, self.namespace, repr(key)))
+        except (sqlite3.Error, *_UNPICKLE_ERRORS) as e:
+            self._failed("чтения", e)
+            entry = None
+        self._count('misses' if entry is None else 'hits')
+        return entry
+
+    def get(self, key, default=None):
+        """Возвращает значение или default, если записи нет или она устарела."""
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Сохраняет значение; устаревшие и не помещающиеся в ограничения записи удаляются той же транзакцией."""
+        now = self._clock()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            connection = self._connection()
+            with _Transaction(connection):
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.namespace, repr(key), blob, len(blob), now + (self.ttl if ttl is None else ttl), now))
+                expired = connection.execute("DELETE FROM entries WHERE namespace = ? AND expires_at <= ?",
+                                             (self.namespace, now)).rowcount
+                evicted = 0
+                count, size = connection.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?",
+                    (self.namespace,)).fetchone()
+                if count > self.max_entries or size > self.max_bytes:
+                    evicted = connection.execute(_EVICT, {'namespace': self.namespace, 'max_entries': self.max_entries,
+                                                          'max_bytes': self.max_bytes}).rowcount
+        except sqlite3.Error as e:
+            self._failed("записи", e)
+            return
+        with self._lock:
+            self.expirations += expired
+            self.evictions += evicted
+
+    def invalidate(self, key):
+        try:
+            self._connection().execute("DELETE FROM entries WHERE namespace = ? AND key = ?",
+                                       (self.namespace, repr(key)))
+        except sqlite3.Error as e:
+            self._failed("удаления", e)
+
+    def clear(self):
+        try:
+            self._connection().execute("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+        except sqlite3.Error as e:
+            self._failed("очистки", e)
+
+    def _usage(self):
+        return self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, self._clock())).fetchone()
+
+    def __len__(self):
+        return self._usage()[0]
+
+    def stats(self):
+        """Счетчики этого процесса и общий размер пространства имен."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'backend': 'shared',
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'errors': self.errors,
+            }
+        try:
+            stats['entries'], stats['bytes'] = self._usage()
+        except sqlite3.Error as e:
+            self._failed("статистики", e)
+        stats['max_entries'] = self.max_entries
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+
+def _migrate(connection):
+    """Создает схему; таблицу старой версии (без accessed_at) удаляет - записи кэша просто загрузятся заново."""
+    with _Transaction(connection):
+        if connection.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            connection.execute("DROP TABLE IF EXISTS entries")
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        for statement in _SCHEMA:
+            connection.execute(statement)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT: блокировка записи берется сразу, а не при первом изменении."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _FlightStats:
+    """Общие счетчики: сколько вызовов пришло, сколько реально ушло к сервису, сколько схлопнуто."""
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'collapsed': self.collapsed,
+            'in_flight': len(self._calls),
+        }
+
+
+class SingleFlight(_FlightStats):
+    """
+    Схлопывание одинаковых одновременных запросов (для потоков, например Flask).
+
+    Первый вызов do(key, fn) выполняет fn, а все конкурентные вызовы с тем же
+    ключом дожидаются его и получают тот же результат (или то же исключение).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.collapsed += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight(_FlightStats):
+    """
+    То же схлопывание для корутин внутри одного цикла событий (бот).
+
+    Общий запрос выполняется отдельной задачей, а первый вызов ждет ее так же,
+    как остальные: отмена любого ожидающего, в том числе первого, не отменяет
+    запрос для других. Если отменены все ожидающие, задача доводится до конца
+    и ее результат отбрасывается.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._calls = {}
+
+    async def do(self, key, coro_fn):
+        self.calls += 1
+        task = self._calls.get(key)
+        if task is not None:
+            self.collapsed += 1
+        else:
+            self.executions += 1
+            task = self._calls[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # shield: отмена ожидающего не доходит до общей задачи
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
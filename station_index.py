@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс названий станций для поиска поездов по свободному тексту.
+
+Названия и их варианты на всех языках бота приводятся к одному ключу:
+нижний регистр, без диакритики и знаков препинания, кириллица
+транслитерируется в латиницу, а близкие по звучанию написания
+(kh/h, y/i, удвоенные буквы) сводятся к одному виду. Поиск идет в три шага:
+точное совпадение ключа, однозначный префикс и нечеткое сравнение
+по триграммам, поэтому "Sochi", "Soçi", "索契", "Соч" и "Сочт" находят станцию
+Сочи без обращения к сервису билетов. Найденная станция несет код "Экспресс-3"
+(None, если код неизвестен).
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict, namedtuple
+
+# --- Константы ---
+MIN_FUZZY_SCORE = 0.45   # минимальный коэффициент Дайса по триграммам
+MIN_PREFIX_LENGTH = 3    # короче - слишком много кандидатов для автодополнения
+
+StationName = namedtuple('StationName', ['name', 'code'])
+StationMatch = namedtuple('StationMatch', ['station', 'score', 'alias'])
+
+# Каноническое (русское) название -> варианты на английском, турецком, китайском и персидском
+STATION_ALIASES = {
+    "Москва": ["Moscow", "Moskva", "Moskova", "莫斯科", "مسکو"],
+    "Санкт-Петербург": ["Saint Petersburg", "St. Petersburg", "Sankt-Peterburg", "Petersburg", "СПб", "Питер",
+                        "圣彼得堡", "سن پترزبورگ"],
+    "Сочи": ["Sochi", "Soçi", "索契", "سوچی"],
+    "Адлер": ["Adler", "阿德勒", "آدلر"],
+    "Краснодар": ["Krasnodar", "克拉斯诺达尔", "کراسنودار"],
+    "Туапсе": ["Tuapse", "图阿普谢", "توآپسه"],
+    "Лазаревская": ["Lazarevskaya", "Lazarevskoye", "拉扎列夫斯科耶", "لازارفسکایا"],
+    "Ростов-на-Дону": ["Rostov-on-Don", "Rostov-na-Donu", "Rostov", "顿河畔罗斯托夫", "روستوف"],
+    "Анапа": ["Anapa", "阿纳帕", "آناپا"],
+    "Новороссийск": ["Novorossiysk", "新罗西斯克", "نووروسیسک"],
+    "Минеральные Воды": ["Mineralnye Vody", "Mineralnyye Vody", "Mineralnie Vodi", "矿水城", "مینرالنیه وودی"],
+    "Волгоград": ["Volgograd", "伏尔加格勒", "ولگاگراد"],
+    "Воронеж": ["Voronezh", "沃罗涅日", "ورونژ"],
+    "Казань": ["Kazan", "喀山", "کازان"],
+    "Самара": ["Samara", "萨马拉", "سامارا"],
+    "Нижний Новгород": ["Nizhny Novgorod", "Nizhniy Novgorod", "下诺夫哥罗德", "نیژنی نووگورود"],
+    "Екатеринбург": ["Yekaterinburg", "Ekaterinburg", "叶卡捷琳堡", "یکاترینبورگ"],
+    "Минск": ["Minsk", "明斯克", "مینسک"],
+}
+
+_TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    # Турецкие буквы, которые NFKD не раскладывает или раскладывает не в то звучание
+    'ç': 'ch', 'ş': 'sh', 'ı': 'i', 'ğ': 'g',
+}
+_TRANSLIT_TABLE = str.maketrans(_TRANSLIT)
+_SOUND_RULES = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r'kh', 'h'), (r'shch', 'sch'), (r'[yj]', 'i'), (r'ii+', 'i'), (r'w', 'v'), (r'x', 'ks'),
+    (r'(\w)\1+', r'\1'),
+)]
+_NOT_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_name(text):
+    """Ключ названия: регистр, диакритика, пунктуация, транслитерация и сведение вариантов написания."""
+    text = text.casefold().translate(_TRANSLIT_TABLE)
+    text = "".join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    text = _NOT_WORD.sub(' ', text).strip()
+    for pattern, replacement in _SOUND_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StationIndex:
+    """
+    Предпостроенный индекс: ключ -> станция, отсортированные ключи для префиксов
+    и обратный индекс триграмм для нечеткого поиска.
+    """
+
+    def __init__(self, aliases=STATION_ALIASES, codes=None):
+        self._codes = {name.lower(): code for name, code in (codes or {}).items()}
+        self._stations = {}     # каноническое название -> StationName
+        self._by_key = {}       # ключ варианта -> (StationName, вариант)
+        self._keys = []         # отсортированные ключи для префиксного поиска
+        self._grams = defaultdict(set)
+        self._gram_counts = {}
+        for name, names in aliases.items():
+            self.add(name, names)
+
+    def add(self, name, aliases=()):
+        """Добавляет станцию и варианты ее названия (повторные варианты игнорируются)."""
+        station = self._stations.get(name)
+        if station is None:
+            station = self._stations[name] = StationName(name, self._codes.get(name.lower()))
+        for alias in (name, *aliases):
+            key = normalize_name(alias)
+            if not key or key in self._by_key:
+                continue
+            self._by_key[key] = (station, alias)
+            grams = trigrams(key)
+            self._gram_counts[key] = len(grams)
+            for gram in grams:
+                self._grams[gram].add(key)
+        self._keys = sorted(self._by_key)
+
+    def add_route_labels(self, labels, routes):
+        """
+        Варианты названий из подписей кнопок маршрутов бота ("Sochi - Moscow" на каждом языке).
+        routes: {ключ подписи: (откуда, куда)} с каноническими названиями.
+        """
+        for texts in labels.values():
+            for label_key, (from_name, to_name) in routes.items():
+                parts = [part.strip() for part in texts.get(label_key, "").split(" - ")]
+                if len(parts) == 2:
+                    self.add(from_name, [parts[0]])
+                    self.add(to_name, [parts[1]])
+
+    def __len__(self):
+        return len(self._stations)
+
+    def resolve(self, text, min_score=MIN_FUZZY_SCORE):
+        """
+        Лучшее совпадение (StationMatch) для введенного названия или None:
+        точный ключ, затем префикс одной-единственной станции, затем триграммы.
+        """
+        key = normalize_name(text)
+        if not key:
+            return None
+        found = self._by_key.get(key)
+        if found is not None:
+            return StationMatch(found[0], 1.0, found[1])
+        prefixed = self.prefixed(key, limit=2)
+        if len(prefixed) == 1:
+            return prefixed[0]
+        matches = self.fuzzy(key, limit=1, min_score=min_score)
+        return matches[0] if matches else None
+
+    def prefixed(self, prefix, limit=5, with_code=False):
+        """
+        Станции, варианты которых начинаются с нормализованного prefix (по одной на станцию);
+        score - доля варианта, покрытая префиксом.
+        """
+        if len(prefix) < MIN_PREFIX_LENGTH:
+            return []
+        matches = {}
+        for key in self._keys[bisect_left(self._keys, prefix):]:
+            if not key.startswith(prefix):
+                break
+            station, alias = self._by_key[key]
+            if station.name in matches or (with_code and not station.code):
+                continue
+            matches[station.name] = StationMatch(station, len(prefix) / len(key), alias)
+            if len(matches) >= limit:
+                break
+        return list(matches.values())
+
+    def fuzzy(self, key, limit=5, min_score=MIN_FUZZY_SCORE, with_code=False):
+        """Станции, ближайшие к нормализованному ключу по коэффициенту Дайса триграмм."""
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._grams.get(gram, ()))
+        best = {}
+        for candidate, common in shared.items():
+            score = 2 * common / (len(grams) + self._gram_counts[candidate])
+            station, alias = self._by_key[candidate]
+            if with_code and not station.code:
+                continue
+            if score >= min_score and score > best.get(station.name, (0,))[0]:
+                best[station.name] = (score, StationMatch(station, score, alias))
+        ranked = sorted(best.values(), key=lambda item: -item[0])
+        return [match for _, match in ranked[:limit]]
+
+    def suggest(self, text, limit=5, with_code=False):
+        """
+        Автодополнение: канонические названия станций, варианты которых начинаются с text
+        (если таких нет - ближайшие по триграммам). with_code - только станции с кодом.
+        """
+        prefix = normalize_name(text)
+        matches = self.prefixed(prefix, limit, with_code)
+        if not matches and len(prefix) >= MIN_PREFIX_LENGTH:
+            matches = self.fuzzy(prefix, limit, with_code=with_code)
+        return [match.station.name for match in matches]
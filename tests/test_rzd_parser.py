@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты парсера расписания РЖД ("RZD (1).py"): бэкенды lxml и bs4 должны
+давать одинаковый результат, а ранний выход parse_next_trains - совпадать
+с началом полного разбора.
+
+Проверяются все страницы benchmarks/fixtures/sochi_*.html (туда же можно
+положить сохраненные страницы rasp.yandex.ru) и небольшая страница ниже с
+известным результатом.
+"""
+
+import glob
+import importlib.util
+import logging
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+
+
+def load_rzd():
+    """Парсер под именем RZD, как его импортирует веб-приложение; общий кэш на диске не открывается."""
+    if "RZD" in sys.modules:
+        return sys.modules["RZD"]
+    os.environ.setdefault("SHARED_CACHE_PATH", "")
+    spec = importlib.util.spec_from_file_location("RZD", os.path.join(ROOT, "RZD (1).py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["RZD"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def segment(time_html, event_type, transport, title="", subtitle=""):
+    times = {event: time_html if event == event_type else "" for event in ("departure", "arrival")}
+    return f"""
+<article class="SearchSegment SearchSegment_type_train">
+  <header class="SearchSegment__header">
+    <div class="SearchSegment__transport">{transport}</div>{title}{subtitle}
+  </header>
+  <div class="SearchSegment__times">
+    <div class="SearchSegment__departure"><span class="SegmentTime"><span class="SegmentTime__time">{times['departure']}</span></span></div>
+    <div class="SearchSegment__arrival"><span class="SegmentTime"><span class="SegmentTime__time">{times['arrival']}</span></span></div>
+  </div>
+</article>"""
+
+
+def edge_case_page(event_type):
+    """Разновидности разметки, которые встречаются на табло станции."""
+    number = '<span class="TransportIcon"><span class="TransportIcon__number">{}</span></span>'.format
+    segments = [
+        segment(" 08:15 ", event_type, number("104В"),
+                '<span class="SearchSegment__headerTitle">«Премиум»</span>',
+                '<div class="SearchSegment__headerSubtitle">Москва — Сочи\n&nbsp;поезд</div>'),
+        # Поезд без номера: берется подпись значка
+        segment("09:40", event_type, '<span class="TransportIcon">Ласточка</span>', "",
+                '<div class="SearchSegment__headerSubtitle">Туапсе — Адлер</div>'),
+        # Название совпадает с номером и не повторяется
+        segment("10:05", event_type, number("805С"),
+                '<span class="SearchSegment__headerTitle">805С</span>',
+                '<div class="SearchSegment__headerSubtitle">Краснодар — Сочи</div>'),
+        # Сегмент без маршрута пропускается
+        segment("11:00", event_type, number("001А")),
+    ]
+    # Класс, который только начинается с SearchSegment, сегментом не считается
+    promo = '<article class="SearchSegmentPromo"><span class="SegmentTime__time">12:00</span></article>'
+    return f"<html><body><section>{''.join(segments)}{promo}</section></body></html>"
+
+
+EDGE_CASE_SCHEDULE = [
+    {'time': "08:15", 'train': "104В '«Премиум»'", 'route': "Москва — Сочи  поезд"},
+    {'time': "09:40", 'train': "Ласточка", 'route': "Туапсе — Адлер"},
+    {'time': "10:05", 'train': "805С", 'route': "Краснодар — Сочи"},
+]
+
+
+class RzdParserTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.rzd = load_rzd()
+        logging.disable(logging.CRITICAL)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def fixture_pages(self):
+        paths = sorted(glob.glob(os.path.join(FIXTURES_DIR, "sochi_*.html")))
+        self.assertTrue(paths, f"нет страниц в {FIXTURES_DIR}")
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                yield path, "arrival" if "arrival" in os.path.basename(path) else "departure", f.read()
+
+    def test_backends_agree_on_fixtures(self):
+        for path, event_type, html in self.fixture_pages():
+            with self.subTest(page=os.path.basename(path)):
+                results = {backend: self.rzd.parse_schedule_data(html, event_type, backend=backend)
+                           for backend in self.rzd.PARSER_BACKENDS}
+                reference = results['bs4']
+                self.assertTrue(reference)
+                for backend, result in results.items():
+                    self.assertEqual(result, reference, backend)
+
+    def test_edge_case_markup(self):
+        for event_type in ("arrival", "departure"):
+            html = edge_case_page(event_type)
+            for backend in self.rzd.PARSER_BACKENDS:
+                with self.subTest(event=event_type, backend=backend):
+                    self.assertEqual(self.rzd.parse_schedule_data(html, event_type, backend=backend),
+                                     EDGE_CASE_SCHEDULE)
+
+    def test_empty_schedule(self):
+        html = '<html><body><div class="ScheduleEmpty">Рейсов нет</div></body></html>'
+        for backend in self.rzd.PARSER_BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(self.rzd.parse_schedule_data(html, "arrival", backend=backend), [])
+        self.assertEqual(self.rzd.parse_next_trains(html, "arrival", 5), [])
+
+    def test_next_trains_match_full_parse(self):
+        pages = [(path, event_type, html) for path, event_type, html in self.fixture_pages()]
+        pages.append(("edge_case", "arrival", edge_case_page("arrival")))
+        for path, event_type, html in pages:
+            full = self.rzd.parse_schedule_data(html, event_type)
+            after = 9 * 60
+            expected = [entry for entry in full
+                        if self.rzd.parse_minutes(entry['time']) is not None
+                        and self.rzd.parse_minutes(entry['time']) >= after]
+            with self.subTest(page=os.path.basename(path)):
+                self.assertEqual(self.rzd.parse_next_trains(html, event_type, 2, after_minutes=after), expected[:2])
+                self.assertEqual(self.rzd.parse_next_trains(html, event_type, len(full) + 1), full)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Тесты общего кэша процессов (shared_cache.py): срок жизни, вытеснение, поврежденные записи, миграция."""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_cache import SCHEMA_VERSION, TOUCH_INTERVAL, SharedCache  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SharedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.sqlite3")
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def cache(self, namespace="places", **kwargs):
+        return SharedCache(self.path, namespace, clock=self.clock, **kwargs)
+
+    def test_entry_expires_after_ttl(self):
+        cache = self.cache(ttl=10)
+        cache.set("a", [1, 2])
+        cache.set("b", "short", ttl=2)
+        self.clock.now += 5
+        self.assertEqual(cache.get("a"), [1, 2])
+        self.assertIsNone(cache.get("b"))
+        self.clock.now += 6
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+        # Устаревшие записи удаляются при следующей записи
+        cache.set("c", 3)
+        self.assertEqual(cache.stats()['expirations'], 2)
+
+    def test_max_entries_evicts_least_recently_read(self):
+        cache = self.cache(max_entries=3)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+            self.clock.now += 1
+        # Чтение "a" спустя TOUCH_INTERVAL обновляет время доступа; старейшей становится "b"
+        self.clock.now += TOUCH_INTERVAL
+        self.assertEqual(cache.get("a"), "a")
+        cache.set("d", "d")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual([cache.get(key) for key in ("a", "c", "d")], ["a", "c", "d"])
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_frequent_reads_do_not_touch_entry(self):
+        cache = self.cache(max_entries=2)
+        cache.set("a", "a")
+        self.clock.now += 1
+        cache.set("b", "b")
+        # Чтение раньше TOUCH_INTERVAL не пишет в файл, поэтому "a" остается старейшей
+        self.clock.now += TOUCH_INTERVAL / 2
+        self.assertEqual(cache.get("a"), "a")
+        cache.set("c", "c")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), "b")
+
+    def test_max_bytes_evicts_oldest_first(self):
+        value = "x" * 1000
+        probe = self.cache(namespace="probe")
+        probe.set("size", value)
+        entry_size = probe.stats()['bytes']
+
+        cache = self.cache(max_bytes=entry_size * 2 + entry_size // 2)
+        for key in ("a", "b", "c"):
+            cache.set(key, value)
+            self.clock.now += 1
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), value)
+        self.assertEqual(cache.get("c"), value)
+        self.assertLessEqual(cache.stats()['bytes'], cache.max_bytes)
+
+    def test_namespaces_are_limited_separately(self):
+        places = self.cache("places", max_entries=1)
+        trains = self.cache("trains", max_entries=1)
+        places.set("a", 1)
+        trains.set("a", 2)
+        self.clock.now += 1
+        places.set("b", 3)
+        self.assertIsNone(places.get("a"))
+        self.assertEqual(trains.get("a"), 2)
+
+    def test_corrupt_value_is_a_miss(self):
+        cache = self.cache()
+        cache.set("broken", {"ok": True})
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute("UPDATE entries SET value = ? WHERE key = ?", (b"\x80\x05not a pickle", repr("broken")))
+        connection.close()
+        self.assertIsNone(cache.get("broken"))
+        self.assertEqual(cache.get("broken", "default"), "default")
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['errors']), (0, 2, 2))
+        # Запись поверх поврежденной работает как обычно
+        cache.set("broken", {"ok": True})
+        self.assertEqual(cache.get("broken"), {"ok": True})
+
+    def test_old_schema_file_is_dropped(self):
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute("""CREATE TABLE entries (
+                namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL,
+                expires_at REAL NOT NULL, PRIMARY KEY (namespace, key)) WITHOUT ROWID""")
+            connection.execute("INSERT INTO entries VALUES ('places', ?, ?, 1, ?)", (repr("old"), b"x", 10 ** 10))
+        connection.execute("PRAGMA user_version = 1")
+        connection.close()
+
+        cache = self.cache()
+        self.assertIsNone(cache.get("old"))
+        self.assertEqual(len(cache), 0)
+        cache.set("new", 1)
+        self.assertEqual(cache.get("new"), 1)
+
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(connection.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(entries)")]
+        connection.close()
+        self.assertIn("accessed_at", columns)
+
+    def test_current_schema_file_is_kept(self):
+        self.cache().set("kept", "value")
+        self.assertEqual(self.cache().get("kept"), "value")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Тесты схлопывания одновременных запросов (singleflight.py)."""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from singleflight import AsyncSingleFlight  # noqa: E402
+
+
+class AsyncSingleFlightTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_followers_share_one_call(self):
+        flight = AsyncSingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)))
+        self.assertEqual(results, ["ok"] * 5)
+        self.assertEqual(calls, 1)
+        self.assertEqual(flight.stats(), {'calls': 5, 'executions': 1, 'collapsed': 4, 'in_flight': 0})
+
+    async def test_cancelling_leader_keeps_result_for_followers(self):
+        flight = AsyncSingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "ok"
+
+        leader = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+        release.set()
+
+        self.assertEqual(await asyncio.gather(*followers), ["ok"] * 3)
+        self.assertEqual(flight.stats()['executions'], 1)
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    async def test_error_reaches_every_caller(self):
+        flight = AsyncSingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream")
+
+        results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()